@@ -10,6 +10,7 @@ urlpatterns = [
     path('about/', views.about, name='about'),
     path('', views.HomePage, name='home'),
     path('logout/', views.LogoutPage, name='logout'),
+    path('session/', views.session_status, name='session_status'),
     path('forget-password/', views.forget_password, name='forget_password'),
     path('reset-password/<str:uidb64>/<str:token>/', views.reset_password, name='reset_password'),
 ]
@@ -15,29 +15,65 @@ from django.utils.encoding import force_bytes
 from django.template.loader import render_to_string
 from django.core.mail import send_mail
 from django.conf import settings
+from django.http import JsonResponse
+from django.db.models import Prefetch
+from django.views.decorators.cache import never_cache
+from tickets import sharding
+from tickets.decorators import public_page
 # import requests
+import heapq
 import json
+import logging
+from collections import defaultdict
 
+logger = logging.getLogger(__name__)
+
+def _recent_events_by_category(limit):
+    """
+    ``{category_id: events}``, newest ``limit`` first, with one prefetch per
+    shard rather than a query per category.
+    """
+    def recent(alias):
+        categories, events = Category.objects.all(), Event.objects.order_by('-date')
+        if alias:
+            categories, events = categories.using(alias), events.using(alias)
+        prefetch = Prefetch('events', queryset=events[:limit], to_attr='recent_events')
+        return list(categories.prefetch_related(prefetch))
+
+    merged = defaultdict(list)
+    for categories in sharding.fan_out(recent) if sharding.get_shards() else [recent(None)]:
+        for category in categories:
+            merged[category.id] += category.recent_events
+    return {
+        category_id: heapq.nlargest(limit, events, key=lambda event: event.date)
+        for category_id, events in merged.items()
+    }
+
+@public_page
 def HomePage(request):
     context = {}
     if Event:
         try:
-            events_qs = Event.objects.order_by('-date')[:8]
+            events_qs = sharding.sharded(Event.objects.order_by('-date'))[:8]
             context['featured_events'] = events_qs
         except Exception:
             context['featured_events'] = []
     if Category:
         try:
             cats = list(Category.objects.all())
-            categories_with_events = []
-            for c in cats:
-                evs = list(Event.objects.filter(categories=c).order_by('-date')[:8])
-                categories_with_events.append((c, evs))
-            context['categories_with_events'] = categories_with_events
+            recent_events = _recent_events_by_category(8)
+            context['categories_with_events'] = [(c, recent_events.get(c.id, [])) for c in cats]
         except Exception:
             context['categories_with_events'] = []
     return render(request, 'home.html', context)
 
+@never_cache
+def session_status(request):
+    """Per-user bits for pages served from a shared cache by ``public_page``."""
+    if not request.user.is_authenticated:
+        return JsonResponse({'authenticated': False})
+    return JsonResponse({'authenticated': True, 'username': request.user.username})
+
 def AuthPage(request):
     if request.user.is_authenticated:
         return redirect('home')
@@ -188,8 +224,10 @@ SeatScape Team
                     )
                     messages.success(request, f'Password reset link has been sent to {email}. Please check your email.')
                 except Exception as e:
+                    logger.warning('Sending the password reset e-mail failed: %s', e)
                     # Fallback for development - show link in console
-                    print(f"Password reset link for {email}: {reset_url}")
+                    if settings.DEBUG:
+                        logger.info('Password reset link for %s: %s', email, reset_url)
                     messages.info(request, f'Password reset link sent! Check your console/terminal for the link.')
                 
             except User.DoesNotExist:
@@ -1,3 +1,5 @@
+import logging
+
 from django.shortcuts import render, redirect
 from django.core.mail import send_mail
 from django.conf import settings
@@ -5,6 +7,8 @@ from django.contrib import messages
 from .forms import ContactForm
 from .models import Contact
 
+logger = logging.getLogger(__name__)
+
 def contact_view(request):
     if request.method == 'POST':
         form = ContactForm(request.POST)
@@ -56,7 +60,7 @@ def contact_view(request):
                 return redirect('contact')
             except Exception as e:
                 # Log the specific error for debugging
-                print(f"Email error: {e}")
+                logger.exception('Sending the contact form e-mails failed', extra={'contact_id': contact.id})
                 messages.error(request, f'Email error: {str(e)}')
                 # Delete the contact entry if email fails
                 contact.delete()
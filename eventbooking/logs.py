@@ -0,0 +1,137 @@
+"""
+JSON logs written off the request thread.
+
+``JsonFormatter`` turns a record into one line of JSON. It holds the usual
+fields plus anything passed in ``extra``, such as the timings of
+``eventbooking.timing`` or the funnel steps of ``tickets.funnel``.
+
+``BatchingQueueHandler`` only puts records on a bounded queue. A background
+thread in each process formats them and writes them in batches, with one
+write and one flush per batch. A request never waits for the disk or the
+terminal. If the queue is full, the record is dropped and counted in
+``log_records_dropped_total`` (see ``eventbooking.metrics``). Records still
+queued are written when logging shuts down at exit.
+"""
+import datetime
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+
+from . import metrics
+
+RECORDS_DROPPED = metrics.Counter('log_records_dropped_total', 'Log records dropped because the log queue was full.')
+
+# Attributes every LogRecord has; anything else came in through ``extra``
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime', 'taskName'}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'time': datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        entry.update((name, value) for name, value in vars(record).items() if name not in _RECORD_ATTRS)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        if record.stack_info:
+            entry['stack'] = record.stack_info
+        return json.dumps(entry, default=str)
+
+
+class BatchingQueueHandler(logging.Handler):
+    """Write records to ``path`` (stderr if empty) from a background thread."""
+
+    def __init__(self, path='', capacity=10000, batch_size=200, level=logging.NOTSET):
+        super().__init__(level)
+        self.path = path
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.queue = queue.Queue(capacity)
+        self._writer = None
+        self._start_lock = threading.Lock()
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        # Threads do not survive a fork; a worker starts a writer of its own
+        # and leaves the records queued before the fork to its parent
+        self.queue = queue.Queue(self.capacity)
+        self._writer = None
+        self._start_lock = threading.Lock()
+
+    def _start(self):
+        with self._start_lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_batches, name='log-writer', daemon=True)
+                self._writer.start()
+
+    def prepare(self, record):
+        # Arguments and tracebacks may change or go away once the caller
+        # moves on, so they are rendered before the record is queued
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = (self.formatter or logging.Formatter()).formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def emit(self, record):
+        try:
+            record = self.prepare(record)
+        except Exception:
+            self.handleError(record)
+            return
+        if self._writer is None:
+            self._start()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            RECORDS_DROPPED.inc()
+
+    def _write_batches(self):
+        stream = open(self.path, 'a', encoding='utf-8') if self.path else sys.stderr
+        formatter = self.formatter or JsonFormatter()
+        stopping = False
+        while not stopping:
+            batch = [self.queue.get()]
+            # Whatever else is already waiting goes out in the same write
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            if None in batch:
+                stopping = True
+                batch = [record for record in batch if record is not None]
+            lines = []
+            for record in batch:
+                try:
+                    lines.append(formatter.format(record) + '\n')
+                except Exception:
+                    self.handleError(record)
+            try:
+                stream.write(''.join(lines))
+                stream.flush()
+            except Exception:
+                if batch:
+                    self.handleError(batch[0])
+        if self.path:
+            stream.close()
+
+    def close(self):
+        writer = self._writer
+        if writer is not None and writer.is_alive():
+            try:
+                self.queue.put(None, timeout=5)
+            except queue.Full:
+                pass
+            writer.join(timeout=5)
+        self._writer = None
+        super().close()
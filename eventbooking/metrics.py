@@ -0,0 +1,312 @@
+"""
+Metrics.
+
+A small registry of counters and histograms, exposed in the Prometheus text
+format at ``/metrics``. The endpoint is off (404) unless ``METRICS_TOKEN`` is
+set, and then answers only requests with ``Authorization: Bearer <token>``;
+the client address says nothing behind a reverse proxy::
+
+    SEATS_BOOKED = metrics.Counter('seats_booked_total', 'Seats booked.')
+    SEATS_BOOKED.inc()
+
+    with CHECKOUT_STAGE_SECONDS.time(stage='stripe'):
+        ...
+
+Each worker process counts in memory, which costs a dict update under a
+lock. With ``METRICS_DIR`` set, every process also writes its totals to a
+file of its own there, at most every ``METRICS_FLUSH_INTERVAL`` seconds
+after a request and when it exits, and ``/metrics`` adds up the files of all
+processes, so any worker can answer the scrape. The files of processes that
+have exited are folded into one ``exited.json`` and deleted, so the
+directory does not grow with every restart and counters never go back.
+Process ids only mean something on one machine, so each server needs a
+directory of its own. Without ``METRICS_DIR`` each process reports its own
+counts only.
+"""
+import atexit
+import bisect
+import fcntl
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.core.signals import request_finished
+from django.dispatch import receiver
+from django.http import Http404, HttpResponse
+from django.utils.crypto import constant_time_compare
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+EXITED_FILE = 'exited.json'  # Totals of processes that have exited
+
+_registry = {}  # name -> metric
+_lock = threading.Lock()
+_file_name = f'{os.getpid()}-{time.time_ns()}.json'
+_last_flush = 0.0
+
+
+class Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        if name in _registry:
+            raise ValueError(f'A metric named {name} already exists.')
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}  # tuple of label values -> value
+        _registry[name] = self
+
+    def _key(self, labels):
+        if len(labels) != len(self.labelnames) or set(labels) != set(self.labelnames):
+            raise ValueError(f'{self.name} takes the labels {", ".join(self.labelnames) or "(none)"}.')
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def accepts(self, value):
+        return True
+
+    def merge(self, value, other):
+        raise NotImplementedError
+
+    def lines(self, key, value):
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with _lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def merge(self, value, other):
+        return value + other
+
+    def lines(self, key, value):
+        yield f'{self.name}{_labels(self.labelnames, key)} {_number(value)}'
+
+
+class Histogram(Metric):
+    """Observations counted into ``buckets`` (upper bounds), plus their sum."""
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with _lock:
+            # A count per bucket, one for +Inf, then the sum
+            counts = self.values.get(key)
+            if counts is None:
+                counts = self.values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            counts[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the seconds spent in the block."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def accepts(self, value):
+        # Files written before a deploy that changed the buckets do not fit
+        return len(value) == len(self.buckets) + 2
+
+    def merge(self, value, other):
+        return [a + b for a, b in zip(value, other)]
+
+    def lines(self, key, value):
+        cumulative = 0
+        for bound, count in zip([*map(_number, self.buckets), '+Inf'], value):
+            cumulative += count
+            yield f'{self.name}_bucket{_labels(self.labelnames, key, [("le", bound)])} {cumulative}'
+        yield f'{self.name}_sum{_labels(self.labelnames, key)} {_number(value[-1])}'
+        yield f'{self.name}_count{_labels(self.labelnames, key)} {cumulative}'
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _labels(names, values, extra=()):
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ''
+    escaped = (value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def _snapshot():
+    """``{name: [[label values, value], ...]}`` of this process, safe to serialize."""
+    with _lock:
+        return {
+            name: [[list(key), list(value) if isinstance(value, list) else value]
+                   for key, value in metric.values.items()]
+            for name, metric in _registry.items() if metric.values
+        }
+
+
+def flush():
+    """Write this process's totals to its file in ``METRICS_DIR``."""
+    global _last_flush
+    directory = getattr(settings, 'METRICS_DIR', '')
+    if not directory:
+        return
+    _last_flush = time.monotonic()
+    snapshot = _snapshot()
+    if not snapshot:
+        # Nothing counted yet, e.g. in a management command
+        return
+    os.makedirs(directory, exist_ok=True)
+    _write(directory, _file_name, snapshot)
+
+
+def _merge(snapshots):
+    """Add up snapshots into ``{name: {label values: value}}``."""
+    totals = {}
+    for snapshot in snapshots:
+        for name, samples in snapshot.items():
+            metric = _registry.get(name)
+            if metric is None:
+                continue
+            values = totals.setdefault(name, {})
+            for key, value in samples:
+                if not metric.accepts(value):
+                    continue
+                key = tuple(key)
+                values[key] = metric.merge(values[key], value) if key in values else value
+    return totals
+
+
+def _read(path):
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        logger.warning('Skipped unreadable metrics file %s', path)
+        return None
+
+
+def _write(directory, name, snapshot):
+    # Written aside and renamed so that readers never see half a file
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(snapshot, f)
+    os.replace(temp_path, os.path.join(directory, name))
+
+
+def _exited(path):
+    pid = path.name.partition('-')[0]
+    if path.name == EXITED_FILE or not pid.isdigit():
+        return False
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        pass
+    return False
+
+
+def _fold_exited(directory):
+    """Add the files of exited processes to ``EXITED_FILE`` and delete them."""
+    with open(os.path.join(directory, '.lock'), 'w') as lock:
+        # One scrape at a time, or two could fold the same file twice
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        exited = [path for path in Path(directory).glob('*.json') if _exited(path)]
+        if not exited:
+            return
+        snapshots = [_read(path) for path in [Path(directory, EXITED_FILE), *exited] if path.exists()]
+        totals = _merge(snapshot for snapshot in snapshots if snapshot)
+        _write(directory, EXITED_FILE, {
+            name: [[list(key), value] for key, value in values.items()] for name, values in totals.items()
+        })
+        for path in exited:
+            path.unlink(missing_ok=True)
+
+
+def collect():
+    """The totals of all processes as ``{name: {label values: value}}``."""
+    directory = getattr(settings, 'METRICS_DIR', '')
+    if not directory:
+        return _merge([_snapshot()])
+    flush()
+    os.makedirs(directory, exist_ok=True)
+    _fold_exited(directory)
+    snapshots = (_read(path) for path in Path(directory).glob('*.json'))
+    return _merge(snapshot for snapshot in snapshots if snapshot)
+
+
+def render():
+    """The totals of all processes in the Prometheus text format."""
+    lines = []
+    for name, values in sorted(collect().items()):
+        metric = _registry[name]
+        lines.append(f'# HELP {name} {metric.documentation}')
+        lines.append(f'# TYPE {name} {metric.type}')
+        for key, value in sorted(values.items()):
+            lines.extend(metric.lines(key, value))
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if not token:
+        raise Http404
+    scheme, _, given = request.headers.get('Authorization', '').partition(' ')
+    if scheme.lower() != 'bearer' or not constant_time_compare(given.strip(), token):
+        response = HttpResponse('Unauthorized', status=401, content_type='text/plain')
+        response['WWW-Authenticate'] = 'Bearer realm="metrics"'
+        return response
+    return HttpResponse(render(), content_type=CONTENT_TYPE)
+
+
+@receiver(request_finished)
+def _flush_after_request(sender, **kwargs):
+    if time.monotonic() - _last_flush >= getattr(settings, 'METRICS_FLUSH_INTERVAL', 5):
+        flush()
+
+
+def _after_fork():
+    # A forked worker starts counting from zero in a file of its own; the
+    # parent's counts are in the parent's file
+    global _lock, _file_name, _last_flush
+    _lock = threading.Lock()
+    _file_name = f'{os.getpid()}-{time.time_ns()}.json'
+    _last_flush = 0.0
+    for metric in _registry.values():
+        metric.values = {}
+
+
+os.register_at_fork(after_in_child=_after_fork)
+atexit.register(flush)
+
+
+# Metrics of every request, recorded by eventbooking.timing
+REQUEST_SECONDS = Histogram('http_request_duration_seconds', 'Time to handle a request, by view.',
+                            ['view', 'method', 'status'])
+CACHE_REQUESTS = Counter('cache_requests_total', 'Cache lookups by result; hit / (hit + miss) is the hit ratio.',
+                         ['result'])
+
+
+def record_request(request, response, timings):
+    match = getattr(request, 'resolver_match', None)
+    REQUEST_SECONDS.observe(timings.elapsed(), view=match.view_name if match else 'unmatched',
+                            method=request.method, status=f'{response.status_code // 100}xx')
+    if timings.cache_hits:
+        CACHE_REQUESTS.inc(timings.cache_hits, result='hit')
+    if timings.cache_misses:
+        CACHE_REQUESTS.inc(timings.cache_misses, result='miss')
@@ -0,0 +1,162 @@
+"""
+N+1 query detection.
+
+With ``NPLUSONE_MODE`` set to ``'log'`` or ``'raise'`` every request
+fingerprints its queries (the SQL with literals and ``IN`` lists folded) and
+notes where each came from: the template line being rendered and the
+innermost frame of project code. A fingerprint run ``NPLUSONE_THRESHOLD``
+times or more in one request is logged as a warning on
+``eventbooking.nplusone``, or raised as ``NPlusOneError`` so the request,
+and any test making it, fails.
+
+``detect()`` checks any block of code the same way, e.g. in a test::
+
+    with nplusone.detect():
+        client.get(url)
+"""
+import logging
+import os
+import re
+import sys
+import threading
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from . import timing
+
+logger = logging.getLogger(__name__)
+
+_IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+_TEMPLATE_BASE = os.path.join('django', 'template', 'base.py')
+_OWN_FILES = {__file__, timing.__file__}
+
+_current = ContextVar('nplusone_log', default=None)
+
+
+class NPlusOneError(Exception):
+    pass
+
+
+def fingerprint(sql):
+    """``sql`` with the parts that differ between repeats of one query folded."""
+    return _LITERAL.sub('?', _IN_LIST.sub('IN (...)', sql))
+
+
+def _location(frame):
+    """``'template.html:12, app/module.py:34 in function'`` for the code running ``frame``."""
+    template = code = None
+    root = str(settings.BASE_DIR) + os.sep
+    while frame is not None and not (template and code):
+        filename = frame.f_code.co_filename
+        if template is None and frame.f_code.co_name == 'render_annotated' and filename.endswith(_TEMPLATE_BASE):
+            # The innermost node being rendered, e.g. {{ ticket.seat.row.name }}
+            node = frame.f_locals.get('self')
+            token, origin = getattr(node, 'token', None), getattr(node, 'origin', None)
+            if token is not None and origin is not None:
+                template = f'{origin.template_name}:{token.lineno}'
+        elif (code is None and filename.startswith(root) and 'site-packages' not in filename
+              and filename not in _OWN_FILES):
+            code = f'{os.path.relpath(filename, root)}:{frame.f_lineno} in {frame.f_code.co_name}'
+        frame = frame.f_back
+    return ', '.join(filter(None, [template, code])) or 'unknown'
+
+
+class QueryLog:
+    def __init__(self, threshold):
+        self.threshold = threshold
+        self.queries = defaultdict(Counter)  # fingerprint -> {location: count}
+        # Sharding fan-out threads record into the same log
+        self.lock = threading.Lock()
+
+    def add(self, sql, frame):
+        key, location = fingerprint(sql), _location(frame)
+        with self.lock:
+            self.queries[key][location] += 1
+
+    def repeated(self):
+        """``(count, fingerprint, locations)`` of the queries over the threshold, most frequent first."""
+        found = [(sum(locations.values()), key, locations) for key, locations in self.queries.items()]
+        return sorted((item for item in found if item[0] >= self.threshold), key=lambda item: -item[0])
+
+    def report(self, label):
+        lines = [f'{label}: queries repeated {self.threshold} or more times']
+        for count, key, locations in self.repeated():
+            lines.append(f'  {count}x {key}')
+            lines += [f'    {n}x at {location}' for location, n in locations.most_common(3)]
+        return '\n'.join(lines)
+
+    def check(self, label, raise_errors):
+        if not self.repeated():
+            return
+        if raise_errors:
+            raise NPlusOneError(self.report(label))
+        logger.warning(self.report(label))
+
+
+def _record_query(execute, sql, params, many, context):
+    log = _current.get()
+    if log is not None:
+        log.add(sql, sys._getframe(1))
+    return execute(sql, params, many, context)
+
+
+@receiver(connection_created)
+def _install_query_recorder(sender, connection, **kwargs):
+    # First in the list, like eventbooking.timing, so execute_wrapper() blocks cannot pop it
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, _record_query)
+
+
+def _start(threshold):
+    for connection in connections.all(initialized_only=True):
+        _install_query_recorder(sender=None, connection=connection)
+    log = QueryLog(threshold or settings.NPLUSONE_THRESHOLD)
+    return log, _current.set(log)
+
+
+@contextmanager
+def detect(threshold=None, raise_errors=True, label='Block'):
+    """Check the queries run inside the block for N+1 patterns."""
+    log, token = _start(threshold)
+    try:
+        yield log
+    finally:
+        _current.reset(token)
+    log.check(label, raise_errors)
+
+
+class NPlusOneMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        mode = getattr(settings, 'NPLUSONE_MODE', 'off')
+        if mode not in ('log', 'raise'):
+            return self.get_response(request)
+
+        label = f'{request.method} {request.path}'
+        log, token = _start(None)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        if response.streaming:
+            response.streaming_content = self._check_after_streaming(response.streaming_content, log, label, mode)
+        else:
+            log.check(label, mode == 'raise')
+        return response
+
+    def _check_after_streaming(self, content, log, label, mode):
+        _current.set(log)
+        try:
+            yield from content
+        finally:
+            _current.set(None)
+        log.check(label, mode == 'raise')
@@ -0,0 +1,159 @@
+"""
+On-demand request profiling.
+
+A staff member gets a signed token with ``manage.py profile_token`` and
+sends it with the slow request, as ``?_profile=<token>`` or an
+``X-Profile-Token`` header. That one request is then profiled and the
+results are written to ``PROFILE_OUTPUT_DIR``:
+
+- ``<id>.folded``: stacks of the request thread sampled every
+  ``PROFILE_SAMPLE_INTERVAL`` seconds, in the folded format read by
+  flamegraph.pl and speedscope
+- ``<id>.prof``: a cProfile dump for pstats or snakeviz, when
+  ``_profile_mode=cprofile`` (or ``X-Profile-Mode``) asks for it
+- ``<id>.tracemalloc``: a ``tracemalloc`` snapshot taken at the end of the
+  request, and ``<id>.txt`` with its biggest allocation sites
+
+The response carries the ``<id>`` in an ``X-Profile-Id`` header. Only one
+request is profiled at a time; any others go through untouched. The body
+of a streamed response is sent after profiling has ended.
+"""
+import cProfile
+import os
+import re
+import secrets
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+
+SALT = 'eventbooking.profiling'
+TOKEN_PARAM = '_profile'
+MODE_PARAM = '_profile_mode'
+TOP_ALLOCATIONS = 25  # allocation sites listed in the summary
+
+_profiling = threading.Lock()
+
+
+def make_token(user):
+    return signing.dumps({'u': user.pk}, salt=SALT, compress=True)
+
+
+def _token_user(token):
+    """The staff user a valid, unexpired token was issued to, or ``None``."""
+    try:
+        payload = signing.loads(token, salt=SALT, max_age=getattr(settings, 'PROFILE_TOKEN_MAX_AGE', 3600))
+    except signing.BadSignature:
+        return None
+    return get_user_model().objects.filter(pk=payload['u'], is_active=True, is_staff=True).first()
+
+
+def _fold(frame):
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class StackSampler:
+    """Sample the stack of one thread from a background thread."""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[_fold(frame)] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def write(self, path):
+        with open(path, 'w') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f'{stack} {count}\n')
+
+
+def _write_summary(path, request, response, elapsed, snapshot, sampler):
+    lines = [
+        f'{request.method} {request.path} -> {response.status_code} in {elapsed * 1000:.1f}ms',
+        f'{sum(sampler.stacks.values())} samples every {sampler.interval * 1000:g}ms',
+        '',
+        f'Top {TOP_ALLOCATIONS} allocation sites at the end of the request:',
+    ]
+    snapshot = snapshot.filter_traces([
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+        tracemalloc.Filter(False, tracemalloc.__file__),
+    ])
+    lines += [str(stat) for stat in snapshot.statistics('lineno')[:TOP_ALLOCATIONS]]
+    Path(path).write_text('\n'.join(lines) + '\n')
+
+
+class ProfilingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = request.GET.get(TOKEN_PARAM) or request.headers.get('X-Profile-Token')
+        if not token or _token_user(token) is None or not _profiling.acquire(blocking=False):
+            return self.get_response(request)
+        try:
+            return self._profile(request)
+        finally:
+            _profiling.release()
+
+    def _profile(self, request):
+        mode = request.GET.get(MODE_PARAM) or request.headers.get('X-Profile-Mode', 'sample')
+        output_dir = Path(settings.PROFILE_OUTPUT_DIR)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        slug = re.sub(r'[^A-Za-z0-9]+', '-', request.path).strip('-') or 'root'
+        # The random part keeps two profiles started in the same second apart
+        profile_id = f'{time.strftime("%Y%m%d-%H%M%S")}-{secrets.token_hex(4)}-{request.method.lower()}-{slug}'[:120]
+        base = output_dir / profile_id
+
+        # Someone may already be tracing allocations; leave them running then
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        sampler = StackSampler(threading.get_ident(), getattr(settings, 'PROFILE_SAMPLE_INTERVAL', 0.005))
+        profiler = cProfile.Profile() if mode == 'cprofile' else None
+        started = time.perf_counter()
+        sampler.start()
+        try:
+            if profiler is not None:
+                response = profiler.runcall(self.get_response, request)
+            else:
+                response = self.get_response(request)
+        finally:
+            elapsed = time.perf_counter() - started
+            sampler.stop()
+            snapshot = tracemalloc.take_snapshot()
+            if started_tracing:
+                tracemalloc.stop()
+
+        sampler.write(f'{base}.folded')
+        if profiler is not None:
+            profiler.dump_stats(f'{base}.prof')
+        snapshot.dump(f'{base}.tracemalloc')
+        _write_summary(f'{base}.txt', request, response, elapsed, snapshot, sampler)
+        response['X-Profile-Id'] = profile_id
+        return response
@@ -0,0 +1,193 @@
+"""
+Read-replica and shard routing.
+
+Reads go to one of the aliases in ``DATABASE_REPLICAS`` and writes to
+``default``. A request is pinned to the primary when it is not a safe method,
+while it is inside a transaction on the primary, and for
+``REPLICA_PIN_SECONDS`` after the same browser wrote something, so a visitor
+who has just booked a seat does not read a replica that has not caught up yet.
+
+Events and their rows, seats, tickets and payments are placed on their shard
+by ``ShardRouter`` (see ``tickets.sharding``), which runs before the replica
+router. Shards have no replicas of their own, so with ``DATABASE_SHARDS`` set
+those models are always read from their shard's primary and only the global
+models (users, sessions, coupons, ...) go to ``DATABASE_REPLICAS``. The
+``tickets.W001`` system check warns when both are configured.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+_pinned = ContextVar('replica_pinned', default=False)
+_wrote = ContextVar('replica_wrote', default=False)
+
+
+def get_replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+@contextmanager
+def use_primary():
+    """Send every read inside the block to the primary database."""
+    token = _pinned.set(True)
+    try:
+        yield
+    finally:
+        _pinned.reset(token)
+
+
+def _instance_db(hints):
+    """
+    The database of the ``instance`` hint when these routers do not manage it,
+    e.g. an alias the instance was loaded from with ``using()``.
+    """
+    instance = hints.get('instance')
+    db = instance._state.db if instance is not None else None
+    if db in (DEFAULT_DB_ALIAS, *get_replicas(), *getattr(settings, 'DATABASE_SHARDS', [])):
+        return None
+    return db
+
+
+class ReplicaRouter:
+    """
+    Send reads to a replica and writes to ``default``. Objects loaded from
+    another alias with ``using()`` (the ``instance`` hint) stay on it, and
+    without ``DATABASE_REPLICAS`` the router steps aside entirely.
+    """
+
+    def db_for_read(self, model, **hints):
+        replicas = get_replicas()
+        if not replicas:
+            return None
+        db = _instance_db(hints)
+        if db is not None:
+            return db
+        if _pinned.get() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        replicas = get_replicas()
+        if not replicas:
+            return None
+        _wrote.set(True)
+        db = _instance_db(hints)
+        if db is not None:
+            return db
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        replicas = get_replicas()
+        if not replicas:
+            return None
+        databases = {DEFAULT_DB_ALIAS, *replicas}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema from the primary
+        if db in get_replicas():
+            return False
+        return None
+
+
+class ShardRouter:
+    """
+    Place sharded models (see ``tickets.sharding``) on their event's shard.
+    Everything else is left to the routers after this one.
+    """
+
+    def _db_for(self, model, instance, write=False):
+        from tickets import sharding
+
+        if not sharding.get_shards():
+            return None
+        if sharding.is_mirrored(model):
+            # Categories joined from an event are read from the event's shard
+            if instance is not None and sharding.is_sharded(instance._meta.model):
+                return instance._state.db
+            return None
+        if not sharding.is_sharded(model):
+            if instance is not None and sharding.is_sharded(instance._meta.model) and not get_replicas():
+                # Global rows reached from a sharded one, such as a payment's
+                # user, are on default; with replicas ReplicaRouter picks one
+                return DEFAULT_DB_ALIAS
+            return None
+        if instance is not None and sharding.is_sharded(instance._meta.model):
+            if instance._state.db:
+                return instance._state.db
+            if instance.pk:
+                return sharding.shard_for_pk(instance.pk)
+            parent = sharding.PARENT_FIELDS.get(instance._meta.label_lower)
+            if parent and getattr(instance, parent):
+                return sharding.shard_for_pk(getattr(instance, parent))
+            if isinstance(instance, sharding.Event):
+                return sharding.shard_for_new_event()
+        if write and model is sharding.Event and instance is not None:
+            # Event(venue=...) and venue.events.create() ask with the venue
+            return sharding.shard_for_new_event()
+        # Unqualified queries without a shard land on shard 0; use
+        # sharding.for_pk() or sharding.sharded() to reach the others
+        return DEFAULT_DB_ALIAS
+
+    def db_for_read(self, model, **hints):
+        return self._db_for(model, hints.get('instance'))
+
+    def db_for_write(self, model, **hints):
+        db = self._db_for(model, hints.get('instance'), write=True)
+        if db is not None:
+            _wrote.set(True)
+        return db
+
+    def allow_relation(self, obj1, obj2, **hints):
+        from tickets import sharding
+
+        if not sharding.get_shards():
+            return None
+        # _meta.model rather than type(), which is SimpleLazyObject for request.user
+        sharded1, sharded2 = sharding.is_sharded(obj1._meta.model), sharding.is_sharded(obj2._meta.model)
+        if sharded1 and sharded2:
+            return obj1._state.db == obj2._state.db
+        if sharded1 or sharded2:
+            # Links from sharded rows to global rows (users, categories, ...)
+            return True
+        return None
+
+
+PIN_COOKIE = 'primary_pin'
+
+
+class ReplicaPinMiddleware:
+    """
+    Pin requests that write, and the same browser's requests for
+    ``REPLICA_PIN_SECONDS`` afterwards, to the primary database.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not get_replicas():
+            return self.get_response(request)
+
+        pinned = request.method not in ('GET', 'HEAD', 'OPTIONS') or PIN_COOKIE in request.COOKIES
+        pinned_token = _pinned.set(pinned)
+        wrote_token = _wrote.set(False)
+        try:
+            response = self.get_response(request)
+            if _wrote.get():
+                response.set_cookie(
+                    PIN_COOKIE, '1',
+                    max_age=getattr(settings, 'REPLICA_PIN_SECONDS', 10),
+                    httponly=True,
+                    samesite='Lax',
+                    secure=settings.SESSION_COOKIE_SECURE,
+                )
+        finally:
+            _pinned.reset(pinned_token)
+            _wrote.reset(wrote_token)
+        return response
@@ -10,8 +10,10 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+from decimal import Decimal, InvalidOperation
 from pathlib import Path
 import os
+from django.core.exceptions import ImproperlyConfigured
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -32,7 +34,7 @@ DEBUG = os.environ.get('DEBUG', 'False') == 'True'
 
 
 # Email Configuration
-EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+EMAIL_BACKEND = 'eventbooking.timing.TimedEmailBackend'  # SMTP, timed per request
 EMAIL_HOST = os.environ.get('EMAIL_HOST')
 EMAIL_PORT = int(os.environ.get('EMAIL_PORT', 587))
 EMAIL_USE_TLS = os.environ.get('EMAIL_USE_TLS', 'True') == 'True'
@@ -50,6 +52,9 @@ ALLOWED_HOSTS = ['localhost', '127.0.0.1', 'testserver', '*']
 STRIPE_PUBLISHABLE_KEY = os.environ.get('STRIPE_PUBLISHABLE_KEY')
 STRIPE_SECRET_KEY = os.environ.get('STRIPE_SECRET_KEY')
 STRIPE_WEBHOOK_SECRET = os.environ.get('STRIPE_WEBHOOK_SECRET')
+# Approve payments without calling Stripe, for load tests (see tickets.payments)
+STRIPE_STUB = os.environ.get('STRIPE_STUB', 'False') == 'True'
+STRIPE_STUB_LATENCY = float(os.environ.get('STRIPE_STUB_LATENCY', 0.3))  # Seconds a stubbed call takes
 
 
 # Application definition
@@ -67,7 +72,13 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so its timings cover the whole request
+    'eventbooking.timing.RequestTimingMiddleware',
+    'eventbooking.nplusone.NPlusOneMiddleware',
+    'eventbooking.profiling.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    # Outside SessionMiddleware so session writes also pin the browser to the primary
+    'eventbooking.routers.ReplicaPinMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -101,11 +112,112 @@ WSGI_APPLICATION = 'eventbooking.wsgi.application'
 
 DATABASES = {
     'default': {
+        'ENGINE': os.environ.get('DB_ENGINE', 'django.db.backends.sqlite3'),
+        'NAME': os.environ.get('DB_NAME', BASE_DIR / 'db.sqlite3'),
+        'USER': os.environ.get('DB_USER', ''),
+        'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+        'HOST': os.environ.get('DB_HOST', ''),
+        'PORT': os.environ.get('DB_PORT', ''),
+    }
+}
+
+# PostgreSQL connection handling. Connections are kept open between requests for
+# DB_CONN_MAX_AGE seconds, or, with DB_POOL=True, taken from a psycopg 3 connection
+# pool instead (Django does not allow both). Queries running longer than
+# DB_STATEMENT_TIMEOUT milliseconds are cancelled by the server.
+if DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql':
+    DATABASES['default'].update({
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': os.environ.get('DB_CONN_HEALTH_CHECKS', 'True') == 'True',
+        # QuerySet.iterator() streams through server-side cursors; turn them off
+        # behind PgBouncer in transaction pooling mode
+        'DISABLE_SERVER_SIDE_CURSORS': os.environ.get('DB_DISABLE_SERVER_SIDE_CURSORS', 'False') == 'True',
+        'OPTIONS': {
+            'options': f"-c statement_timeout={int(os.environ.get('DB_STATEMENT_TIMEOUT', 30000))}",
+        },
+    })
+    if os.environ.get('DB_POOL', 'False') == 'True':
+        DATABASES['default']['CONN_MAX_AGE'] = 0
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', 2)),
+            'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', 10)),
+            'timeout': int(os.environ.get('DB_POOL_TIMEOUT', 10)),  # seconds to wait for a free connection
+        }
+
+# Opt-in SQLite profile for production (WAL, busy timeout, IMMEDIATE transactions).
+# The pragmas are applied by tickets.sqlite_profile and can be tuned with SQLITE_PRAGMAS.
+SQLITE_PROFILE_DATABASES = []
+if os.environ.get('SQLITE_PROFILE', 'False') == 'True' and DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    DATABASES['default']['OPTIONS'] = {
+        'transaction_mode': 'IMMEDIATE',
+        'timeout': 20,  # seconds to wait for the write lock
+    }
+    SQLITE_PROFILE_DATABASES = ['default']
+
+
+def _secondary_database(location):
+    """
+    Settings for another database on the same server setup as ``default``:
+    a SQLite file path, or for PostgreSQL "name", "host/name" or "host:port/name".
+    """
+    config = {**DATABASES['default']}
+    if config['ENGINE'] == 'django.db.backends.sqlite3':
+        config['NAME'] = location.strip()
+    else:
+        host, _, config['NAME'] = location.strip().rpartition('/')
+        if host:
+            config['HOST'], _, port = host.partition(':')
+            config['PORT'] = port or config['PORT']
+    return config
+
+
+# Read replicas, as a comma-separated DB_REPLICAS list. Reads are routed to them
+# by eventbooking.routers, except for REPLICA_PIN_SECONDS after a browser has
+# written something.
+DATABASE_REPLICAS = []
+for index, location in enumerate(filter(None, os.environ.get('DB_REPLICAS', '').split(','))):
+    DATABASES[f'replica{index + 1}'] = {**_secondary_database(location), 'TEST': {'MIRROR': 'default'}}
+    DATABASE_REPLICAS.append(f'replica{index + 1}')
+REPLICA_PIN_SECONDS = int(os.environ.get('REPLICA_PIN_SECONDS', 10))
+
+# Event shards, as a comma-separated DB_SHARDS list. The default database is
+# always shard 0; run "manage.py init_shards" after adding one (see tickets.sharding).
+# Shards have no replicas: sharded models are read from their shard even with
+# DB_REPLICAS set, which then only serve the global tables.
+DATABASE_SHARDS = []
+if os.environ.get('DB_SHARDS'):
+    DATABASE_SHARDS.append('default')
+    for index, location in enumerate(filter(None, os.environ['DB_SHARDS'].split(','))):
+        DATABASES[f'shard{index + 1}'] = _secondary_database(location)
+        DATABASE_SHARDS.append(f'shard{index + 1}')
+    if 'default' in SQLITE_PROFILE_DATABASES:
+        SQLITE_PROFILE_DATABASES += DATABASE_SHARDS[1:]
+
+DATABASE_ROUTERS = ['eventbooking.routers.ShardRouter', 'eventbooking.routers.ReplicaRouter']
+
+# The old SQLite file, read by "manage.py migrate_to_postgres" (see POSTGRESQL_SETUP.md)
+if os.environ.get('SQLITE_SOURCE_PATH'):
+    DATABASES['sqlite_source'] = {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': os.environ['SQLITE_SOURCE_PATH'],
+    }
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
     }
 }
 
+# Sessions
+# The database engine issues a query per session write. In production switch to
+# 'django.contrib.sessions.backends.cached_db' or
+# 'django.contrib.sessions.backends.signed_cookies'.
+SESSION_ENGINE = os.environ.get('SESSION_ENGINE', 'django.contrib.sessions.backends.db')
 
 
 # Password validation
@@ -151,6 +263,62 @@ LOGIN_URL = 'login'
 LOGIN_REDIRECT_URL = 'home'
 LOGOUT_REDIRECT_URL = 'login'
 
+# Shared HTTP caching of public pages
+# When non-zero, GETs of the home page, event list and event detail are
+# rendered as anonymous without loading the session and sent with public
+# Cache-Control and ETag headers so a reverse proxy can serve them.
+PUBLIC_PAGE_CACHE_SECONDS = int(os.environ.get('PUBLIC_PAGE_CACHE_SECONDS', 0))
+
+# Request timings (see eventbooking.timing)
+# Server-Timing headers show browsers' dev tools query counts and SQL time
+SERVER_TIMING_HEADER = os.environ.get('SERVER_TIMING_HEADER', str(DEBUG)) == 'True'
+SLOW_REQUEST_MS = int(os.environ.get('SLOW_REQUEST_MS', 1000))  # Logged with their slowest SQL
+
+# N+1 query detection (see eventbooking.nplusone): 'off', 'log' or 'raise'
+NPLUSONE_MODE = os.environ.get('NPLUSONE_MODE', 'log' if DEBUG else 'off')
+NPLUSONE_THRESHOLD = int(os.environ.get('NPLUSONE_THRESHOLD', 5))  # Repeats of one query per request
+
+# On-demand profiling of single requests by staff (see eventbooking.profiling)
+PROFILE_OUTPUT_DIR = os.environ.get('PROFILE_OUTPUT_DIR', str(BASE_DIR / 'profiles'))
+PROFILE_TOKEN_MAX_AGE = 60 * 60  # Seconds a token from "manage.py profile_token" is valid
+PROFILE_SAMPLE_INTERVAL = 0.005  # Seconds between stack samples
+
+# Metrics (see eventbooking.metrics), served in the Prometheus text format at /metrics
+# A directory shared by the worker processes of one server, so that /metrics
+# adds up all of them; without it each process reports its own counts
+METRICS_DIR = os.environ.get('METRICS_DIR', '')
+METRICS_FLUSH_INTERVAL = 5  # Seconds between writes of a process's counts to METRICS_DIR
+# Scrapers send "Authorization: Bearer <METRICS_TOKEN>"; /metrics is off without it
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# Logging: JSON lines written by a background thread (see eventbooking.logs)
+# to LOG_FILE, or to stderr when it is not set. Warnings and up by default;
+# LOG_LEVEL=INFO adds a line per request (see eventbooking.timing). Booking
+# funnel steps (see tickets.funnel) are logged at FUNNEL_LOG_LEVEL either way.
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'json': {'()': 'eventbooking.logs.JsonFormatter'},
+    },
+    'handlers': {
+        'json': {
+            'class': 'eventbooking.logs.BatchingQueueHandler',
+            'formatter': 'json',
+            'path': os.environ.get('LOG_FILE', ''),
+            'capacity': 10000,  # Records queued before new ones are dropped
+            'batch_size': 200,
+        },
+    },
+    'loggers': {
+        'tickets.funnel': {'level': os.environ.get('FUNNEL_LOG_LEVEL', 'INFO')},
+    },
+    'root': {
+        'handlers': ['json'],
+        'level': os.environ.get('LOG_LEVEL', 'WARNING'),
+    },
+}
+
 # Messages Framework
 MESSAGE_STORAGE = 'django.contrib.messages.storage.session.SessionStorage'
 
@@ -166,9 +334,34 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 SESSION_COOKIE_AGE = 300  # 5 minutes for checkout sessions
 CSRF_COOKIE_SECURE = False  # Set to True in production with HTTPS
 SESSION_COOKIE_SECURE = False  # Set to True in production with HTTPS
+CHECKOUT_STATE_MAX_AGE = SESSION_COOKIE_AGE  # Lifetime of the signed checkout token
 
 # Tax Configuration
-TAX_RATE = 0.15  # 15% tax rate
+# 15% tax rate, applied by tickets.pricing. Parsed here so a bad value stops
+# the server at startup rather than failing the first checkout
+try:
+    TAX_RATE = Decimal(os.environ.get('TAX_RATE', '0.15'))
+    valid_tax_rate = TAX_RATE.is_finite() and 0 <= TAX_RATE < 1
+except InvalidOperation:
+    valid_tax_rate = False
+if not valid_tax_rate:
+    raise ImproperlyConfigured(f"TAX_RATE must be a decimal fraction such as 0.15, not {os.environ['TAX_RATE']!r}.")
+
+# Dynamic Pricing
+# (minimum sell-through, multiplier of the row's base price) steps used by the
+# reprice_events command
+DYNAMIC_PRICING_CURVES = {
+    'default': [(0.0, 1.0), (0.5, 1.1), (0.75, 1.25), (0.9, 1.5)],
+    'clearance': [(0.0, 0.8), (0.25, 0.9), (0.5, 1.0)],
+}
+
+# Seat Maps
+# Events with more seats than this get the tiled, zoomable seat map (see tickets.seatmap)
+SEATMAP_TILED_SEATS = int(os.environ.get('SEATMAP_TILED_SEATS', 2000))
+SEATMAP_TILE_CACHE_SECONDS = 24 * 60 * 60
+SEATMAP_MAX_VIEWPORT_SEATS = 5000  # Above this the viewer shows tiles only until zoomed in
+# Smaller events with more seats than this stream their ticket list (see tickets.views.event_detail)
+EVENT_DETAIL_STREAMING_SEATS = int(os.environ.get('EVENT_DETAIL_STREAMING_SEATS', 500))
 
 # Payment Settings
 PAYMENT_METHODS = {
@@ -182,3 +375,5 @@ PAYMENT_METHODS = {
 
 # Coupon Settings
 COUPON_EXPIRY_WARNING_DAYS = 7  # Warn users when coupon expires soon
+COUPON_CACHE_TTL = 60  # Seconds a coupon lookup is cached in each worker process
+COUPON_COUNTER_SHARDS = 8  # Striped redemption counter rows per coupon
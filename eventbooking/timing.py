@@ -0,0 +1,223 @@
+"""
+Per-request timings.
+
+``RequestTimingMiddleware`` counts the queries, SQL time, cache hits and
+misses and the time spent calling other services (``timed('stripe')``,
+e-mail through ``TimedEmailBackend``) of every request. The totals go out
+as a ``Server-Timing`` header when ``SERVER_TIMING_HEADER`` is on, as a
+line on the ``eventbooking.timing`` logger and into the request duration and
+cache metrics of ``eventbooking.metrics``. Requests slower than
+``SLOW_REQUEST_MS`` are logged as warnings with their slowest statements.
+
+Recording is a couple of clock reads per query or cache call, cheap enough
+to leave on in production. Queries run in sharding fan-out threads are
+counted for the request that started them.
+"""
+import heapq
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import BaseCache
+from django.core.mail.backends.smtp import EmailBackend
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+SLOWEST_QUERIES = 5  # statements kept per request for the slow request log
+_MISSING = object()
+
+_current = ContextVar('request_timings', default=None)
+
+
+class RequestTimings:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.cache_seconds = 0.0
+        self.external = {}  # service -> seconds
+        self.slowest = []  # heap of (seconds, sql)
+        # Fan-out threads record into the same object
+        self.lock = threading.Lock()
+
+    def add_query(self, sql, seconds):
+        with self.lock:
+            self.queries += 1
+            self.sql_seconds += seconds
+            if len(self.slowest) < SLOWEST_QUERIES:
+                heapq.heappush(self.slowest, (seconds, sql))
+            elif seconds > self.slowest[0][0]:
+                heapq.heapreplace(self.slowest, (seconds, sql))
+
+    def add_cache(self, hits, misses, seconds):
+        with self.lock:
+            self.cache_hits += hits
+            self.cache_misses += misses
+            self.cache_seconds += seconds
+
+    def add_external(self, service, seconds):
+        with self.lock:
+            self.external[service] = self.external.get(service, 0.0) + seconds
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def server_timing(self):
+        metrics = [
+            f'db;dur={self.sql_seconds * 1000:.1f};desc="{self.queries} queries"',
+            f'cache;dur={self.cache_seconds * 1000:.1f};desc="{self.cache_hits} hits, {self.cache_misses} misses"',
+        ]
+        metrics += [f'{service};dur={seconds * 1000:.1f}' for service, seconds in self.external.items()]
+        metrics.append(f'total;dur={self.elapsed() * 1000:.1f}')
+        return ', '.join(metrics)
+
+    def as_dict(self):
+        return {
+            'duration_ms': round(self.elapsed() * 1000, 1),
+            'queries': self.queries,
+            'sql_ms': round(self.sql_seconds * 1000, 1),
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+            'cache_ms': round(self.cache_seconds * 1000, 1),
+            **{f'{service}_ms': round(seconds * 1000, 1) for service, seconds in self.external.items()},
+        }
+
+
+def current():
+    """The ``RequestTimings`` of the request being handled, or ``None``."""
+    return _current.get()
+
+
+@contextmanager
+def timed(service):
+    """Count the time spent in the block as a call to ``service``, e.g. ``'stripe'``."""
+    timings = _current.get()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if timings is not None:
+            timings.add_external(service, time.perf_counter() - started)
+
+
+def _record_query(execute, sql, params, many, context):
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.add_query(sql, time.perf_counter() - started)
+
+
+@receiver(connection_created)
+def _install_query_recorder(sender, connection, **kwargs):
+    # The wrapper list outlives reconnects of the same connection object.
+    # Going first keeps connection.execute_wrapper() blocks, which pop the
+    # last wrapper, from removing it.
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, _record_query)
+
+
+def _instrument_cache_backend(backend_class):
+    """Count hits and misses of ``get``/``get_many`` on a cache backend class."""
+    if getattr(backend_class, '_timed', False):
+        return
+    get, get_many = backend_class.get, backend_class.get_many
+
+    def timed_get(self, key, default=None, version=None):
+        timings = _current.get()
+        if timings is None:
+            return get(self, key, default, version)
+        started = time.perf_counter()
+        value = get(self, key, _MISSING, version)
+        hit = value is not _MISSING
+        timings.add_cache(int(hit), int(not hit), time.perf_counter() - started)
+        return value if hit else default
+
+    def timed_get_many(self, keys, version=None):
+        timings = _current.get()
+        if timings is None:
+            return get_many(self, keys, version)
+        keys = list(keys)
+        started = time.perf_counter()
+        values = get_many(self, keys, version)
+        timings.add_cache(len(values), len(keys) - len(values), time.perf_counter() - started)
+        return values
+
+    backend_class.get = timed_get
+    # The default get_many() calls get() for each key, which is already counted
+    if get_many is not BaseCache.get_many:
+        backend_class.get_many = timed_get_many
+    backend_class._timed = True
+
+
+class TimedEmailBackend(EmailBackend):
+    """The SMTP backend, with sending counted as ``smtp`` time."""
+
+    def send_messages(self, email_messages):
+        with timed('smtp'):
+            return super().send_messages(email_messages)
+
+
+class RequestTimingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        for alias in settings.CACHES:
+            _instrument_cache_backend(type(caches[alias]))
+        for connection in connections.all(initialized_only=True):
+            _install_query_recorder(sender=None, connection=connection)
+
+    def __call__(self, request):
+        timings = RequestTimings()
+        token = _current.set(timings)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+
+        if getattr(settings, 'SERVER_TIMING_HEADER', False):
+            response['Server-Timing'] = timings.server_timing()
+        if response.streaming:
+            # Streamed bodies query while they are sent, after this returns
+            response.streaming_content = self._finish_streaming(response.streaming_content, request, response,
+                                                                timings)
+        else:
+            self._finish(request, response, timings)
+        return response
+
+    def _finish_streaming(self, content, request, response, timings):
+        _current.set(timings)
+        try:
+            yield from content
+        finally:
+            _current.set(None)
+            self._finish(request, response, timings)
+
+    def _finish(self, request, response, timings):
+        metrics.record_request(request, response, timings)
+        self._log(request, response, timings)
+
+    def _log(self, request, response, timings):
+        fields = {'method': request.method, 'path': request.path, 'status': response.status_code,
+                  **timings.as_dict()}
+        message = ' '.join(f'{name}={value}' for name, value in fields.items())
+        if fields['duration_ms'] < getattr(settings, 'SLOW_REQUEST_MS', 1000):
+            logger.info(message, extra={'timings': fields})
+            return
+        slowest = sorted(timings.slowest, reverse=True)
+        queries = '\n'.join(f'  {seconds * 1000:.1f}ms {sql}' for seconds, sql in slowest)
+        logger.warning('Slow request %s\n%s', message, queries,
+                       extra={'timings': fields, 'slowest_queries': [[round(s * 1000, 1), sql] for s, sql in slowest]})
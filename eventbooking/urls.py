@@ -18,6 +18,7 @@ from django.contrib import admin
 from django.urls import include, path
 from django.conf import settings
 from django.conf.urls.static import static
+from eventbooking import metrics
 from tickets import views
 
 urlpatterns = [
@@ -30,6 +31,7 @@ urlpatterns = [
     path('contact/', include('contactus.urls')), 
     # path('checkout/<int:event_id>/', views.checkout_view, name='checkout'),
     path('checkout/<int:ticket_id>/', views.checkout, name='checkout'),
+    path('metrics', metrics.metrics_view, name='metrics'),
     # path('checkout/<int:event_id>/', views.checkout_view, name='checkout'),
 ]
 
@@ -1,10 +1,147 @@
-from django.contrib import admin
-from .models import Event, SeatRow, Seat, Ticket, Coupon, Payment, Category
+import csv
+from datetime import timedelta
+
+from django import forms
+from django.contrib import admin, messages
+from django.http import StreamingHttpResponse
+from django.template.response import TemplateResponse
+from django.utils import timezone
+
+from . import coupons
+from .models import (
+    ArchivedSeatRow, ArchivedTicket, Event, SeatRow, Seat, Ticket, Coupon, Payment, Category, Venue, VenueRow,
+    VenueSeat, VenueSection,
+)
+
+
+class Echo:
+    """File-like object that hands back what is written, for streaming CSV."""
+    def write(self, value):
+        return value
+
+
+# Codes the admin action creates in one request; bigger batches go through
+# the generate_coupons command, which has no request or statement timeout
+ADMIN_GENERATE_MAX = 10000
+
+
+class GenerateCouponsForm(forms.Form):
+    count = forms.IntegerField(
+        min_value=1, max_value=ADMIN_GENERATE_MAX, initial=1000,
+        help_text=f'Up to {ADMIN_GENERATE_MAX}. For more, run "manage.py generate_coupons".',
+    )
+    prefix = forms.CharField(max_length=10, required=False)
+    length = forms.IntegerField(min_value=6, max_value=20, initial=10)
+    valid_days = forms.IntegerField(min_value=1, initial=30)
+
+
+@admin.register(Coupon)
+class CouponAdmin(admin.ModelAdmin):
+    list_display = ('code', 'discount_percent', 'valid_until', 'max_redemptions', 'max_per_user', 'times_redeemed')
+    search_fields = ('code',)
+    readonly_fields = ('times_redeemed',)
+    actions = ['export_as_csv', 'generate_like_selected']
+
+    @admin.action(description='Export selected coupons as CSV')
+    def export_as_csv(self, request, queryset):
+        writer = csv.writer(Echo())
+        response = StreamingHttpResponse(
+            (writer.writerow(row) for row in coupons.iter_csv_rows(queryset)),
+            content_type='text/csv',
+        )
+        response['Content-Disposition'] = 'attachment; filename="coupons.csv"'
+        return response
+
+    @admin.action(description='Generate new codes with the same discount and limits')
+    def generate_like_selected(self, request, queryset):
+        if queryset.count() != 1:
+            self.message_user(request, 'Select exactly one coupon to copy.', messages.WARNING)
+            return None
+        template = queryset.get()
+
+        form = GenerateCouponsForm(request.POST if 'apply' in request.POST else None)
+        if form.is_valid():
+            valid_until = timezone.now() + timedelta(days=form.cleaned_data['valid_days'])
+            created = 0
+            try:
+                for codes in coupons.generate_codes(form.cleaned_data['count'], form.cleaned_data['length'],
+                                                    form.cleaned_data['prefix']):
+                    created += coupons.create_coupons(
+                        Coupon(code=code, discount_percent=template.discount_percent, valid_until=valid_until,
+                               max_redemptions=template.max_redemptions, max_per_user=template.max_per_user)
+                        for code in codes
+                    )
+            except ValueError as e:
+                self.message_user(request, str(e), messages.ERROR)
+                return None
+            self.message_user(request, f'Created {created} coupons like {template.code}.', messages.SUCCESS)
+            return None
+
+        return TemplateResponse(request, 'admin/tickets/coupon/generate_codes.html', {
+            **self.admin_site.each_context(request),
+            'title': f'Generate codes like {template.code}',
+            'opts': self.model._meta,
+            'form': form,
+            'coupon': template,
+            'action_checkbox_name': admin.helpers.ACTION_CHECKBOX_NAME,
+        })
+
+
+class VenueSectionInline(admin.TabularInline):
+    model = VenueSection
+    extra = 0
+
+
+@admin.register(Venue)
+class VenueAdmin(admin.ModelAdmin):
+    list_display = ('name', 'location')
+    search_fields = ('name', 'location')
+    inlines = [VenueSectionInline]
+
+
+class VenueSeatInline(admin.TabularInline):
+    model = VenueSeat
+    extra = 0
+
+
+@admin.register(VenueRow)
+class VenueRowAdmin(admin.ModelAdmin):
+    list_display = ('name', 'section', 'sort_key', 'price')
+    list_filter = ('section__venue',)
+    list_select_related = ('section__venue',)
+    ordering = ('section__venue', 'section__sort_order', 'sort_key')
+    inlines = [VenueSeatInline]
+
+
+# The __str__ of these models follows foreign keys, so the change lists
+# select them up front instead of querying once per row
+
+
+@admin.register(SeatRow)
+class SeatRowAdmin(admin.ModelAdmin):
+    list_select_related = ('event',)
+
+
+@admin.register(Seat)
+class SeatAdmin(admin.ModelAdmin):
+    list_select_related = ('row',)
+
+
+@admin.register(Ticket)
+class TicketAdmin(admin.ModelAdmin):
+    list_select_related = ('seat__row',)
+
+
+@admin.register(Payment)
+class PaymentAdmin(admin.ModelAdmin):
+    list_select_related = ('user',)
+
+
+@admin.register(ArchivedSeatRow)
+class ArchivedSeatRowAdmin(admin.ModelAdmin):
+    list_select_related = ('event',)
+
 
 admin.site.register(Event)
 admin.site.register(Category)
-admin.site.register(SeatRow)
-admin.site.register(Seat)
-admin.site.register(Ticket)
-admin.site.register(Coupon)
-admin.site.register(Payment)
+admin.site.register(ArchivedTicket)
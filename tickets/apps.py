@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class TicketsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'tickets'
+
+    def ready(self):
+        # Connect the cache invalidation, category mirroring and SQLite profile signals
+        from . import caching, coupons, sharding, sqlite_profile  # noqa: F401
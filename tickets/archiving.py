@@ -0,0 +1,111 @@
+"""
+Archiving past events.
+
+Once an event is over its seats are never booked again, but ``Seat`` and
+``Ticket`` keep a row per seat forever. ``archive_event`` replaces a past
+event's inventory with one ``ArchivedSeatRow`` summary per row and one
+``ArchivedTicket`` per sold ticket, linked to its payment and user, so
+payments and ticket history stay queryable while the hot tables only hold
+upcoming inventory.
+"""
+from itertools import islice
+
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from . import sharding
+from .caching import bump_event_versions
+from .models import ArchivedSeatRow, ArchivedTicket, Event, Payment, Seat, SeatRow, Ticket
+from .pricing import ZERO
+
+
+def archivable_events(before):
+    """Ids of the events that ended before ``before`` and still have their inventory."""
+    return sharding.collect(
+        Event.objects.filter(date__lt=before, archived_at__isnull=True).order_by('date').values_list('id', flat=True)
+    )
+
+
+class NotArchivable(Exception):
+    pass
+
+
+def _event_db(event_id):
+    # Read and write on the primary (or the event's shard), never a replica
+    return sharding.shard_for_pk(event_id) if sharding.get_shards() else DEFAULT_DB_ALIAS
+
+
+def check_archivable(event_id, before, using=None, lock=False):
+    """Raise ``NotArchivable`` unless the event ended before ``before`` and still has its inventory."""
+    db = using or _event_db(event_id)
+    events = Event.objects.using(db).select_for_update() if lock else Event.objects.using(db)
+    event = events.filter(pk=event_id).values('date', 'archived_at').first() if db else None
+    if event is None:
+        raise NotArchivable(f'Event {event_id} does not exist.')
+    if event['archived_at'] is not None:
+        raise NotArchivable(f'Event {event_id} is already archived.')
+    if event['date'] >= before:
+        raise NotArchivable(f'Event {event_id} takes place on {event["date"]:%Y-%m-%d %H:%M}, '
+                            f'after the cut-off of {before:%Y-%m-%d %H:%M}.')
+
+
+def archive_event(event_id, before=None, batch_size=2000, dry_run=False):
+    """
+    Archive one event's rows, seats and tickets in a single transaction on its
+    shard. Returns ``(rows, seats, tickets)`` archived. Raises ``NotArchivable``
+    unless the event ended before ``before`` (default: now) and is not
+    archived yet, so live inventory is never deleted.
+    """
+    before = before or timezone.now()
+    db = _event_db(event_id)
+    rows = SeatRow.objects.using(db).filter(event_id=event_id)
+    seats = Seat.objects.using(db).filter(row__event_id=event_id)
+    tickets = Ticket.objects.using(db).filter(seat__row__event_id=event_id)
+    sold = tickets.filter(seat__is_booked=True)
+    if dry_run:
+        check_archivable(event_id, before, db)
+        return rows.count(), seats.count(), sold.count()
+
+    with transaction.atomic(using=db):
+        # Locked so that a concurrent reschedule or archive run cannot slip in
+        check_archivable(event_id, before, db, lock=True)
+        summaries = [
+            ArchivedSeatRow(event_id=event_id, name=row.name, capacity=row.capacity, price=row.price,
+                            seats_sold=row.seats_sold, revenue=row.revenue or ZERO)
+            for row in rows.annotate(
+                seats_sold=Count('seats', filter=Q(seats__is_booked=True)),
+                revenue=Sum('seats__ticket__price', filter=Q(seats__is_booked=True)),
+            )
+        ]
+        ArchivedSeatRow.objects.using(db).bulk_create(summaries)
+
+        through = Payment.tickets.through.objects.using(db).filter(ticket__seat__row__event_id=event_id)
+        payments = dict(through.values_list('ticket_id', 'payment_id'))
+        archived = (
+            ArchivedTicket(event_id=event_id, user_id=user_id, payment_id=payments.get(ticket_id),
+                           ticket_id=ticket_id, row_name=row_name, seat_number=seat_number,
+                           price=price, booked_at=booked_at)
+            for ticket_id, user_id, row_name, seat_number, price, booked_at in sold.values_list(
+                'id', 'user_id', 'seat__row__name', 'seat__number', 'price', 'booked_at'
+            ).iterator(chunk_size=batch_size)
+        )
+        # bulk_create() would turn the whole generator into a list first
+        ticket_count = 0
+        while chunk := list(islice(archived, batch_size)):
+            ArchivedTicket.objects.using(db).bulk_create(chunk)
+            ticket_count += len(chunk)
+
+        # Children first; raw deletes skip loading every seat and ticket into
+        # memory, which the cascading delete() would do
+        seat_count = seats.count()
+        row_count = len(summaries)
+        through._raw_delete(db)
+        tickets._raw_delete(db)
+        seats._raw_delete(db)
+        rows._raw_delete(db)
+        Event.objects.using(db).filter(pk=event_id).update(archived_at=timezone.now())
+
+    # The raw deletes do not send the signals that normally invalidate caches
+    bump_event_versions([event_id])
+    return row_count, seat_count, ticket_count
@@ -0,0 +1,47 @@
+"""
+Booking a paid ticket.
+
+The seat is claimed with a conditional UPDATE, so two checkouts that pay for
+the same seat at the same moment cannot both book it: the second one updates
+no rows and gets ``SeatUnavailable``.
+"""
+from django.db import transaction
+
+from eventbooking import metrics
+
+from . import sharding
+from .models import Payment, Seat
+
+SEATS_BOOKED = metrics.Counter('seats_booked_total', 'Seats booked and paid for.')
+
+
+class SeatUnavailable(Exception):
+    pass
+
+
+def book_ticket(ticket, user, amount, stripe_payment_id, using=None):
+    """Mark ``ticket``'s seat as booked and record the payment for it."""
+    # The payment is stored on the ticket's shard
+    using = using or sharding.shard_of(ticket)
+    with transaction.atomic(using=using):
+        claimed = Seat.objects.using(using).filter(pk=ticket.seat_id, is_booked=False).update(is_booked=True)
+        if not claimed:
+            raise SeatUnavailable('This ticket has just been booked by someone else.')
+        ticket.seat.is_booked = True
+
+        if user is not None and user.is_authenticated:
+            ticket.user = user
+            ticket.save(using=using, update_fields=['user'])
+        else:
+            user = None
+
+        payment = Payment.objects.using(using).create(
+            user=user,
+            amount=amount,
+            status='completed',
+            stripe_payment_id=stripe_payment_id,
+        )
+        payment.tickets.add(ticket)
+        # Not counted if a surrounding transaction rolls the booking back
+        transaction.on_commit(SEATS_BOOKED.inc, using=using)
+    return payment
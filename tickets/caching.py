@@ -0,0 +1,45 @@
+"""
+Per-event cache versions.
+
+Anything cached for an event (price tables, seat maps, ...) is keyed with the
+event's current version, so bumping the version invalidates all of it at
+once without having to know every key.
+"""
+import time
+
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import SeatRow
+
+
+def _version_key(event_id):
+    return f'event:{event_id}:version'
+
+
+def get_event_version(event_id):
+    version = cache.get(_version_key(event_id))
+    if version is None:
+        # A fresh value rather than 1, so entries cached under a version that
+        # has since been evicted can never be picked up again
+        version = time.time_ns()
+        cache.add(_version_key(event_id), version, timeout=None)
+        version = cache.get(_version_key(event_id), version)
+    return version
+
+
+def bump_event_versions(event_ids):
+    version = time.time_ns()
+    cache.set_many({_version_key(event_id): version for event_id in event_ids}, timeout=None)
+
+
+def event_cache_key(event_id, name):
+    return f'event:{event_id}:{name}:{get_event_version(event_id)}'
+
+
+@receiver(post_save, sender=SeatRow)
+@receiver(post_delete, sender=SeatRow)
+def _bump_on_row_change(sender, instance, raw=False, **kwargs):
+    if not raw:
+        bump_event_versions([instance.event_id])
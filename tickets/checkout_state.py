@@ -0,0 +1,75 @@
+"""
+Signed checkout state.
+
+Checkout pricing used to be written into ``request.session`` on every GET of
+the checkout page. It now travels with the page as a compact signed token
+that is posted back with the coupon and payment requests, so nothing is
+written server-side until the state actually changes.
+"""
+from decimal import Decimal
+
+from django.conf import settings
+from django.core import signing
+from django.utils.crypto import get_random_string
+
+from eventbooking import metrics
+
+SALT = 'tickets.checkout_state'
+
+CHECKOUTS_EXPIRED = metrics.Counter(
+    'checkout_expired_total', 'Checkout pages posted back after CHECKOUT_STATE_MAX_AGE, which must be reloaded.'
+)
+
+
+def get_max_age():
+    return getattr(settings, 'CHECKOUT_STATE_MAX_AGE', settings.SESSION_COOKIE_AGE)
+
+
+def new_checkout_id():
+    """An id for one checkout, linking its steps in the funnel logs (see ``tickets.funnel``)."""
+    return get_random_string(12)
+
+
+def dump_state(ticket_id, subtotal, tax_amount, discount_amount=Decimal('0.00'), coupon_code='', checkout_id=''):
+    """Return a signed token holding the pricing state for ``ticket_id``."""
+    payload = {
+        't': ticket_id,
+        's': str(subtotal),
+        'x': str(tax_amount),
+        'd': str(discount_amount),
+    }
+    if coupon_code:
+        payload['c'] = coupon_code
+    if checkout_id:
+        payload['f'] = checkout_id
+    return signing.dumps(payload, salt=SALT, compress=True)
+
+
+def load_state(token, ticket_id=None):
+    """
+    Verify ``token`` and return its state as a dict of Decimals, or ``None``
+    if it is missing, tampered with, expired or issued for another ticket.
+    """
+    if not token:
+        return None
+    try:
+        payload = signing.loads(token, salt=SALT, max_age=get_max_age())
+    except signing.SignatureExpired:
+        CHECKOUTS_EXPIRED.inc()
+        return None
+    except signing.BadSignature:
+        return None
+    if ticket_id is not None and payload.get('t') != ticket_id:
+        return None
+    subtotal = Decimal(payload['s'])
+    tax_amount = Decimal(payload['x'])
+    discount_amount = Decimal(payload['d'])
+    return {
+        'ticket_id': payload['t'],
+        'subtotal': subtotal,
+        'tax_amount': tax_amount,
+        'discount_amount': discount_amount,
+        'total_amount': subtotal + tax_amount - discount_amount,
+        'coupon_code': payload.get('c', ''),
+        'checkout_id': payload.get('f', ''),
+    }
@@ -0,0 +1,309 @@
+"""
+Coupon lookups shared by the checkout views and ``CouponForm``.
+
+Coupons are read far more often than they change, so lookups go through a
+small in-process TTL cache. Unknown codes are cached too, so a flood of bad
+guesses during a promo does not turn into a flood of queries. The cache is
+cleared whenever a coupon is saved or deleted in this process; other worker
+processes pick up the change once ``COUPON_CACHE_TTL`` runs out.
+
+Redemption limits are enforced at payment time against striped
+``CouponCounter`` rows. With a usage cap each stripe owns a fixed share of it
+and is only incremented while below its share, so the cap holds exactly
+without every checkout updating the same row. The number of stripes is fixed
+on the coupon when its counters are created; when the cap is changed
+afterwards the uses counted so far are spread over the new shares.
+
+``max_per_user`` is checked when a use is reserved, and again with the
+user's row locked when the redemption is recorded in the booking
+transaction, so parallel checkouts of one account cannot both get past it.
+Coupons with a per-user limit need a signed-in customer.
+
+Codes for partner campaigns are minted in bulk with ``generate_codes`` and
+``create_coupons``, which work chunk by chunk so millions of codes never have
+to be held in memory at once. Codes that already exist are skipped, and only
+the codes actually created are reported.
+"""
+import random
+import secrets
+import threading
+import time
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, Sum, When
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Coupon, CouponCounter, CouponRedemption
+
+_cache = {}
+_lock = threading.Lock()
+
+
+class InvalidCoupon(Exception):
+    pass
+
+
+def get_coupon(code):
+    """Return the ``Coupon`` for ``code`` (case-insensitive), or ``None``."""
+    code = code.strip().upper()
+    now = time.monotonic()
+    entry = _cache.get(code)
+    if entry is not None and entry[1] > now:
+        return entry[0]
+
+    coupon = Coupon.objects.filter(code=code).first()
+    with _lock:
+        if len(_cache) >= getattr(settings, 'COUPON_CACHE_MAX_ENTRIES', 10000):
+            _cache.clear()
+        _cache[code] = (coupon, now + getattr(settings, 'COUPON_CACHE_TTL', 60))
+    return coupon
+
+
+def validate_coupon(code):
+    """Return the active coupon for ``code`` or raise ``InvalidCoupon``."""
+    coupon = get_coupon(code)
+    if coupon is None:
+        raise InvalidCoupon('Invalid coupon code.')
+    if coupon.valid_until < timezone.now():
+        raise InvalidCoupon('This coupon has expired.')
+    if coupon.max_redemptions is not None and count_uses(coupon) >= coupon.max_redemptions:
+        raise InvalidCoupon('This coupon has reached its usage limit.')
+    return coupon
+
+
+def count_uses(coupon):
+    """Uses of ``coupon`` claimed so far, including checkouts still paying."""
+    return CouponCounter.objects.filter(coupon=coupon).aggregate(used=Sum('count'))['used'] or 0
+
+
+def get_counter_shards(coupon):
+    """Number of counter stripes of ``coupon``, creating them if needed."""
+    if coupon.counter_shards is None:
+        ensure_counters(coupon)
+    return coupon.counter_shards
+
+
+def _shard_quota(coupon, shard, shards):
+    base, extra = divmod(coupon.max_redemptions, shards)
+    return base + (1 if shard < extra else 0)
+
+
+def _check_per_user_limit(coupon, user):
+    if coupon.max_per_user is None:
+        return
+    if user is None or not user.is_authenticated:
+        raise InvalidCoupon('Sign in to use this coupon.')
+    used = CouponRedemption.objects.filter(coupon=coupon, user=user).count()
+    if used >= coupon.max_per_user:
+        raise InvalidCoupon('You have already used this coupon the maximum number of times.')
+
+
+def reserve_redemption(coupon, user=None):
+    """
+    Claim one use of ``coupon`` and return the counter stripe it was taken
+    from. Raises ``InvalidCoupon`` when a usage limit has been reached.
+    """
+    _check_per_user_limit(coupon, user)
+
+    shards = get_counter_shards(coupon)
+    start = random.randrange(shards)
+    for attempt in range(2):
+        for offset in range(shards):
+            shard = (start + offset) % shards
+            counters = CouponCounter.objects.filter(coupon=coupon, shard=shard)
+            if coupon.max_redemptions is not None:
+                counters = counters.filter(count__lt=_shard_quota(coupon, shard, shards))
+            if counters.update(count=F('count') + 1):
+                return shard
+            if coupon.max_redemptions is None:
+                break
+        # Counter rows may be missing, e.g. for coupons created before limits existed
+        ensure_counters(coupon)
+    raise InvalidCoupon('This coupon has reached its usage limit.')
+
+
+def release_redemption(coupon, shard):
+    """Give back a use claimed by ``reserve_redemption`` when payment fails."""
+    counters = CouponCounter.objects.filter(coupon=coupon, count__gt=0)
+    if coupon.max_redemptions is not None and coupon.counter_shards:
+        # After the cap was lowered below the uses so far, uses beyond a
+        # stripe's share go first, or the stripes under theirs would refill
+        base, extra = divmod(coupon.max_redemptions, coupon.counter_shards)
+        quota = Case(When(shard__gte=coupon.counter_shards, then=0), When(shard__lt=extra, then=base + 1),
+                     default=base)
+        over = counters.alias(quota=quota).filter(count__gt=F('quota')).values_list('pk', flat=True).first()
+        if over is not None and counters.filter(pk=over).update(count=F('count') - 1):
+            return
+    if not counters.filter(shard=shard).update(count=F('count') - 1):
+        # A rebalance emptied the stripe this use was taken from
+        pk = counters.values_list('pk', flat=True).first()
+        counters.filter(pk=pk).update(count=F('count') - 1)
+
+
+def record_redemption(coupon, shard, user, payment):
+    """
+    Log the use reserved on ``shard`` against ``payment``. Raises
+    ``InvalidCoupon`` if a parallel checkout used up the user's limit first.
+    """
+    authenticated = user is not None and user.is_authenticated
+    with transaction.atomic():
+        if coupon.max_per_user is not None and authenticated:
+            # Held until the booking commits, so the user's next checkout counts this one
+            list(User.objects.select_for_update().filter(pk=user.pk).values_list('pk', flat=True))
+        _check_per_user_limit(coupon, user)
+        return CouponRedemption.objects.create(
+            coupon=coupon,
+            user=user if authenticated else None,
+            payment=payment,
+            shard=shard,
+        )
+
+
+def ensure_counters(coupon):
+    """Create the counter stripes of ``coupon`` and fix their number on it."""
+    if coupon.counter_shards is None:
+        shards = getattr(settings, 'COUPON_COUNTER_SHARDS', 8)
+        if coupon.max_redemptions is not None:
+            shards = max(1, min(shards, coupon.max_redemptions))
+        # A parallel checkout may have fixed it first; theirs wins
+        Coupon.objects.filter(pk=coupon.pk, counter_shards__isnull=True).update(counter_shards=shards)
+        coupon.counter_shards = Coupon.objects.filter(pk=coupon.pk).values_list('counter_shards', flat=True).get()
+    CouponCounter.objects.bulk_create(
+        [CouponCounter(coupon=coupon, shard=shard) for shard in range(coupon.counter_shards)],
+        ignore_conflicts=True,
+    )
+
+
+def rebalance_counters(coupon):
+    """
+    Spread the uses counted for ``coupon`` over each stripe's share of its
+    current cap, so a changed ``max_redemptions`` still holds exactly.
+    """
+    if coupon.max_redemptions is None or coupon.counter_shards is None:
+        return
+    with transaction.atomic():
+        counters = list(CouponCounter.objects.select_for_update().filter(coupon=coupon).order_by('shard'))
+        used = sum(counter.count for counter in counters)
+        for counter in counters:
+            quota = 0
+            if counter.shard < coupon.counter_shards:
+                quota = _shard_quota(coupon, counter.shard, coupon.counter_shards)
+            counter.count = min(quota, used)
+            used -= counter.count
+        if counters:
+            # More uses than the new cap allows: the stripes stay full
+            counters[0].count += used
+        CouponCounter.objects.bulk_update(counters, ['count'])
+
+
+# No 0/O or 1/I so codes survive being read out or typed in
+CODE_ALPHABET = 'ABCDEFGHJKLMNPQRSTUVWXYZ23456789'
+
+
+def generate_codes(count, length=10, prefix='', chunk_size=5000):
+    """
+    Yield lists of new random codes that are not in the database yet,
+    ``count`` codes in total.
+
+    Codes come from ``secrets`` so they cannot be guessed from each other.
+    Collisions, both within a chunk and with existing coupons, are replaced
+    before the chunk is yielded.
+    """
+    max_length = Coupon._meta.get_field('code').max_length
+    if len(prefix) + length > max_length:
+        raise ValueError(f'Coupon codes are limited to {max_length} characters.')
+    prefix = prefix.upper()
+
+    remaining = count
+    while remaining > 0:
+        size = min(chunk_size, remaining)
+        chunk = set()
+        while len(chunk) < size:
+            while len(chunk) < size:
+                chunk.add(prefix + ''.join(secrets.choice(CODE_ALPHABET) for _ in range(length)))
+            chunk.difference_update(Coupon.objects.filter(code__in=chunk).values_list('code', flat=True))
+        remaining -= size
+        yield list(chunk)
+
+
+def insert_coupons(chunk):
+    """
+    Insert the ``Coupon`` objects in ``chunk`` whose codes are not taken yet
+    and return the codes that were created.
+    """
+    unique = {}
+    for coupon in chunk:
+        # Like codes already in the database, repeats within the chunk are skipped
+        unique.setdefault(coupon.code, coupon)
+    chunk = list(unique.values())
+    while True:
+        taken = set(Coupon.objects.filter(code__in=[coupon.code for coupon in chunk]).values_list('code', flat=True))
+        new = [coupon for coupon in chunk if coupon.code not in taken]
+        try:
+            with transaction.atomic():
+                Coupon.objects.bulk_create(new)
+        except IntegrityError:
+            if not Coupon.objects.filter(code__in=[coupon.code for coupon in new]).exists():
+                raise
+            # Another process created some of these codes since the lookup
+            continue
+        # bulk_create skips the post_save signal, so clear the cache by hand
+        clear_cache()
+        return [coupon.code for coupon in new]
+
+
+def create_coupons(rows, chunk_size=5000):
+    """
+    Insert ``Coupon`` objects from the iterable ``rows`` in chunks of
+    ``chunk_size``, skipping codes that already exist. Returns the number of
+    coupons created.
+    """
+    rows = iter(rows)
+    total = 0
+    while chunk := list(islice(rows, chunk_size)):
+        total += len(insert_coupons(chunk))
+    return total
+
+
+CSV_FIELDS = ['code', 'discount_percent', 'valid_until', 'max_redemptions', 'max_per_user']
+
+
+def csv_row(code, discount_percent, valid_until, max_redemptions, max_per_user):
+    """One line of the coupon CSV format; empty limits mean unlimited."""
+    return [code, discount_percent, valid_until.isoformat(),
+            '' if max_redemptions is None else max_redemptions,
+            '' if max_per_user is None else max_per_user]
+
+
+def iter_csv_rows(queryset, chunk_size=5000):
+    """Yield the CSV header and one row per coupon, streaming from the database."""
+    yield CSV_FIELDS
+    for values in queryset.order_by('pk').values_list(*CSV_FIELDS).iterator(chunk_size=chunk_size):
+        yield csv_row(*values)
+
+
+def clear_cache():
+    with _lock:
+        _cache.clear()
+
+
+@receiver(post_save, sender=Coupon)
+@receiver(post_delete, sender=Coupon)
+def _invalidate_coupon_cache(sender, **kwargs):
+    clear_cache()
+
+
+@receiver(post_save, sender=Coupon)
+def _sync_coupon_counters(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        ensure_counters(instance)
+    else:
+        # The cap may have changed
+        rebalance_counters(instance)
@@ -0,0 +1,35 @@
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.utils.cache import get_conditional_response, patch_cache_control, set_response_etag
+
+
+def public_page(view_func):
+    """
+    Serve a read-only page identically to every visitor so a shared HTTP cache
+    can store it.
+
+    Enabled by ``PUBLIC_PAGE_CACHE_SECONDS``. GET/HEAD requests are rendered
+    as anonymous without loading the session, so neither a cookie nor
+    ``Vary: Cookie`` is emitted, and the response gets ``Cache-Control`` and
+    an ``ETag``. ``base.html`` fills in the logged-in navigation with a small
+    fetch to ``session_status``.
+    """
+    @wraps(view_func)
+    def wrapped(request, *args, **kwargs):
+        max_age = getattr(settings, 'PUBLIC_PAGE_CACHE_SECONDS', 0)
+        if not max_age or request.method not in ('GET', 'HEAD'):
+            return view_func(request, *args, **kwargs)
+
+        # Replacing the lazy user keeps templates from touching the session
+        request.user = AnonymousUser()
+        request.public_page = True
+        response = view_func(request, *args, **kwargs)
+        if response.status_code != 200 or response.streaming:
+            return response
+
+        patch_cache_control(response, public=True, max_age=max_age)
+        set_response_etag(response)
+        return get_conditional_response(request, etag=response.headers['ETag'], response=response)
+    return wrapped
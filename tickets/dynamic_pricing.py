@@ -0,0 +1,88 @@
+"""
+Demand-based repricing.
+
+Each row's price is its ``base_price`` times a multiplier picked from a
+pricing curve by the row's sell-through (booked seats / capacity). Curves are
+configured in ``settings.DYNAMIC_PRICING_CURVES`` as lists of
+``(minimum sell-through, multiplier)`` steps.
+"""
+from bisect import bisect_right
+from collections import defaultdict
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery
+
+from . import sharding
+from .caching import bump_event_versions
+from .models import Seat, SeatRow, Ticket
+from .pricing import to_cents
+
+
+def get_curve(name='default'):
+    curves = getattr(settings, 'DYNAMIC_PRICING_CURVES', {})
+    if name not in curves:
+        raise KeyError(f'Unknown pricing curve "{name}".')
+    steps = sorted(curves[name])
+    return [threshold for threshold, _ in steps], [Decimal(str(multiplier)) for _, multiplier in steps]
+
+
+def price_for(base_price, sell_through, curve):
+    thresholds, multipliers = curve
+    step = bisect_right(thresholds, sell_through) - 1
+    if step < 0:
+        return base_price
+    return to_cents(base_price * multipliers[step])
+
+
+def _changed_rows(db, event_ids, curve):
+    """Return ``{event_id: [SeatRow, ...]}`` for the rows whose price changes."""
+    booked = dict(
+        Seat.objects.using(db).filter(row__event_id__in=event_ids, is_booked=True)
+        .values_list('row_id').annotate(n=Count('id')).order_by()
+    )
+
+    changes = defaultdict(list)
+    rows = SeatRow.objects.using(db).filter(event_id__in=event_ids).values_list(
+        'id', 'event_id', 'capacity', 'price', 'base_price'
+    )
+    for row_id, event_id, capacity, price, base_price in rows.iterator():
+        base_price = base_price if base_price is not None else price
+        sell_through = booked.get(row_id, 0) / capacity if capacity else 0
+        new_price = price_for(base_price, sell_through, curve)
+        if new_price != price:
+            changes[event_id].append(SeatRow(id=row_id, price=new_price, base_price=base_price))
+    return changes
+
+
+def reprice_events(event_ids, curve, chunk_size=500, dry_run=False):
+    """
+    Reprice the rows of ``event_ids``. Sell-through is read with one grouped
+    query per chunk of events, and each event's changes are written with a
+    single ``bulk_update`` in their own transaction. Returns
+    ``(events_changed, rows_changed)``.
+    """
+    events_changed = rows_changed = 0
+    for db, shard_event_ids in sharding.group_by_shard(event_ids):
+        for start in range(0, len(shard_event_ids), chunk_size):
+            chunk = shard_event_ids[start:start + chunk_size]
+            changes = _changed_rows(db, chunk, curve)
+
+            if dry_run:
+                events_changed += len(changes)
+                rows_changed += sum(len(rows) for rows in changes.values())
+                continue
+
+            for event_id, changed_rows in changes.items():
+                with transaction.atomic(using=db):
+                    SeatRow.objects.using(db).bulk_update(changed_rows, ['price', 'base_price'])
+                    # Unsold tickets follow their row's new price
+                    Ticket.objects.using(db).filter(seat__row__event_id=event_id, seat__is_booked=False).update(
+                        price=Subquery(SeatRow.objects.filter(seats=OuterRef('seat_id')).values('price')[:1])
+                    )
+                rows_changed += len(changed_rows)
+            events_changed += len(changes)
+            # Listing, price table and seat-map caches refresh together
+            bump_event_versions(changes)
+    return events_changed, rows_changed
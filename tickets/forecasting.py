@@ -0,0 +1,113 @@
+"""
+Revenue forecasting and price-scenario simulation.
+
+Per-row capacity, price and sales history are loaded once into NumPy arrays.
+Every scenario is then evaluated across all rows with array operations
+instead of Python loops over rows. Demand follows a constant-elasticity
+model: a row that sold ``r`` seats/day at price ``p`` sells
+``r * (p' / p) ** -elasticity`` seats/day at price ``p'``.
+
+Requires NumPy, which is not a dependency of the site itself.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+from django.db.models import Count, Min, Q, Sum
+from django.utils import timezone
+
+from . import sharding
+from .models import SeatRow
+
+SECONDS_PER_DAY = 86400.0
+
+
+@dataclass
+class Catalogue:
+    row_ids: np.ndarray
+    row_names: list
+    event_ids: np.ndarray  # one per row, rows sorted by event
+    event_starts: np.ndarray  # index of each event's first row
+    capacity: np.ndarray
+    price: np.ndarray
+    sold: np.ndarray
+    sold_revenue: np.ndarray
+    rate: np.ndarray  # seats sold per day so far
+    days_left: np.ndarray
+
+
+def load_catalogue(queryset=None, default_rate=0.0):
+    """Load the rows of upcoming events, grouped by event."""
+    now = timezone.now()
+    if queryset is None:
+        queryset = SeatRow.objects.filter(event__date__gt=now)
+    # Shards hold increasing id ranges, so concatenating keeps rows sorted by event
+    rows = sharding.collect(
+        queryset.order_by('event_id', 'id')
+        .values_list('id', 'name', 'event_id', 'capacity', 'price', 'event__date')
+        .annotate(
+            sold=Count('seats', filter=Q(seats__is_booked=True)),
+            sold_revenue=Sum('seats__ticket__price', filter=Q(seats__is_booked=True)),
+            first_sale=Min('seats__ticket__booked_at', filter=Q(seats__is_booked=True)),
+        )
+    )
+    n = len(rows)
+    row_ids = np.fromiter((r[0] for r in rows), dtype=np.int64, count=n)
+    event_ids = np.fromiter((r[2] for r in rows), dtype=np.int64, count=n)
+    capacity = np.fromiter((r[3] for r in rows), dtype=np.float64, count=n)
+    price = np.fromiter((r[4] for r in rows), dtype=np.float64, count=n)
+    days_left = np.fromiter(((r[5] - now).total_seconds() / SECONDS_PER_DAY for r in rows),
+                            dtype=np.float64, count=n)
+    sold = np.fromiter((r[6] for r in rows), dtype=np.float64, count=n)
+    sold_revenue = np.fromiter((r[7] or 0 for r in rows), dtype=np.float64, count=n)
+    selling_days = np.fromiter(
+        ((now - r[8]).total_seconds() / SECONDS_PER_DAY if r[8] else 0.0 for r in rows),
+        dtype=np.float64, count=n,
+    )
+
+    rate = np.where(selling_days > 0, sold / np.maximum(selling_days, 1.0), default_rate)
+    if n:
+        event_starts = np.flatnonzero(np.r_[True, event_ids[1:] != event_ids[:-1]])
+    else:
+        event_starts = np.zeros(0, dtype=np.int64)
+    return Catalogue(
+        row_ids=row_ids, row_names=[r[1] for r in rows], event_ids=event_ids, event_starts=event_starts,
+        capacity=capacity, price=price, sold=sold, sold_revenue=sold_revenue, rate=rate,
+        days_left=np.maximum(days_left, 0.0),
+    )
+
+
+def simulate(catalogue, deltas, elasticity=1.5, row_mask=None, batch_size=256):
+    """
+    Evaluate price scenarios. Scenario ``i`` adds ``deltas[i]`` to the price
+    of every row selected by ``row_mask`` (all rows by default).
+
+    Returns ``(revenue, sellout_days)``, both shaped ``(scenarios, events)``.
+    Revenue includes tickets already sold. Sell-out time is in days and is
+    ``inf`` for events that are not projected to sell out before they start.
+    """
+    c = catalogue
+    deltas = np.asarray(deltas, dtype=np.float64)
+    mask = np.ones_like(c.price, dtype=bool) if row_mask is None else row_mask
+    remaining = np.maximum(c.capacity - c.sold, 0.0)
+    events = len(c.event_starts)
+    revenue = np.empty((len(deltas), events))
+    sellout_days = np.empty((len(deltas), events))
+    if not events:
+        return revenue, sellout_days
+
+    base_price = np.where(c.price > 0, c.price, 0.01)
+    # Scenarios are done in batches so memory stays at batch_size x rows
+    for start in range(0, len(deltas), batch_size):
+        batch = deltas[start:start + batch_size, None]
+        price = np.where(mask, np.maximum(c.price + batch, 0.01), c.price)
+        rate = c.rate * (price / base_price) ** -elasticity
+        sold_more = np.minimum(remaining, rate * c.days_left)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            row_sellout = np.where(remaining > 0, remaining / rate, 0.0)
+        row_sellout = np.where(row_sellout <= c.days_left, row_sellout, np.inf)
+
+        revenue[start:start + len(batch)] = np.add.reduceat(
+            c.sold_revenue + price * sold_more, c.event_starts, axis=1
+        )
+        sellout_days[start:start + len(batch)] = np.maximum.reduceat(row_sellout, c.event_starts, axis=1)
+    return revenue, sellout_days
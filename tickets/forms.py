@@ -1,7 +1,6 @@
 from django import forms
 from django.core.validators import RegexValidator
-from .models import Coupon
-from django.utils import timezone
+from . import coupons
 
 class ContactDetailsForm(forms.Form):
     full_name = forms.CharField(
@@ -147,9 +146,8 @@ class CouponForm(forms.Form):
     def clean_coupon_code(self):
         code = self.cleaned_data['coupon_code'].upper()
         try:
-            coupon = Coupon.objects.get(code=code)
-            if coupon.valid_until < timezone.now():
-                raise forms.ValidationError('This coupon has expired.')
-            return code
-        except Coupon.DoesNotExist:
-            raise forms.ValidationError('Invalid coupon code.')
+            # Kept on the form so views do not look the coupon up again
+            self.coupon = coupons.validate_coupon(code)
+        except coupons.InvalidCoupon as e:
+            raise forms.ValidationError(str(e))
+        return code
@@ -0,0 +1,47 @@
+"""
+Booking funnel events.
+
+Every step of a booking is logged on the ``tickets.funnel`` logger, with
+its fields in the record's ``funnel`` attribute, which the JSON logs carry
+as an object:
+
+- ``view_event``: an event page was rendered
+- ``select_seat``: a seat's checkout page was opened, starting a checkout
+- ``apply_coupon``: a coupon was tried, with its ``result``
+- ``pay``: a payment was attempted, with its ``outcome``
+- ``confirm``: the confirmation page of a payment was shown
+
+The steps of one checkout share a ``checkout_id``, which travels in the
+signed checkout state. ``pay`` and ``confirm`` also share the
+``payment_id``. ``visitor`` is a hash of the session cookie, if the browser
+has one, and links a checkout to the event pages viewed before it. Event
+pages served by a shared HTTP cache (see ``tickets.decorators.public_page``)
+never reach Django, so with ``PUBLIC_PAGE_CACHE_SECONDS`` set their views
+are counted by the cache instead.
+"""
+import hashlib
+import logging
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+def visitor_id(request):
+    """A short, stable id for the browser making ``request``, or ``None``."""
+    session_key = request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    if not session_key:
+        return None
+    return hashlib.sha256(f'{settings.SECRET_KEY}:{session_key}'.encode()).hexdigest()[:16]
+
+
+def track(request, step, level=logging.INFO, exc_info=None, **fields):
+    """Log the funnel ``step`` taken by ``request`` with ``fields``."""
+    user = getattr(request, 'user', None)
+    funnel = {
+        'step': step,
+        'visitor': visitor_id(request),
+        'user_id': user.pk if user is not None and user.is_authenticated else None,
+        **fields,
+    }
+    logger.log(level, step, exc_info=exc_info, extra={'funnel': funnel})
@@ -0,0 +1,119 @@
+"""
+Venue layouts.
+
+A venue's sections, rows and seat positions are stored once and copied into
+every event held there by ``clone_venue_layout``. When the event lives on the
+same database as the venues, the copy is three set-based ``INSERT ... SELECT``
+statements (rows, seats, tickets) whatever the size of the venue. An event on
+another shard gets the layout read once and written with chunked
+``bulk_create``.
+
+Rows carry an integer ``sort_key`` so "Row 10" sorts after "Row 2" and
+"Row AA" after "Row Z" with a plain ``ORDER BY``.
+"""
+import re
+
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from .caching import bump_event_versions
+from .models import Seat, SeatRow, Ticket, VenueRow, VenueSeat, VenueSection
+
+ROW_LABEL = re.compile(r'([A-Za-z]*)(\d*)')
+SECTION_STRIDE = 1000000  # sort_key of a cloned row is section order * stride + row key
+LABEL_PART_LIMIT = 999  # cap on each part of labels such as "AA10", so they stay below the stride
+# Seat map units between seats and rows, for seats that have no position of their own
+SEAT_SPACING = 30
+ROW_SPACING = 40
+
+
+def row_sort_key(name):
+    """
+    Natural sort key of a row name: "Row 2" -> 2, "Row 10" -> 10, "Row B" -> 2,
+    "Row AA" -> 27 and "AA10" -> 27010. Keys stay below ``SECTION_STRIDE``;
+    longer labels ("Balcony", "Row 5000000") share the largest key and are
+    ordered by name after it.
+    """
+    words = name.split()
+    match = ROW_LABEL.fullmatch(words[-1]) if words else None
+    if not match:
+        return 0
+    letters, digits = match.groups()
+    letter_value = 0
+    for letter in letters.upper():
+        letter_value = min(letter_value * 26 + ord(letter) - ord('A') + 1, SECTION_STRIDE)
+    if letters and digits:
+        return min(letter_value, LABEL_PART_LIMIT) * (LABEL_PART_LIMIT + 1) + min(int(digits), LABEL_PART_LIMIT)
+    return min(int(digits) if digits else letter_value, SECTION_STRIDE - 1)
+
+
+def clone_venue_layout(event, chunk_size=5000):
+    """Create ``event``'s rows, seats and unsold tickets from its venue's layout."""
+    db = event._state.db
+    with transaction.atomic(using=db):
+        if db == DEFAULT_DB_ALIAS:
+            _clone_with_sql(event, db)
+        else:
+            _clone_in_chunks(event, db, chunk_size)
+    bump_event_versions([event.pk])
+
+
+def _clone_with_sql(event, db):
+    quote = connections[db].ops.quote_name
+    seat_row, seat, ticket = (quote(model._meta.db_table) for model in (SeatRow, Seat, Ticket))
+    venue_row, venue_seat, section = (quote(model._meta.db_table) for model in (VenueRow, VenueSeat, VenueSection))
+    with connections[db].cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {seat_row} (event_id, name, capacity, price, svg_id, section, sort_key, venue_row_id) '
+            f'SELECT %s, r.name, (SELECT COUNT(*) FROM {venue_seat} s WHERE s.row_id = r.id), r.price, r.svg_id, '
+            f'sec.name, sec.sort_order * %s + r.sort_key, r.id '
+            f'FROM {venue_row} r INNER JOIN {section} sec ON r.section_id = sec.id WHERE sec.venue_id = %s',
+            [event.pk, SECTION_STRIDE, event.venue_id],
+        )
+        cursor.execute(
+            f'INSERT INTO {seat} (row_id, number, is_booked, x, y) '
+            f'SELECT sr.id, vs.number, %s, vs.x, vs.y '
+            f'FROM {venue_seat} vs INNER JOIN {seat_row} sr ON sr.venue_row_id = vs.row_id WHERE sr.event_id = %s',
+            [False, event.pk],
+        )
+        # booked_at is set the way auto_now_add sets it for tickets created through the ORM
+        cursor.execute(
+            f'INSERT INTO {ticket} (seat_id, price, booked_at) '
+            f'SELECT s.id, sr.price, %s FROM {seat} s INNER JOIN {seat_row} sr ON s.row_id = sr.id '
+            f'WHERE sr.event_id = %s',
+            [timezone.now(), event.pk],
+        )
+
+
+def _clone_in_chunks(event, db, chunk_size):
+    venue_rows = (
+        VenueRow.objects.using(DEFAULT_DB_ALIAS).filter(section__venue_id=event.venue_id)
+        .select_related('section').annotate(seat_count=Count('seats'))
+    )
+    rows = SeatRow.objects.using(db).bulk_create([
+        SeatRow(event=event, name=row.name, capacity=row.seat_count, price=row.price, svg_id=row.svg_id,
+                section=row.section.name, sort_key=row.section.sort_order * SECTION_STRIDE + row.sort_key,
+                venue_row_id=row.id)
+        for row in venue_rows
+    ])
+    rows_by_venue_row = {row.venue_row_id: row for row in rows}
+
+    venue_seats = (
+        VenueSeat.objects.using(DEFAULT_DB_ALIAS).filter(row__section__venue_id=event.venue_id)
+        .order_by('row_id', 'number').values_list('row_id', 'number', 'x', 'y')
+        .iterator(chunk_size=chunk_size)
+    )
+    chunk = []
+    for venue_row_id, number, x, y in venue_seats:
+        chunk.append(Seat(row=rows_by_venue_row[venue_row_id], number=number, x=x, y=y))
+        if len(chunk) == chunk_size:
+            _create_seats(db, chunk)
+            chunk = []
+    if chunk:
+        _create_seats(db, chunk)
+
+
+def _create_seats(db, seats):
+    seats = Seat.objects.using(db).bulk_create(seats)
+    Ticket.objects.using(db).bulk_create(Ticket(seat=seat, price=seat.row.price) for seat in seats)
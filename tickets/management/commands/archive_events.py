@@ -0,0 +1,54 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from tickets import archiving
+
+
+class Command(BaseCommand):
+    help = (
+        'Replace the seat rows, seats and tickets of past events with compact archive rows. '
+        'Payments and the tickets users bought stay available.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=1,
+                            help='Archive events that ended at least this many days ago')
+        parser.add_argument('--event', type=int, action='append', dest='events',
+                            help='Event id to archive (repeatable) instead of all past events; it must have ended '
+                                 'at least --days ago')
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        before = timezone.now() - timedelta(days=options['days'])
+        if options['events']:
+            event_ids = options['events']
+            # Checked up front so that one bad id does not stop a run halfway
+            for event_id in event_ids:
+                try:
+                    archiving.check_archivable(event_id, before)
+                except archiving.NotArchivable as e:
+                    raise CommandError(str(e))
+        else:
+            event_ids = archiving.archivable_events(before)
+
+        started = time.perf_counter()
+        totals = [0, 0, 0]
+        for event_id in event_ids:
+            try:
+                counts = archiving.archive_event(event_id, before, options['batch_size'], options['dry_run'])
+            except archiving.NotArchivable as e:
+                # Rescheduled or archived by someone else since it was listed
+                raise CommandError(str(e))
+            totals = [total + count for total, count in zip(totals, counts)]
+            if options['verbosity'] > 1:
+                self.stdout.write(f'Event {event_id}: {counts[0]} rows, {counts[1]} seats, {counts[2]} sold tickets')
+
+        verb = 'Would archive' if options['dry_run'] else 'Archived'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {len(event_ids)} events: {totals[0]} rows, {totals[1]} seats and '
+            f'{totals[2]} sold tickets in {time.perf_counter() - started:.2f}s.'
+        ))
@@ -0,0 +1,97 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.signals import request_finished, request_started
+from django.db import connections
+
+from tickets.models import Event
+
+MODES = {
+    # What CONN_MAX_AGE / pool each mode sets on the connection
+    'per-request': {'CONN_MAX_AGE': 0},
+    'persistent': {'CONN_MAX_AGE': 60},
+    'pool': {'CONN_MAX_AGE': 0, 'pool': True},
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure what opening a database connection per request costs. Simulates requests '
+        '(request_started, one query, request_finished) with a new connection per request, with '
+        'persistent connections (CONN_MAX_AGE) and with a psycopg 3 connection pool.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--mode', choices=['all', *MODES], default='all')
+
+    def handle(self, *args, **options):
+        alias = options['database']
+        connection = connections[alias]
+        if connection.vendor != 'postgresql':
+            self.stderr.write(self.style.WARNING(
+                f'"{alias}" is {connection.vendor}; connecting is cheap there, so expect little difference.'))
+        modes = list(MODES) if options['mode'] == 'all' else [options['mode']]
+        if 'pool' in modes and not self._pool_available(connection):
+            if options['mode'] == 'pool':
+                raise CommandError('Connection pooling needs PostgreSQL with psycopg 3 and psycopg_pool.')
+            modes.remove('pool')
+
+        original = {
+            'CONN_MAX_AGE': connection.settings_dict['CONN_MAX_AGE'],
+            'OPTIONS': connection.settings_dict['OPTIONS'],
+        }
+        results = {}
+        try:
+            for mode in modes:
+                results[mode] = self._run(connection, mode, options['requests'])
+        finally:
+            connection.close()
+            if hasattr(connection, 'close_pool'):
+                connection.close_pool()
+            connection.settings_dict.update(original)
+
+        baseline = results.get('per-request')
+        for mode, latencies in results.items():
+            mean = statistics.fmean(latencies)
+            line = (f'{mode:>12}: mean {mean:.2f}ms, p50 {statistics.median(latencies):.2f}ms, '
+                    f'p95 {latencies[int(len(latencies) * 0.95) - 1]:.2f}ms')
+            if baseline and mode != 'per-request':
+                line += f', saves {statistics.fmean(baseline) - mean:.2f}ms per request'
+            self.stdout.write(line)
+
+    def _pool_available(self, connection):
+        if connection.vendor != 'postgresql':
+            return False
+        try:
+            import psycopg_pool  # noqa: F401
+        except ImportError:
+            return False
+        from django.db.backends.postgresql.base import is_psycopg3
+        return is_psycopg3
+
+    def _run(self, connection, mode, count):
+        connection.close()
+        if hasattr(connection, 'close_pool'):
+            connection.close_pool()
+        config = MODES[mode]
+        connection.settings_dict['CONN_MAX_AGE'] = config['CONN_MAX_AGE']
+        options = {key: value for key, value in connection.settings_dict['OPTIONS'].items() if key != 'pool'}
+        if config.get('pool'):
+            options['pool'] = connection.settings_dict['OPTIONS'].get('pool') or True
+        connection.settings_dict['OPTIONS'] = options
+
+        queryset = Event.objects.using(connection.alias).only('pk')
+        latencies = []
+        for _ in range(count):
+            started = time.perf_counter()
+            # The same signals the request handler sends; request_finished
+            # closes or returns the connection according to the settings
+            request_started.send(sender=self.__class__)
+            queryset.first()
+            request_finished.send(sender=self.__class__)
+            latencies.append((time.perf_counter() - started) * 1000)
+        latencies.sort()
+        return latencies
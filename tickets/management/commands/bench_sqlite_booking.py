@@ -0,0 +1,153 @@
+import multiprocessing
+import os
+import random
+import shutil
+import tempfile
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from tickets.booking import SeatUnavailable, book_ticket
+from tickets.models import Event, Payment, Seat, SeatRow, Ticket
+
+MODES = {
+    # Django's defaults: rollback journal, DEFERRED transactions, 5s busy wait
+    'default': {},
+    'profile': {'transaction_mode': 'IMMEDIATE', 'timeout': 20},
+}
+
+
+def _register(alias, path, options):
+    config = connections.configure_settings({
+        'default': connections.settings['default'],
+        alias: {'ENGINE': 'django.db.backends.sqlite3', 'NAME': path, 'OPTIONS': options},
+    })
+    connections.settings[alias] = config[alias]
+
+
+def _book(args):
+    """Worker: book tickets one request at a time, the way checkout does."""
+    alias, user_id, ticket_ids = args
+    user = User.objects.using(alias).get(pk=user_id)
+    booked = conflicts = locked = 0
+    latencies = []
+    for ticket_id in ticket_ids:
+        started = time.perf_counter()
+        try:
+            ticket = Ticket.objects.using(alias).select_related('seat').get(pk=ticket_id)
+            if ticket.seat.is_booked:
+                conflicts += 1
+                continue
+            book_ticket(ticket, user, ticket.price, f'bench_{ticket_id}', using=alias)
+            booked += 1
+        except SeatUnavailable:
+            conflicts += 1
+        except OperationalError:
+            # "database is locked"
+            locked += 1
+        latencies.append(time.perf_counter() - started)
+    connections.close_all()
+    return booked, conflicts, locked, latencies
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure concurrent booking throughput on SQLite with Django\'s default settings and with '
+        'the production profile (SQLITE_PROFILE). Works on throw-away database files, so the '
+        'project database is not touched.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8, help='Concurrent booking processes')
+        parser.add_argument('--seats', type=int, default=2000)
+        parser.add_argument('--attempts', type=int, default=400, help='Booking attempts per worker')
+        parser.add_argument('--mode', choices=['both', *MODES], default='both')
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        if 'fork' not in multiprocessing.get_all_start_methods():
+            raise CommandError('This benchmark needs the "fork" start method (Linux or macOS).')
+        modes = list(MODES) if options['mode'] == 'both' else [options['mode']]
+        workdir = tempfile.mkdtemp(prefix='bench_sqlite_')
+        try:
+            template = self._build_template(workdir, options)
+            results = {}
+            for mode in modes:
+                results[mode] = self._run(mode, workdir, template, options)
+        finally:
+            connections.close_all()
+            shutil.rmtree(workdir, ignore_errors=True)
+
+        if len(results) == 2:
+            before, after = results['default'], results['profile']
+            self.stdout.write(self.style.SUCCESS(
+                f'Profile: {after / before:.2f}x the bookings per second of the default settings'
+                if before else 'Profile: the default settings completed no bookings'
+            ))
+
+    def _build_template(self, workdir, options):
+        path = os.path.join(workdir, 'template.sqlite3')
+        _register('bench_template', path, {})
+        call_command('migrate', database='bench_template', verbosity=0)
+
+        event = Event.objects.using('bench_template').create(
+            name='Booking benchmark', date=timezone.now(), location='Benchmark Hall')
+        # bulk_create rather than save(), which would create the seats one by one
+        row, = SeatRow.objects.using('bench_template').bulk_create(
+            [SeatRow(event=event, name='Row A', capacity=options['seats'], price=Decimal('50.00'))])
+        seats = Seat.objects.using('bench_template').bulk_create(
+            Seat(row=row, number=number) for number in range(1, options['seats'] + 1))
+        Ticket.objects.using('bench_template').bulk_create(Ticket(seat=seat, price=row.price) for seat in seats)
+        User.objects.using('bench_template').bulk_create(
+            User(username=f'bench_booker_{n}') for n in range(options['workers']))
+        connections['bench_template'].close()
+        return path
+
+    def _run(self, mode, workdir, template, options):
+        alias = f'bench_{mode}'
+        path = os.path.join(workdir, f'{mode}.sqlite3')
+        shutil.copyfile(template, path)
+        _register(alias, path, MODES[mode])
+        profile_aliases = [alias] if mode == 'profile' else []
+
+        user_ids = list(User.objects.using(alias).values_list('pk', flat=True))
+        ticket_ids = list(Ticket.objects.using(alias).values_list('pk', flat=True))
+        jobs = []
+        for index, user_id in enumerate(user_ids):
+            # Workers pick from the same seats, so some attempts race for one seat
+            rng = random.Random(options['seed'] * 1000 + index)
+            jobs.append((alias, user_id, rng.sample(ticket_ids, min(options['attempts'], len(ticket_ids)))))
+
+        connections.close_all()
+        with override_settings(SQLITE_PROFILE_DATABASES=profile_aliases):
+            context = multiprocessing.get_context('fork')
+            started = time.perf_counter()
+            with context.Pool(options['workers']) as pool:
+                outcomes = pool.map(_book, jobs)
+            elapsed = time.perf_counter() - started
+
+            booked = sum(outcome[0] for outcome in outcomes)
+            conflicts = sum(outcome[1] for outcome in outcomes)
+            locked = sum(outcome[2] for outcome in outcomes)
+            latencies = sorted(latency for outcome in outcomes for latency in outcome[3])
+            seats_booked = Seat.objects.using(alias).filter(is_booked=True).count()
+            payments = Payment.objects.using(alias).count()
+            connections[alias].close()
+
+        p95 = latencies[int(len(latencies) * 0.95) - 1] * 1000 if latencies else 0
+        self.stdout.write(
+            f'{mode:>8}: {booked} bookings in {elapsed:.2f}s ({booked / elapsed:.0f}/s), '
+            f'{locked} "database is locked" errors, {conflicts} seats already taken, '
+            f'p95 {p95:.1f}ms'
+        )
+        if seats_booked != payments:
+            self.stderr.write(self.style.ERROR(
+                f'{mode:>8}: {seats_booked} seats booked but {payments} payments recorded'))
+        return booked / elapsed
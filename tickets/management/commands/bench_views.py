@@ -0,0 +1,219 @@
+import json
+import logging
+import platform
+import statistics
+import time
+from contextlib import ExitStack
+from datetime import timedelta
+
+import django
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client
+from django.test.utils import (
+    CaptureQueriesContext, setup_databases, setup_test_environment, teardown_databases, teardown_test_environment,
+)
+from django.utils import timezone
+
+from tickets import coupons
+from tickets.models import Category, Coupon, Event, Ticket
+
+# Queries a view may run on a cold cache. Raise one only together with the
+# change that needs the extra queries.
+QUERY_BUDGETS = {
+    'home': 6,
+    'event_list': 6,
+    'event_detail': 5,
+    'checkout': 6,
+    'apply_coupon': 3,
+}
+DATASET = {
+    # Passed to generate_benchmark_data; results are only compared on the same dataset
+    'events': 300,
+    'rows_per_event': 20,
+    'seats_per_row': 25,
+    'users': 1000,
+    'seed': 42,
+}
+BENCH_COUPON = 'BENCH10'
+
+
+class Command(BaseCommand):
+    help = (
+        'Time the main views through the test client on a fixed generated dataset in a throw-away test '
+        'database, check their query counts against QUERY_BUDGETS and, with --baseline, fail when a view '
+        'got slower or runs more queries than in an earlier --output file.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20, help='Timed requests per view, after a warm-up')
+        parser.add_argument('--output', help='Write the results to this JSON file')
+        parser.add_argument('--baseline', help='JSON results of an earlier run to compare with')
+        parser.add_argument('--tolerance', type=float, default=0.25,
+                            help='Allowed slowdown of the median versus the baseline, e.g. 0.25 for 25%%')
+        parser.add_argument('--min-slowdown-ms', type=float, default=2.0,
+                            help='Slowdowns smaller than this are noise, whatever the ratio')
+        parser.add_argument('--only', action='append', help='Run only the cases starting with this name')
+        parser.add_argument('--keepdb', action='store_true',
+                            help='Keep the test database, and its data, for the next run')
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                baseline = json.load(f)
+            if baseline.get('dataset') != DATASET:
+                raise CommandError('The baseline was measured on another dataset; measure a new one.')
+
+        # The per-request timing and funnel logs would drown the report
+        logging.disable(logging.INFO)
+        verbosity = max(0, options['verbosity'] - 1)
+        setup_test_environment()
+        old_config = setup_databases(verbosity, interactive=False, keepdb=options['keepdb'])
+        try:
+            self._seed(options)
+            results = self._measure(options)
+        finally:
+            teardown_databases(old_config, verbosity, keepdb=options['keepdb'])
+            teardown_test_environment()
+            logging.disable(logging.NOTSET)
+
+        report = {
+            'created': timezone.now().isoformat(),
+            'django': django.get_version(),
+            'python': platform.python_version(),
+            'database': connections['default'].vendor,
+            'dataset': DATASET,
+            'repeat': options['repeat'],
+            'results': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+                f.write('\n')
+            self.stdout.write(f'Results written to {options["output"]}')
+
+        failures = self._over_budget(results)
+        if baseline is not None:
+            failures += self._regressions(results, baseline, options)
+        if failures:
+            raise CommandError('Views regressed:\n' + '\n'.join(f'  {failure}' for failure in failures))
+        self.stdout.write(self.style.SUCCESS('All views are within their query budgets'
+                                             + (' and the baseline tolerance.' if baseline else '.')))
+
+    def _seed(self, options):
+        if not Event.objects.exists():
+            started = time.perf_counter()
+            call_command(
+                'generate_benchmark_data', events=DATASET['events'], rows_per_event=DATASET['rows_per_event'],
+                seats_per_row=DATASET['seats_per_row'], users=DATASET['users'], seed=DATASET['seed'],
+                unsold_tickets=True, workers=1, verbosity=0, stdout=self.stdout,
+            )
+            self.stdout.write(f'Seeded the dataset in {time.perf_counter() - started:.1f}s')
+        Coupon.objects.get_or_create(code=BENCH_COUPON, defaults={
+            'discount_percent': 10, 'valid_until': timezone.now() + timedelta(days=365),
+        })
+
+    def _cases(self):
+        """``(name, view, method, path, data, headers)`` of every request to measure."""
+        upcoming = Event.objects.filter(date__gte=timezone.now()).order_by('date')
+        event = upcoming.first()
+        category = Category.objects.order_by('id').first()
+        ticket = Ticket.objects.filter(seat__row__event=event, seat__is_booked=False).order_by('id').first()
+        if event is None or ticket is None:
+            raise CommandError('The dataset has no upcoming event with a free seat.')
+
+        cases = [
+            ('home', 'home', 'GET', '/', None, {}),
+            ('event_list', 'event_list', 'GET', '/events-list/', None, {}),
+            ('event_list:search', 'event_list', 'GET', '/events-list/?q=Festival', None, {}),
+            ('event_list:city', 'event_list', 'GET', '/events-list/?city=London', None, {}),
+            ('event_list:date', 'event_list', 'GET', f'/events-list/?date={event.date:%Y-%m-%d}', None, {}),
+            ('event_list:category', 'event_list', 'GET', f'/events-list/?category={category.slug}', None, {}),
+            ('event_list:page', 'event_list', 'GET', '/events-list/?page=5&per_page=24', None, {}),
+        ]
+        cases += [
+            (f'event_list:sort={sort}', 'event_list', 'GET', f'/events-list/?sort={sort}', None, {})
+            for sort in ('date_asc', 'date_desc', 'name_asc', 'name_desc')
+        ]
+        cases += [
+            ('event_detail', 'event_detail', 'GET', f'/events-list/{event.id}/', None, {}),
+            ('checkout', 'checkout', 'GET', f'/checkout/{ticket.id}/', None, {}),
+        ]
+        return cases, ticket
+
+    def _measure(self, options):
+        cases, ticket = self._cases()
+        buyer = User.objects.filter(username__startswith='bench_user_').order_by('id').first()
+        client = Client()
+        client.force_login(buyer)
+
+        # apply_coupon posts the token the checkout page hands out
+        checkout_token = client.get(f'/checkout/{ticket.id}/').context['checkout_token']
+        cases.append(('apply_coupon', 'apply_coupon', 'POST', '/events-list/apply-coupon/',
+                      {'coupon_code': BENCH_COUPON, 'checkout_token': checkout_token},
+                      {'HTTP_X_REQUESTED_WITH': 'XMLHttpRequest'}))
+
+        results = {}
+        self.stdout.write(f'{"view":<26} {"queries":>7} {"budget":>6} {"median ms":>10} {"p95 ms":>8}')
+        for name, view, method, path, data, headers in cases:
+            if options['only'] and not any(name.startswith(prefix) for prefix in options['only']):
+                continue
+            request = client.post if method == 'POST' else client.get
+
+            # The first request runs on cold caches; its queries are the ones budgeted
+            for cache in caches.all():
+                cache.clear()
+            coupons.clear_cache()
+            with ExitStack() as stack:
+                captured = [stack.enter_context(CaptureQueriesContext(connections[alias])) for alias in connections]
+                response = request(path, data, **headers)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+            if response.status_code != 200:
+                raise CommandError(f'{name}: {method} {path} answered {response.status_code}.')
+            queries = sum(len(context) for context in captured)
+
+            timings = []
+            for _ in range(options['repeat']):
+                started = time.perf_counter()
+                response = request(path, data, **headers)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+                timings.append((time.perf_counter() - started) * 1000)
+            timings.sort()
+            results[name] = {
+                'view': view,
+                'path': path,
+                'queries': queries,
+                'budget': QUERY_BUDGETS[view],
+                'median_ms': round(statistics.median(timings), 2),
+                'p95_ms': round(timings[max(0, int(len(timings) * 0.95) - 1)], 2),
+                'min_ms': round(timings[0], 2),
+            }
+            self.stdout.write(f'{name:<26} {queries:>7} {QUERY_BUDGETS[view]:>6} '
+                              f'{results[name]["median_ms"]:>10.1f} {results[name]["p95_ms"]:>8.1f}')
+        return results
+
+    def _over_budget(self, results):
+        return [
+            f'{name}: {result["queries"]} queries, over its budget of {result["budget"]}'
+            for name, result in results.items() if result['queries'] > result['budget']
+        ]
+
+    def _regressions(self, results, baseline, options):
+        failures = []
+        for name, result in results.items():
+            before = baseline['results'].get(name)
+            if before is None:
+                continue
+            if result['queries'] > before['queries']:
+                failures.append(f'{name}: {result["queries"]} queries, {before["queries"]} in the baseline')
+            slowdown = result['median_ms'] - before['median_ms']
+            if slowdown > options['min_slowdown_ms'] and slowdown > before['median_ms'] * options['tolerance']:
+                failures.append(f'{name}: median {result["median_ms"]:.1f}ms, '
+                                f'{before["median_ms"]:.1f}ms in the baseline (+{slowdown / before["median_ms"]:.0%})')
+        return failures
@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from tickets import sharding
+from tickets.layouts import ROW_SPACING, SEAT_SPACING, row_sort_key
+from tickets.models import Event, SeatRow, Venue, VenueRow, VenueSeat, VenueSection
+
+
+class Command(BaseCommand):
+    help = 'Store the seating layout of an existing event as a venue that new events can be created on.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('event_id', type=int)
+        parser.add_argument('--name', help='Venue name (defaults to the event location)')
+        parser.add_argument('--section', default='Main', help='Section for event rows that have none')
+
+    def handle(self, *args, **options):
+        event = sharding.for_pk(Event.objects.all(), options['event_id']).filter(pk=options['event_id']).first()
+        if event is None:
+            raise CommandError(f'Event {options["event_id"]} does not exist.')
+        rows = list(
+            SeatRow.objects.using(event._state.db).filter(event=event)
+            .prefetch_related('seats').order_by('sort_key', 'name')
+        )
+        if not rows:
+            raise CommandError(f'Event {event.pk} has no seat rows to copy.')
+
+        with transaction.atomic(using=DEFAULT_DB_ALIAS):
+            venue = Venue.objects.create(name=options['name'] or event.location, location=event.location)
+            sections = {}
+            for row in rows:
+                name = row.section or options['section']
+                if name not in sections:
+                    sections[name] = VenueSection.objects.create(venue=venue, name=name, sort_order=len(sections))
+            venue_rows = VenueRow.objects.bulk_create(
+                VenueRow(section=sections[row.section or options['section']], name=row.name,
+                         sort_key=row_sort_key(row.name), price=row.price, svg_id=row.svg_id)
+                for row in rows
+            )
+            seats = VenueSeat.objects.bulk_create(
+                [
+                    VenueSeat(row=venue_row, number=seat.number,
+                              x=seat.x if seat.x is not None else seat.number * SEAT_SPACING,
+                              y=seat.y if seat.y is not None else i * ROW_SPACING)
+                    for i, (row, venue_row) in enumerate(zip(rows, venue_rows))
+                    for seat in row.seats.all()
+                ],
+                batch_size=1000,
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Created venue {venue.pk} "{venue.name}" with {len(venue_rows)} rows and {len(seats)} seats.'
+        ))
@@ -0,0 +1,28 @@
+import csv
+import sys
+
+from django.core.management.base import BaseCommand
+
+from tickets import coupons
+from tickets.models import Coupon
+
+
+class Command(BaseCommand):
+    help = 'Stream coupons to CSV without loading them all into memory.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--prefix', default='', help='Only export codes starting with this prefix')
+        parser.add_argument('--output', default='-', help="CSV file, '-' for stdout")
+        parser.add_argument('--chunk-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        queryset = Coupon.objects.all()
+        if options['prefix']:
+            queryset = queryset.filter(code__startswith=options['prefix'].upper())
+
+        out = sys.stdout if options['output'] == '-' else open(options['output'], 'w', newline='')
+        try:
+            csv.writer(out).writerows(coupons.iter_csv_rows(queryset, options['chunk_size']))
+        finally:
+            if out is not sys.stdout:
+                out.close()
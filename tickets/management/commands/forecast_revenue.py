@@ -0,0 +1,79 @@
+import csv
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        'Project revenue and sell-out time for upcoming events under a range of price changes, '
+        'e.g. "what if Row A were $10 cheaper". Requires NumPy.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--delta', type=float, action='append', dest='deltas',
+                            help='Price change per seat to evaluate (repeatable)')
+        parser.add_argument('--delta-range', type=float, nargs=3, metavar=('FROM', 'TO', 'STEP'),
+                            help='Evaluate every price change from FROM to TO in steps of STEP')
+        parser.add_argument('--event', type=int, action='append', dest='events', help='Limit to these events')
+        parser.add_argument('--row', type=int, action='append', dest='rows',
+                            help='Only change the price of these rows (default: every row)')
+        parser.add_argument('--elasticity', type=float, default=1.5)
+        parser.add_argument('--default-rate', type=float, default=0.0,
+                            help='Seats/day assumed for rows with no sales yet')
+        parser.add_argument('--output', help='Write per-event results as CSV to this file')
+
+    def handle(self, *args, **options):
+        try:
+            import numpy as np
+            from tickets import forecasting
+        except ImportError:
+            raise CommandError('forecast_revenue needs NumPy: pip install numpy')
+        from tickets.models import SeatRow
+        from django.utils import timezone
+
+        deltas = list(options['deltas'] or [])
+        if options['delta_range']:
+            low, high, step = options['delta_range']
+            if step <= 0:
+                raise CommandError('STEP must be positive.')
+            deltas.extend(np.arange(low, high + step / 2, step).tolist())
+        if not deltas:
+            deltas = [0.0]
+        if 0.0 not in deltas:
+            deltas.insert(0, 0.0)
+
+        started = time.perf_counter()
+        queryset = SeatRow.objects.filter(event__date__gt=timezone.now())
+        if options['events']:
+            queryset = queryset.filter(event_id__in=options['events'])
+        catalogue = forecasting.load_catalogue(queryset, default_rate=options['default_rate'])
+        loaded = time.perf_counter()
+
+        row_mask = np.isin(catalogue.row_ids, options['rows']) if options['rows'] else None
+        revenue, sellout_days = forecasting.simulate(
+            catalogue, deltas, elasticity=options['elasticity'], row_mask=row_mask
+        )
+        done = time.perf_counter()
+
+        totals = revenue.sum(axis=1)
+        baseline = totals[deltas.index(0.0)]
+        self.stdout.write(f'{len(catalogue.row_ids)} rows, {len(catalogue.event_starts)} events, '
+                          f'{len(deltas)} scenarios (load {loaded - started:.2f}s, '
+                          f'simulate {done - loaded:.2f}s)')
+        self.stdout.write(f'{"delta":>10} {"revenue":>16} {"vs. today":>12} {"sold out":>9}')
+        for i in np.argsort(-totals)[:20]:
+            self.stdout.write(
+                f'{deltas[i]:>10.2f} {totals[i]:>16,.2f} {totals[i] - baseline:>+12,.2f} '
+                f'{int(np.isfinite(sellout_days[i]).sum()):>9}'
+            )
+
+        if options['output']:
+            event_ids = catalogue.event_ids[catalogue.event_starts]
+            with open(options['output'], 'w', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(['event_id', 'delta', 'projected_revenue', 'sellout_days'])
+                for i, delta in enumerate(deltas):
+                    for event_id, event_revenue, days in zip(event_ids, revenue[i], sellout_days[i]):
+                        writer.writerow([event_id, delta, f'{event_revenue:.2f}',
+                                         '' if not np.isfinite(days) else f'{days:.1f}'])
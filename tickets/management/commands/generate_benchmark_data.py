@@ -0,0 +1,240 @@
+import multiprocessing
+import random
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.utils import timezone
+
+from tickets import sharding
+from tickets.layouts import row_sort_key
+from tickets.models import Category, Event, Payment, Seat, SeatRow, Ticket
+
+CATEGORIES = [
+    # (name, relative weight)
+    ('Concerts', 30), ('Sports', 20), ('Theatre', 12), ('Comedy', 8), ('Festivals', 6),
+    ('Conferences', 6), ('Family', 5), ('Opera', 3), ('Dance', 3), ('Exhibitions', 3),
+    ('Film', 2), ('Workshops', 2),
+]
+CITIES = [
+    ('New York', 18), ('London', 14), ('Los Angeles', 10), ('Chicago', 7), ('Toronto', 6),
+    ('Karachi', 6), ('Lahore', 5), ('Dubai', 5), ('Berlin', 5), ('Sydney', 4), ('Paris', 4),
+    ('Madrid', 3), ('Singapore', 3), ('Istanbul', 3), ('Mumbai', 3), ('Austin', 2), ('Dublin', 2),
+]
+VENUE_KINDS = ['Arena', 'Stadium', 'Hall', 'Theatre', 'Amphitheater', 'Club', 'Center']
+ADJECTIVES = ['Summer', 'Winter', 'Grand', 'Live', 'Midnight', 'Electric', 'Golden', 'Annual', 'Classic', 'Neon']
+NOUNS = ['Nights', 'Showcase', 'Tour', 'Festival', 'Series', 'Gala', 'Session', 'Championship', 'Revue', 'Jam']
+
+BENCHMARK_PASSWORD = 'benchmark'
+
+
+def _row_name(index):
+    letters = ''
+    index += 1
+    while index:
+        index, rest = divmod(index - 1, 26)
+        letters = chr(ord('A') + rest) + letters
+    return f'Row {letters}'
+
+
+@contextmanager
+def _explicit_timestamps():
+    """Let bulk_create keep the booked_at/payment_date values we generate."""
+    fields = [Ticket._meta.get_field('booked_at'), Payment._meta.get_field('payment_date')]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def _generate_chunk(args):
+    """Create one chunk of events with their rows, seats, tickets and payments."""
+    (chunk_index, first_event, count, options, category_ids, user_ids, now) = args
+    rng = random.Random(options['seed'] * 1000003 + chunk_index)
+    city_names, city_weights = zip(*CITIES)
+    category_weights = [weight for _, weight in CATEGORIES][:len(category_ids)]
+
+    events = []
+    on_sale = {}
+    for number in range(first_event, first_event + count):
+        city = rng.choices(city_names, city_weights)[0]
+        event = Event(
+            name=f'{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} #{number}',
+            date=now + timedelta(days=rng.uniform(-options['past_days'], options['future_days'])),
+            location=f'{city} {rng.choice(VENUE_KINDS)}',
+            description='Synthetic benchmark event.',
+        )
+        # When the event was put on sale; no booking is earlier than that or later than now
+        on_sale[id(event)] = min(now, event.date - timedelta(days=rng.uniform(14, 180)))
+        events.append(event)
+
+    # The whole chunk goes to one shard, the least loaded when it starts
+    db = sharding.shard_for_new_event() if sharding.get_shards() else DEFAULT_DB_ALIAS
+    with transaction.atomic(using=db):
+        Event.objects.using(db).bulk_create(events, batch_size=options['batch_size'])
+
+        event_categories = []
+        for event in events:
+            for category_id in set(rng.choices(category_ids, category_weights, k=rng.randint(1, 2))):
+                event_categories.append(Event.categories.through(event_id=event.id, category_id=category_id))
+        Event.categories.through.objects.using(db).bulk_create(event_categories, batch_size=options['batch_size'])
+
+        rows = []
+        booked_ratio = {}
+        for event in events:
+            # Mixed sell-through: most events sell around the mean, some sell out, some barely sell
+            ratio = min(1.0, rng.betavariate(2, 2) * 2 * options['booked_ratio'])
+            row_count = max(1, int(rng.gauss(options['rows_per_event'], options['rows_per_event'] / 4)))
+            base_price = Decimal(rng.choice([25, 35, 50, 75, 100, 150]))
+            for index in range(row_count):
+                # Front rows cost more
+                price = (base_price * Decimal(1.5 - index / (2 * row_count))).quantize(Decimal('0.01'))
+                # bulk_create skips SeatRow.save(), which fills in sort_key
+                name = _row_name(index)
+                row = SeatRow(event=event, name=name, sort_key=row_sort_key(name), price=price, base_price=price,
+                              capacity=max(1, int(rng.gauss(options['seats_per_row'], options['seats_per_row'] / 5))))
+                rows.append(row)
+                booked_ratio[id(row)] = ratio
+        SeatRow.objects.using(db).bulk_create(rows, batch_size=options['batch_size'])
+
+        seats = []
+        for row in rows:
+            ratio = booked_ratio[id(row)]
+            for number in range(1, row.capacity + 1):
+                seats.append(Seat(row=row, number=number, is_booked=rng.random() < ratio))
+        Seat.objects.using(db).bulk_create(seats, batch_size=options['batch_size'])
+
+        rows_by_id = {row.id: row for row in rows}
+        events_by_id = {event.id: event for event in events}
+        tickets = []
+        payments = []
+        for seat in seats:
+            if not seat.is_booked and not options['unsold_tickets']:
+                continue
+            row = rows_by_id[seat.row_id]
+            ticket = Ticket(seat=seat, price=row.price, booked_at=None)
+            tickets.append(ticket)
+            if not seat.is_booked:
+                continue
+            # Buyers often take a few neighbouring seats in one payment
+            last = payments[-1] if payments else None
+            if last and last[2] == row.id and len(last[1]) < 4 and rng.random() < 0.5:
+                ticket.user_id = last[0].user_id
+                ticket.booked_at = last[0].payment_date
+                last[1].append(ticket)
+            else:
+                event = events_by_id[row.event_id]
+                ticket.user_id = rng.choice(user_ids)
+                # Sales pick up towards the event, or towards now for upcoming ones
+                sales_end = min(now, event.date)
+                ticket.booked_at = max(on_sale[id(event)], sales_end - timedelta(days=rng.expovariate(1 / 30)))
+                payment = Payment(user_id=ticket.user_id, status='completed', payment_date=ticket.booked_at,
+                                  stripe_payment_id=f'pi_bench_{chunk_index}_{len(payments)}')
+                payments.append((payment, [ticket], row.id))
+
+        with _explicit_timestamps():
+            Ticket.objects.using(db).bulk_create(tickets, batch_size=options['batch_size'])
+            for payment, payment_ticket_list, _ in payments:
+                payment.amount = sum((t.price for t in payment_ticket_list), Decimal('0.00'))
+            Payment.objects.using(db).bulk_create([p for p, _, _ in payments], batch_size=options['batch_size'])
+        Payment.tickets.through.objects.using(db).bulk_create(
+            [Payment.tickets.through(payment_id=payment.id, ticket_id=ticket.id)
+             for payment, payment_ticket_list, _ in payments for ticket in payment_ticket_list],
+            batch_size=options['batch_size'],
+        )
+
+    return len(events), len(rows), len(seats), sum(1 for s in seats if s.is_booked), len(payments)
+
+
+def _close_connections():
+    connections.close_all()
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate a reproducible, production-sized dataset for performance testing: users, '
+        'categorised events in weighted cities, seat rows, seats with mixed sell-through, and '
+        'tickets and payments for booked seats.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--events', type=int, default=1000)
+        parser.add_argument('--rows-per-event', type=int, default=20)
+        parser.add_argument('--seats-per-row', type=int, default=25)
+        parser.add_argument('--booked-ratio', type=float, default=0.2, help='Mean share of seats booked')
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--past-days', type=int, default=180, help='Spread of past event dates')
+        parser.add_argument('--future-days', type=int, default=365, help='Spread of upcoming event dates')
+        parser.add_argument('--unsold-tickets', action='store_true',
+                            help='Also create tickets for unsold seats so they can be checked out')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--chunk-events', type=int, default=100, help='Events generated per chunk')
+        parser.add_argument('--batch-size', type=int, default=2000, help='Rows per INSERT')
+        parser.add_argument('--workers', type=int, default=1, help='Processes generating chunks in parallel')
+
+    def handle(self, *args, **options):
+        if not 0 <= options['booked_ratio'] <= 1:
+            raise CommandError('--booked-ratio must be between 0 and 1.')
+        started = time.perf_counter()
+        now = timezone.now()
+
+        categories = [Category(name=name, slug=name.lower()) for name, _ in CATEGORIES]
+        Category.objects.bulk_create(categories, ignore_conflicts=True)
+        categories = list(Category.objects.filter(name__in=[name for name, _ in CATEGORIES]).order_by('id'))
+        category_ids = [category.id for category in categories]
+        # bulk_create skips the signal that mirrors categories to the shards
+        for alias in sharding.get_shards():
+            if alias != DEFAULT_DB_ALIAS:
+                Category.objects.using(alias).bulk_create(categories, ignore_conflicts=True)
+
+        password = make_password(BENCHMARK_PASSWORD)
+        existing = set(User.objects.filter(username__startswith='bench_user_').values_list('username', flat=True))
+        User.objects.bulk_create(
+            (User(username=f'bench_user_{i}', email=f'bench_user_{i}@example.com', password=password)
+             for i in range(options['users']) if f'bench_user_{i}' not in existing),
+            batch_size=options['batch_size'],
+        )
+        # Ordered, so the same --seed picks the same buyers
+        user_ids = list(User.objects.filter(username__startswith='bench_user_').order_by('id')
+                        .values_list('id', flat=True))
+        if not user_ids:
+            raise CommandError('--users must be at least 1.')
+        self.stdout.write(f'{len(user_ids)} users ready ({time.perf_counter() - started:.1f}s)')
+
+        chunk_events = options['chunk_events']
+        chunks = [
+            (index, start, min(chunk_events, options['events'] - start), options, category_ids, user_ids, now)
+            for index, start in enumerate(range(0, options['events'], chunk_events))
+        ]
+
+        totals = [0, 0, 0, 0, 0]
+        if options['workers'] > 1:
+            connections.close_all()
+            context = multiprocessing.get_context('fork')
+            with context.Pool(options['workers'], initializer=_close_connections) as pool:
+                results = pool.imap_unordered(_generate_chunk, chunks)
+                totals = self._collect(results, totals, started, options['verbosity'])
+        else:
+            totals = self._collect(map(_generate_chunk, chunks), totals, started, options['verbosity'])
+
+        events, rows, seats, booked, payments = totals
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {events} events, {rows} rows, {seats} seats ({booked} booked), {payments} payments '
+            f'in {time.perf_counter() - started:.1f}s. Benchmark users log in with "{BENCHMARK_PASSWORD}".'
+        ))
+
+    def _collect(self, results, totals, started, verbosity):
+        for done, result in enumerate(results, start=1):
+            totals = [total + value for total, value in zip(totals, result)]
+            if verbosity > 1 or done % 10 == 0:
+                self.stdout.write(f'{totals[0]} events, {totals[2]} seats ({time.perf_counter() - started:.1f}s)')
+        return totals
+
@@ -0,0 +1,66 @@
+import csv
+import sys
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from tickets import coupons
+from tickets.models import Coupon
+
+
+class Command(BaseCommand):
+    help = 'Mint unique, non-guessable coupon codes in bulk, optionally writing them to a CSV file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('count', type=int, help='Number of codes to create')
+        parser.add_argument('--discount', type=int, required=True, help='Discount percent')
+        parser.add_argument('--valid-days', type=int, default=30)
+        parser.add_argument('--prefix', default='', help='Campaign prefix, e.g. PARTNER-')
+        parser.add_argument('--length', type=int, default=10, help='Random characters per code')
+        parser.add_argument('--max-redemptions', type=int)
+        parser.add_argument('--max-per-user', type=int)
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument('--output', help="CSV file for the new codes, '-' for stdout")
+
+    def handle(self, *args, **options):
+        if not 1 <= options['discount'] <= 100:
+            raise CommandError('--discount must be between 1 and 100.')
+        for option in ('max_redemptions', 'max_per_user'):
+            if options[option] is not None and options[option] < 0:
+                raise CommandError(f'--{option.replace("_", "-")} cannot be negative.')
+        valid_until = timezone.now() + timedelta(days=options['valid_days'])
+        out = None
+        if options['output'] == '-':
+            out = sys.stdout
+        elif options['output']:
+            out = open(options['output'], 'w', newline='')
+        writer = csv.writer(out) if out else None
+        if writer:
+            writer.writerow(coupons.CSV_FIELDS)
+
+        created = 0
+        try:
+            for codes in coupons.generate_codes(options['count'], options['length'],
+                                                options['prefix'], options['chunk_size']):
+                # Only the codes that were inserted; another process may have taken some since
+                codes = coupons.insert_coupons(
+                    Coupon(code=code, discount_percent=options['discount'], valid_until=valid_until,
+                           max_redemptions=options['max_redemptions'],
+                           max_per_user=options['max_per_user'])
+                    for code in codes
+                )
+                created += len(codes)
+                if writer:
+                    for code in codes:
+                        writer.writerow(coupons.csv_row(code, options['discount'], valid_until,
+                                                        options['max_redemptions'], options['max_per_user']))
+                if options['verbosity'] > 1:
+                    self.stderr.write(f'{created} codes created')
+        except ValueError as e:
+            raise CommandError(str(e))
+        finally:
+            if out and out is not sys.stdout:
+                out.close()
+
+        self.stderr.write(self.style.SUCCESS(f'Created {created} coupons.'))
@@ -0,0 +1,80 @@
+import csv
+import sys
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from tickets import coupons
+from tickets.models import Coupon
+
+
+class Command(BaseCommand):
+    help = (
+        'Stream coupons from a CSV file into the database. The file needs a "code" column; '
+        'discount_percent, valid_until, max_redemptions and max_per_user columns are optional '
+        'and fall back to the command options. Existing codes are skipped.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV file, '-' for stdin")
+        parser.add_argument('--discount', type=int, help='Discount percent for rows without one')
+        parser.add_argument('--valid-days', type=int, default=30)
+        parser.add_argument('--chunk-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        default_valid_until = timezone.now() + timedelta(days=options['valid_days'])
+        source = sys.stdin if options['path'] == '-' else open(options['path'], newline='')
+        try:
+            reader = csv.DictReader(source)
+            if not reader.fieldnames or 'code' not in reader.fieldnames:
+                raise CommandError('The CSV file needs a "code" column.')
+            max_code_length = Coupon._meta.get_field('code').max_length
+
+            def number(value, line, field, minimum=0, maximum=None):
+                try:
+                    result = int(value)
+                except (TypeError, ValueError):
+                    raise CommandError(f'Line {line}: {field} must be a whole number, not "{value}".')
+                if result < minimum or (maximum is not None and result > maximum):
+                    limits = f'between {minimum} and {maximum}' if maximum is not None else f'at least {minimum}'
+                    raise CommandError(f'Line {line}: {field} must be {limits}, not {result}.')
+                return result
+
+            def rows():
+                for line, row in enumerate(reader, start=2):
+                    code = (row.get('code') or '').strip().upper()
+                    if not code:
+                        continue
+                    if len(code) > max_code_length:
+                        raise CommandError(f'Line {line}: codes are limited to {max_code_length} characters.')
+                    discount = row.get('discount_percent') or options['discount']
+                    if discount in (None, ''):
+                        raise CommandError(f'Line {line}: no discount_percent and no --discount given.')
+                    valid_until = default_valid_until
+                    if row.get('valid_until'):
+                        try:
+                            valid_until = parse_datetime(row['valid_until'])
+                        except ValueError:
+                            valid_until = None
+                        if valid_until is None:
+                            raise CommandError(f'Line {line}: valid_until "{row["valid_until"]}" is not a date.')
+                    yield Coupon(
+                        code=code,
+                        discount_percent=number(discount, line, 'discount_percent', 1, 100),
+                        valid_until=valid_until,
+                        max_redemptions=(number(row['max_redemptions'], line, 'max_redemptions')
+                                         if row.get('max_redemptions') else None),
+                        max_per_user=number(row['max_per_user'], line, 'max_per_user') if row.get('max_per_user') else None,
+                    )
+
+            # One transaction, so a bad line further down leaves no half-imported file behind
+            with transaction.atomic():
+                total = coupons.create_coupons(rows(), chunk_size=options['chunk_size'])
+        finally:
+            if source is not sys.stdin:
+                source.close()
+
+        self.stdout.write(self.style.SUCCESS(f'Imported {total} coupons (existing codes skipped).'))
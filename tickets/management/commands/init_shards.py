@@ -0,0 +1,64 @@
+from django.apps import apps
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from tickets import sharding
+from tickets.models import Category
+
+
+class Command(BaseCommand):
+    help = (
+        'Prepare the databases in DATABASE_SHARDS: migrate them, start the id sequences of the '
+        'sharded tables in each shard\'s own range and mirror the categories. Safe to run again.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--skip-migrate', action='store_true')
+
+    def handle(self, *args, **options):
+        shards = sharding.get_shards()
+        if not shards:
+            raise CommandError('No shards configured. Set DB_SHARDS (see tickets.sharding).')
+
+        models = [model for model in apps.get_models(include_auto_created=True) if sharding.is_sharded(model)]
+        for index, alias in enumerate(shards):
+            if not options['skip_migrate']:
+                call_command('migrate', database=alias, verbosity=0)
+            if index:
+                for model in models:
+                    self._start_sequence(alias, model, index << sharding.SHARD_BITS)
+                self._mirror_categories(alias)
+            self.stdout.write(f'{alias}: ids from {index << sharding.SHARD_BITS}')
+        self.stdout.write(self.style.SUCCESS(f'{len(shards)} shards ready.'))
+
+    def _start_sequence(self, alias, model, start):
+        """Make the next id on ``alias`` at least ``start`` + 1."""
+        connection = connections[alias]
+        table = model._meta.db_table
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                cursor.execute('SELECT seq FROM sqlite_sequence WHERE name = %s', [table])
+                row = cursor.fetchone()
+                if row is None:
+                    cursor.execute('INSERT INTO sqlite_sequence (name, seq) VALUES (%s, %s)', [table, start])
+                elif row[0] < start:
+                    cursor.execute('UPDATE sqlite_sequence SET seq = %s WHERE name = %s', [start, table])
+            elif connection.vendor == 'postgresql':
+                column = model._meta.pk.column
+                cursor.execute(
+                    f'SELECT setval(pg_get_serial_sequence(%s, %s), '
+                    f'GREATEST(%s, (SELECT COALESCE(MAX({connection.ops.quote_name(column)}), 0) '
+                    f'FROM {connection.ops.quote_name(table)})))',
+                    [table, column, start],
+                )
+            else:
+                raise CommandError(f'Sharding does not support {connection.vendor} databases.')
+
+    def _mirror_categories(self, alias):
+        categories = list(Category.objects.using(DEFAULT_DB_ALIAS).all())
+        with transaction.atomic(using=alias):
+            # Categories created on the shard by data migrations would clash
+            Category.objects.using(alias).exclude(pk__in=[c.pk for c in categories]).delete()
+            for category in categories:
+                category.save(using=alias)
@@ -0,0 +1,432 @@
+import asyncio
+import json
+import random
+import re
+import ssl
+import time
+from collections import Counter, defaultdict
+from datetime import timedelta
+from decimal import Decimal
+from urllib.parse import urlencode, urlsplit
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from django.utils import timezone
+
+from tickets import payments, sharding
+from tickets.models import Coupon, Event, Payment, Seat, SeatRow, Ticket
+
+SCENARIOS = {
+    # name: steps, in the order a visitor takes them
+    'browse': ['home', 'list', 'detail'],
+    'buy': ['home', 'list', 'detail', 'seat_map', 'login', 'checkout', 'coupon', 'pay', 'confirm'],
+}
+LOAD_TEST_COUPON = 'LOADTEST'
+LOAD_TEST_PASSWORD = 'load-test'
+SEATS_PER_ROW = 50
+
+_AVAILABLE_TICKET = re.compile(r'data-ticket-status="available">.*?data-ticket-id="(\d+)"', re.S)
+_CHECKOUT_TOKEN = re.compile(r"let checkoutToken = '([^']+)'")
+
+
+class Response:
+    def __init__(self, status, headers, body):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    def text(self):
+        return self.body.decode('utf-8', 'replace')
+
+
+class HttpClient:
+    """A minimal HTTP/1.1 client with keep-alive and cookies, one per virtual user."""
+
+    def __init__(self, host, port, use_ssl):
+        self.host = host
+        self.port = port
+        self.ssl = ssl.create_default_context() if use_ssl else None
+        self.cookies = {}
+        self.reader = self.writer = None
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.reader = self.writer = None
+
+    async def request(self, method, path, data=None, headers=None):
+        reused = self.writer is not None
+        try:
+            return await self._request(method, path, data, headers)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            await self.close()
+            if not reused:
+                raise
+            # The server closed the idle connection; retry once on a new one
+            return await self._request(method, path, data, headers)
+
+    async def _request(self, method, path, data, headers):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port, ssl=self.ssl)
+        body = urlencode(data).encode() if data is not None else b''
+        lines = [f'{method} {path} HTTP/1.1', f'Host: {self.host}:{self.port}', 'Connection: keep-alive',
+                 'User-Agent: load_test']
+        if self.cookies:
+            lines.append('Cookie: ' + '; '.join(f'{name}={value}' for name, value in self.cookies.items()))
+        if data is not None:
+            lines += ['Content-Type: application/x-www-form-urlencoded', f'Content-Length: {len(body)}']
+        lines += [f'{name}: {value}' for name, value in (headers or {}).items()]
+        self.writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body)
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError('Connection closed by the server')
+        version, status = status_line.decode('latin-1').split(' ', 2)[:2]
+        response_headers = {}
+        while True:
+            line = (await self.reader.readline()).decode('latin-1')
+            if line in ('\r\n', '\n', ''):
+                break
+            name, _, value = line.partition(':')
+            name, value = name.strip().lower(), value.strip()
+            if name == 'set-cookie':
+                self._set_cookie(value)
+            else:
+                response_headers[name] = value
+
+        if 'chunked' in response_headers.get('transfer-encoding', ''):
+            chunks = []
+            while True:
+                size = int((await self.reader.readline()).split(b';')[0], 16)
+                if not size:
+                    while (await self.reader.readline()) not in (b'\r\n', b'\n', b''):
+                        pass
+                    break
+                chunks.append(await self.reader.readexactly(size))
+                await self.reader.readline()
+            response_body = b''.join(chunks)
+        elif 'content-length' in response_headers:
+            response_body = await self.reader.readexactly(int(response_headers['content-length']))
+        else:
+            response_body = await self.reader.read()
+            response_headers['connection'] = 'close'
+        if response_headers.get('connection', '').lower() == 'close' or version == 'HTTP/1.0':
+            await self.close()
+        return Response(int(status), response_headers, response_body)
+
+    def _set_cookie(self, header):
+        pair, *attributes = header.split(';')
+        name, _, value = pair.strip().partition('=')
+        if any(attribute.strip().lower() == 'max-age=0' for attribute in attributes):
+            self.cookies.pop(name, None)
+        else:
+            self.cookies[name] = value.strip('"')
+
+
+class Stats:
+    def __init__(self):
+        self.latencies = defaultdict(list)  # (scenario, step) -> seconds
+        self.errors = defaultdict(Counter)  # (scenario, step) -> {error: count}
+        self.runs = Counter()  # scenario -> runs
+        self.outcomes = defaultdict(Counter)  # scenario -> {outcome: count}
+        self.confirmed = Counter()  # ticket id -> confirmations seen by virtual users
+
+    def record(self, scenario, step, seconds, error=None):
+        self.latencies[scenario, step].append(seconds)
+        if error:
+            self.errors[scenario, step][error] += 1
+
+
+def _percentile(ordered, fraction):
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))]
+
+
+class Command(BaseCommand):
+    help = (
+        'Simulate an on-sale rush: virtual users browse and buy tickets through the real URLs of a '
+        'running server, e.g. "STRIPE_STUB=True manage.py runserver" in another shell. Reports '
+        'throughput, latency percentiles, errors and double bookings per scenario.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help='Base URL of the server under test')
+        parser.add_argument('--event', type=int, action='append', dest='events',
+                            help='Event id to sell (repeatable)')
+        parser.add_argument('--create-event', type=int, metavar='SEATS',
+                            help='Create an event with this many seats to sell, and the LOADTEST coupon')
+        parser.add_argument('--users', type=int, default=50, help='Concurrent virtual users')
+        parser.add_argument('--duration', type=float, default=60, help='Seconds to run for')
+        parser.add_argument('--ramp-up', type=float, default=10, help='Seconds over which users start')
+        parser.add_argument('--buy-ratio', type=float, default=0.5,
+                            help='Share of scenario runs that try to buy rather than only browse')
+        parser.add_argument('--coupon', help='Coupon code buyers apply, e.g. LOADTEST')
+        parser.add_argument('--decline-ratio', type=float, default=0.0,
+                            help=f'Share of payments made with the declined test card ({payments.DECLINED_TEST_CARD})')
+        parser.add_argument('--think-time', type=float, default=1.0,
+                            help='Mean seconds a user pauses between pages')
+        parser.add_argument('--timeout', type=float, default=30, help='Seconds before a request counts as failed')
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        url = urlsplit(options['url'])
+        if url.scheme not in ('http', 'https') or not url.hostname:
+            raise CommandError(f'Not an http(s) URL: {options["url"]}')
+        self.host = url.hostname
+        self.port = url.port or (443 if url.scheme == 'https' else 80)
+        self.use_ssl = url.scheme == 'https'
+        self.options = options
+
+        event_ids = list(options['events'] or [])
+        if options['create_event']:
+            event_ids.append(self._create_event(options['create_event']))
+        if not event_ids:
+            raise CommandError('Give the events to sell with --event, or create one with --create-event.')
+        self.event_ids = event_ids
+        self.usernames = self._ensure_buyers(options['users'])
+
+        stats = Stats()
+        started = time.perf_counter()
+        asyncio.run(self._run(stats))
+        elapsed = time.perf_counter() - started
+        self._report(stats, elapsed)
+
+    def _create_event(self, seat_count):
+        event = Event.objects.create(
+            name=f'Load test {timezone.now():%Y-%m-%d %H:%M:%S}', date=timezone.now() + timedelta(days=30),
+            location='Load Test Arena', description='Created by the load_test command.',
+        )
+        db = event._state.db
+        rows, left = [], seat_count
+        while left > 0:
+            # Saved one by one so each row creates its seats
+            row = SeatRow(event=event, name=f'Row {len(rows) + 1}', capacity=min(SEATS_PER_ROW, left),
+                          price=Decimal('50.00'))
+            row.save(using=db)
+            rows.append(row)
+            left -= row.capacity
+        Ticket.objects.using(db).bulk_create(
+            Ticket(seat=seat, price=Decimal('50.00')) for seat in Seat.objects.using(db).filter(row__event=event)
+        )
+        Coupon.objects.get_or_create(code=LOAD_TEST_COUPON, defaults={
+            'discount_percent': 10, 'valid_until': timezone.now() + timedelta(days=365),
+        })
+        self.stdout.write(f'Created event {event.id} with {seat_count} seats.')
+        return event.id
+
+    def _ensure_buyers(self, count):
+        """Accounts for the virtual users to sign in with, as checkout needs one."""
+        usernames = [f'load_test_{number}' for number in range(count)]
+        existing = set(User.objects.filter(username__in=usernames).values_list('username', flat=True))
+        # One hash for all of them; hashing is slow on purpose
+        password = make_password(LOAD_TEST_PASSWORD)
+        User.objects.bulk_create(
+            User(username=username, email=f'{username}@example.com', password=password)
+            for username in usernames if username not in existing
+        )
+        return usernames
+
+    async def _run(self, stats):
+        deadline = time.monotonic() + self.options['duration']
+        users = self.options['users']
+        ramp_up = min(self.options['ramp_up'], self.options['duration'])
+        await asyncio.gather(*(
+            self._virtual_user(number, ramp_up * number / users, deadline, stats) for number in range(users)
+        ))
+
+    async def _virtual_user(self, number, delay, deadline, stats):
+        rng = random.Random(self.options['seed'] * 100003 + number)
+        await asyncio.sleep(delay)
+        while time.monotonic() < deadline:
+            # Each run is a new visitor, without the last one's cookies
+            client = HttpClient(self.host, self.port, self.use_ssl)
+            scenario = 'buy' if rng.random() < self.options['buy_ratio'] else 'browse'
+            try:
+                outcome = await self._scenario(scenario, client, rng, stats, self.usernames[number])
+            finally:
+                await client.close()
+            stats.runs[scenario] += 1
+            stats.outcomes[scenario][outcome] += 1
+
+    async def _think(self, rng):
+        if self.options['think_time']:
+            await asyncio.sleep(rng.expovariate(1 / self.options['think_time']))
+
+    async def _step(self, stats, scenario, step, client, method, path, data=None, headers=None,
+                    expect=(200,)):
+        started = time.perf_counter()
+        try:
+            response = await asyncio.wait_for(client.request(method, path, data, headers), self.options['timeout'])
+        except asyncio.TimeoutError:
+            stats.record(scenario, step, time.perf_counter() - started, 'timeout')
+            await client.close()
+            return None
+        except (OSError, ValueError, asyncio.IncompleteReadError) as e:
+            stats.record(scenario, step, time.perf_counter() - started, type(e).__name__)
+            await client.close()
+            return None
+        ok = response.status in expect
+        stats.record(scenario, step, time.perf_counter() - started, None if ok else f'HTTP {response.status}')
+        return response if ok else None
+
+    async def _scenario(self, scenario, client, rng, stats, username):
+        """Take the steps of ``scenario`` and return how the run ended."""
+        for step, path in [('home', '/'), ('list', '/events-list/')]:
+            if await self._step(stats, scenario, step, client, 'GET', path) is None:
+                return 'error'
+            await self._think(rng)
+        event_id = rng.choice(self.event_ids)
+        detail = await self._step(stats, scenario, 'detail', client, 'GET', f'/events-list/{event_id}/')
+        if detail is None:
+            return 'error'
+        if scenario == 'browse':
+            return 'done'
+        await self._think(rng)
+
+        if 'id="seat-map-viewer"' in detail.text():
+            ticket_id = await self._pick_from_seat_map(stats, scenario, client, rng, event_id)
+        else:
+            available = _AVAILABLE_TICKET.findall(detail.text())
+            ticket_id = int(rng.choice(available)) if available else None
+        if ticket_id is None:
+            return 'sold_out'
+
+        checkout_path = f'/checkout/{ticket_id}/'
+        # Signing in sends the buyer on to the checkout page
+        if await self._step(stats, scenario, 'login', client, 'GET', f'/login/?next={checkout_path}') is None:
+            return 'error'
+        response = await self._step(stats, scenario, 'login', client, 'POST', '/login/', {
+            'csrfmiddlewaretoken': client.cookies.get('csrftoken', ''),
+            'username': username,
+            'password': LOAD_TEST_PASSWORD,
+            'next': checkout_path,
+        }, expect=(302,))
+        if response is None:
+            return 'error'
+        page = await self._step(stats, scenario, 'checkout', client, 'GET', checkout_path, expect=(200, 302))
+        if page is None:
+            return 'error'
+        if page.status == 302:
+            return 'seat_taken'
+        token = _CHECKOUT_TOKEN.search(page.text())
+        if token is None:
+            stats.errors[scenario, 'checkout']['no checkout token'] += 1
+            return 'error'
+        token = token.group(1)
+        csrf_token = client.cookies.get('csrftoken', '')
+        await self._think(rng)
+
+        if self.options['coupon']:
+            response = await self._step(
+                stats, scenario, 'coupon', client, 'POST', '/events-list/apply-coupon/',
+                {'coupon_code': self.options['coupon'], 'checkout_token': token},
+                {'X-Requested-With': 'XMLHttpRequest', 'X-CSRFToken': csrf_token},
+            )
+            if response is None:
+                return 'error'
+            token = _json_value(response, 'checkout_token') or token
+            await self._think(rng)
+
+        declined = rng.random() < self.options['decline_ratio']
+        response = await self._step(stats, scenario, 'pay', client, 'POST', checkout_path, {
+            'csrfmiddlewaretoken': csrf_token,
+            'checkout_token': token,
+            'full_name': f'Load Test {rng.randrange(10 ** 6)}',
+            'email': 'load-test@example.com',
+            'phone': '5550100100',
+            'payment_method_id': payments.DECLINED_TEST_CARD if declined else 'pm_card_visa',
+        }, expect=(302,))
+        if response is None:
+            return 'error'
+        location = urlsplit(response.headers.get('location', '')).path
+        if '/booking-confirmation/' not in location:
+            # Sent back to the event page: declined, or someone else paid first
+            return 'declined' if declined else 'seat_taken'
+        stats.confirmed[ticket_id] += 1
+
+        if await self._step(stats, scenario, 'confirm', client, 'GET', location) is None:
+            return 'error'
+        return 'booked'
+
+    async def _pick_from_seat_map(self, stats, scenario, client, rng, event_id):
+        """Look around the tiled seat map the way the viewer does and click a free seat."""
+        meta = await self._step(stats, scenario, 'seat_map', client, 'GET', f'/events-list/{event_id}/seat-map/')
+        if meta is None:
+            return None
+        meta = _json(meta)
+        (x0, y0), span = meta['origin'], meta['span']
+        for attempt in range(3):
+            # A zoomed-in viewport somewhere on the map
+            size = span / 8
+            left, top = x0 + rng.uniform(0, span - size), y0 + rng.uniform(0, span - size)
+            box = urlencode({'x0': left, 'y0': top, 'x1': left + size, 'y1': top + size})
+            seats = await self._step(stats, scenario, 'seat_map', client, 'GET', f'{meta["seats_url"]}?{box}')
+            if seats is None:
+                return None
+            free = [seat for seat in _json(seats).get('seats') or [] if not seat[3]]
+            if not free:
+                continue
+            _, x, y, _ = rng.choice(free)
+            hit = await self._step(stats, scenario, 'seat_map', client, 'GET',
+                                   f'{meta["hit_url"]}?{urlencode({"x": x, "y": y})}')
+            return _json_value(hit, 'ticket_id') if hit is not None else None
+        return None
+
+    def _double_bookings(self):
+        """Seats of the events under test with more than one payment, per the database."""
+        count = 0
+        for event_id in self.event_ids:
+            links = sharding.for_pk(Payment.tickets.through.objects.all(), event_id)
+            count += (
+                links.filter(ticket__seat__row__event_id=event_id).values('ticket__seat_id')
+                .annotate(payments=Count('payment_id')).filter(payments__gt=1).count()
+            )
+        return count
+
+    def _report(self, stats, elapsed):
+        for scenario, steps in SCENARIOS.items():
+            runs = stats.runs[scenario]
+            if not runs:
+                continue
+            outcomes = ', '.join(f'{count} {outcome}' for outcome, count in stats.outcomes[scenario].most_common())
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'{scenario}: {runs} runs in {elapsed:.1f}s ({runs / elapsed:.1f}/s): {outcomes}'
+            ))
+            self.stdout.write(f'  {"step":<10} {"requests":>9} {"req/s":>7} {"errors":>7} '
+                              f'{"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8}')
+            for step in steps:
+                latencies = sorted(stats.latencies[scenario, step])
+                if not latencies:
+                    continue
+                errors = stats.errors[scenario, step]
+                error_rate = sum(errors.values()) / len(latencies)
+                self.stdout.write(
+                    f'  {step:<10} {len(latencies):>9} {len(latencies) / elapsed:>7.1f} {error_rate:>7.1%} '
+                    + ' '.join(f'{_percentile(latencies, q) * 1000:>8.1f}' for q in (0.5, 0.95, 0.99))
+                )
+                for error, count in errors.most_common(3):
+                    self.stdout.write(f'    {count}x {error}')
+
+        confirmed_twice = sum(1 for count in stats.confirmed.values() if count > 1)
+        double_bookings = self._double_bookings()
+        message = (f'Double bookings: {double_bookings} in the database, '
+                   f'{confirmed_twice} tickets confirmed to more than one buyer')
+        if double_bookings or confirmed_twice:
+            self.stderr.write(self.style.ERROR(message))
+        else:
+            self.stdout.write(self.style.SUCCESS(message))
+
+
+def _json(response):
+    try:
+        return json.loads(response.body)
+    except ValueError:
+        return {}
+
+
+def _json_value(response, key):
+    return _json(response).get(key)
@@ -0,0 +1,230 @@
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, time as dt_time
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connections, transaction
+
+
+def _copy_value(value):
+    """Render a Python value the way PostgreSQL's COPY ... CSV expects it."""
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, (datetime, date, dt_time)):
+        return value.isoformat()
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    return value
+
+
+def _copy_line(row):
+    """
+    One CSV line for COPY. NULL is the only unquoted empty field; every value
+    is quoted, so an empty string stays an empty string.
+    """
+    fields = []
+    for value in map(_copy_value, row):
+        fields.append('' if value is None else '"' + str(value).replace('"', '""') + '"')
+    return ','.join(fields) + '\n'
+
+
+def _table_levels(models):
+    """Group models so every model comes after the models it references."""
+    remaining = {model: {field.related_model for field in model._meta.concrete_fields
+                         if field.is_relation and field.related_model is not model
+                         and field.related_model in models}
+                 for model in models}
+    levels = []
+    while remaining:
+        ready = [model for model, deps in remaining.items() if not deps & remaining.keys()]
+        if not ready:
+            raise CommandError('Circular foreign keys between: ' + ', '.join(m._meta.db_table for m in remaining))
+        levels.append(sorted(ready, key=lambda m: m._meta.db_table))
+        for model in ready:
+            del remaining[model]
+    return levels
+
+
+class Checkpoint:
+    """Progress per table, saved after every committed chunk so a crash can resume."""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.tables = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self.tables = json.load(f)
+
+    def get(self, table):
+        return self.tables.get(table, {'last_pk': None, 'rows': 0, 'done': False})
+
+    def update(self, table, **values):
+        with self.lock:
+            self.tables[table] = {**self.get(table), **values}
+            tmp = self.path + '.tmp'
+            with open(tmp, 'w') as f:
+                json.dump(self.tables, f, indent=1)
+            os.replace(tmp, self.path)
+
+
+class Command(BaseCommand):
+    help = (
+        'Copy every table from one database alias (e.g. the old SQLite file) into a PostgreSQL '
+        'alias using COPY. Tables are streamed in primary-key order in fixed-size chunks, tables '
+        'without dependencies between them load in parallel, progress is checkpointed so an '
+        'interrupted run resumes, sequences are reset, and row counts and checksums are compared '
+        'at the end. Run "migrate --database <target>" first.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--source', default='sqlite_source', help='Database alias to read from')
+        parser.add_argument('--target', default='default', help='PostgreSQL database alias to write to')
+        parser.add_argument('--chunk-size', type=int, default=20000)
+        parser.add_argument('--jobs', type=int, default=4, help='Tables loaded in parallel')
+        parser.add_argument('--checkpoint', default='migrate_to_postgres.checkpoint.json')
+        parser.add_argument('--restart', action='store_true',
+                            help='Ignore an existing checkpoint and empty the target tables first. '
+                                 'Needed on the first run, as migrate already fills a few tables.')
+        parser.add_argument('--skip-verify', action='store_true')
+
+    def handle(self, *args, **options):
+        source, target = options['source'], options['target']
+        for alias in (source, target):
+            if alias not in connections:
+                raise CommandError(f'Unknown database alias "{alias}". See POSTGRESQL_SETUP.md.')
+        if connections[target].vendor != 'postgresql':
+            raise CommandError(f'"{target}" is not a PostgreSQL database.')
+        self.source, self.target, self.chunk_size = source, target, options['chunk_size']
+
+        models = [model for model in apps.get_models(include_auto_created=True)
+                  if model._meta.managed and not model._meta.proxy]
+        if options['restart'] and os.path.exists(options['checkpoint']):
+            os.remove(options['checkpoint'])
+        self.checkpoint = Checkpoint(options['checkpoint'])
+        if options['restart']:
+            self._truncate(models)
+        elif not self.checkpoint.tables:
+            filled = [m._meta.db_table for m in models if m._base_manager.using(target).exists()]
+            if filled:
+                raise CommandError(
+                    f'"{target}" already has rows in {", ".join(sorted(filled))}. Run with --restart to empty '
+                    f'every table of "{target}" first.'
+                )
+
+        started = time.perf_counter()
+        for level in _table_levels(set(models)):
+            with ThreadPoolExecutor(max_workers=options['jobs']) as pool:
+                for result in pool.map(self._copy_table_in_thread, level):
+                    self.stdout.write(result)
+
+        with connections[target].cursor() as cursor:
+            for sql in connections[target].ops.sequence_reset_sql(no_style(), models):
+                cursor.execute(sql)
+        self.stdout.write(f'Copied in {time.perf_counter() - started:.1f}s, sequences reset.')
+
+        if not options['skip_verify']:
+            with ThreadPoolExecutor(max_workers=options['jobs']) as pool:
+                mismatches = [problem for problem in pool.map(self._verify_in_thread, models) if problem]
+            for problem in mismatches:
+                self.stderr.write(self.style.ERROR(problem))
+            if mismatches:
+                raise CommandError(f'{len(mismatches)} tables differ between {source} and {target}.')
+            self.stdout.write(self.style.SUCCESS(f'Verified {len(models)} tables: counts and checksums match.'))
+
+    def _truncate(self, models):
+        tables = ', '.join(connections[self.target].ops.quote_name(m._meta.db_table) for m in models)
+        with connections[self.target].cursor() as cursor:
+            cursor.execute(f'TRUNCATE {tables} RESTART IDENTITY CASCADE')
+
+    def _copy_table_in_thread(self, model):
+        try:
+            return self._copy_table(model)
+        finally:
+            # Each worker thread opened its own connections
+            connections.close_all()
+
+    def _copy_table(self, model):
+        table = model._meta.db_table
+        state = self.checkpoint.get(table)
+        if state['done']:
+            return f'{table}: already copied ({state["rows"]} rows)'
+
+        pk = model._meta.pk
+        integer_pk = pk.get_internal_type() in ('AutoField', 'BigAutoField', 'SmallAutoField', 'IntegerField',
+                                                'BigIntegerField', 'PositiveIntegerField')
+        target_qs = model._base_manager.using(self.target)
+        last_pk, rows = state['last_pk'], state['rows']
+        if integer_pk:
+            # A chunk may have committed after the last checkpoint write
+            target_max = target_qs.order_by('-pk').values_list('pk', flat=True).first()
+            if target_max is not None and (last_pk is None or target_max > last_pk):
+                last_pk, rows = target_max, target_qs.count()
+        elif last_pk is not None:
+            # Text keys sort differently across backends, so start such tables over
+            target_qs.all()._raw_delete(self.target)
+            last_pk, rows = None, 0
+
+        fields = model._meta.concrete_fields
+        columns = ', '.join(connections[self.target].ops.quote_name(f.column) for f in fields)
+        copy_sql = f'COPY {connections[self.target].ops.quote_name(table)} ({columns}) FROM STDIN WITH (FORMAT csv)'
+        source_qs = model._base_manager.using(self.source).order_by('pk').values_list(*[f.attname for f in fields])
+        pk_index = [f.attname for f in fields].index(pk.attname)
+
+        while True:
+            chunk = list((source_qs.filter(pk__gt=last_pk) if last_pk is not None else source_qs)[:self.chunk_size])
+            if not chunk:
+                break
+            buffer = io.StringIO()
+            buffer.writelines(_copy_line(row) for row in chunk)
+            buffer.seek(0)
+            with transaction.atomic(using=self.target):
+                self._copy(copy_sql, buffer)
+            last_pk, rows = chunk[-1][pk_index], rows + len(chunk)
+            self.checkpoint.update(table, last_pk=last_pk, rows=rows)
+
+        self.checkpoint.update(table, last_pk=last_pk, rows=rows, done=True)
+        return f'{table}: {rows} rows'
+
+    def _copy(self, sql, buffer):
+        connection = connections[self.target]
+        connection.ensure_connection()
+        with connection.connection.cursor() as cursor:
+            if hasattr(cursor, 'copy_expert'):  # psycopg2
+                cursor.copy_expert(sql, buffer)
+            else:  # psycopg 3
+                with cursor.copy(sql) as copy:
+                    copy.write(buffer.getvalue())
+
+    def _verify_in_thread(self, model):
+        try:
+            return self._verify(model)
+        finally:
+            connections.close_all()
+
+    def _checksum(self, model, alias):
+        # Order-independent, so differences in collation between backends do not matter
+        fields = [f.attname for f in model._meta.concrete_fields]
+        total, count = 0, 0
+        for row in model._base_manager.using(alias).values_list(*fields).iterator(chunk_size=self.chunk_size):
+            digest = hashlib.blake2b(repr([_copy_value(value) for value in row]).encode(), digest_size=8)
+            total = (total + int.from_bytes(digest.digest(), 'big')) % (1 << 64)
+            count += 1
+        return count, total
+
+    def _verify(self, model):
+        source = self._checksum(model, self.source)
+        target = self._checksum(model, self.target)
+        if source != target:
+            return (f'{model._meta.db_table}: {source[0]} rows / checksum {source[1]:x} in {self.source}, '
+                    f'{target[0]} rows / checksum {target[1]:x} in {self.target}')
+        return None
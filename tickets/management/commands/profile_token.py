@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from eventbooking import profiling
+
+
+class Command(BaseCommand):
+    help = 'Print a signed token that lets a staff user profile single requests (see eventbooking.profiling).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+
+    def handle(self, *args, **options):
+        user = get_user_model().objects.filter(username=options['username']).first()
+        if user is None or not user.is_staff or not user.is_active:
+            raise CommandError(f'{options["username"]} is not an active staff user.')
+        token = profiling.make_token(user)
+        minutes = getattr(settings, 'PROFILE_TOKEN_MAX_AGE', 3600) // 60
+        self.stdout.write(token)
+        self.stderr.write(
+            f'Valid for {minutes} minutes. Add ?{profiling.TOKEN_PARAM}=<token> to a URL or send it as '
+            f'X-Profile-Token; results go to {settings.PROFILE_OUTPUT_DIR}.'
+        )
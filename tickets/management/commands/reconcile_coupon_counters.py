@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from tickets.models import Coupon, CouponCounter, CouponRedemption
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute Coupon.times_redeemed from the redemption log and report coupons whose '
+        'striped counters have drifted from it (e.g. after a crash mid-checkout). Meant to '
+        'run periodically from cron.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repair', action='store_true',
+            help='Reset drifted counters to the logged redemptions. Run while the coupon is quiet, '
+                 'as uses claimed by in-flight checkouts are dropped.',
+        )
+
+    def handle(self, *args, **options):
+        redeemed = (CouponRedemption.objects.filter(coupon=OuterRef('pk'))
+                    .values('coupon').annotate(n=Count('pk')).values('n'))
+        updated = Coupon.objects.update(times_redeemed=Coalesce(Subquery(redeemed), 0))
+        self.stdout.write(f'Reconciled {updated} coupons.')
+
+        drifted = (Coupon.objects.annotate(counted=Coalesce(Sum('counters__count'), 0))
+                   .exclude(counted=F('times_redeemed')))
+        for coupon in drifted.iterator():
+            self.stdout.write(self.style.WARNING(
+                f'{coupon.code}: counters say {coupon.counted}, {coupon.times_redeemed} redeemed'
+            ))
+            if options['repair']:
+                self._repair(coupon)
+
+    def _repair(self, coupon):
+        per_shard = dict(CouponRedemption.objects.filter(coupon=coupon)
+                         .values_list('shard').annotate(n=Count('pk')))
+        with transaction.atomic():
+            for counter in CouponCounter.objects.select_for_update().filter(coupon=coupon):
+                count = per_shard.get(counter.shard, 0)
+                if counter.count != count:
+                    counter.count = count
+                    counter.save(update_fields=['count'])
@@ -0,0 +1,51 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Sum
+from django.utils import timezone
+
+from tickets import seatmap, sharding
+from tickets.models import Event
+
+
+class Command(BaseCommand):
+    help = 'Render the seat map tiles of large upcoming events into the cache ahead of their on-sale.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--event', type=int, action='append', dest='events',
+                            help='Event id to render (repeatable) instead of all large upcoming events')
+        parser.add_argument('--max-zoom', type=int,
+                            help='Deepest zoom level to render (defaults to every level)')
+
+    def handle(self, *args, **options):
+        if options['events']:
+            event_ids = options['events']
+        else:
+            events = (
+                Event.objects.filter(date__gte=timezone.now()).annotate(seat_count=Sum('rows__capacity'))
+                .filter(seat_count__gt=settings.SEATMAP_TILED_SEATS)
+            )
+            event_ids = sharding.collect(events.values_list('id', flat=True))
+
+        started = time.perf_counter()
+        rendered = 0
+        for event_id in event_ids:
+            index = seatmap.get_index(event_id)
+            if index is None:
+                self.stderr.write(f'Event {event_id} has no seats, skipped.')
+                continue
+            max_zoom = index.max_zoom if options['max_zoom'] is None else min(options['max_zoom'], index.max_zoom)
+            count = 0
+            for zoom in range(max_zoom + 1):
+                for x in range(2 ** zoom):
+                    for y in range(2 ** zoom):
+                        seatmap.get_tile(index, zoom, x, y)
+                        count += 1
+            rendered += count
+            if options['verbosity'] > 1:
+                self.stdout.write(f'Event {event_id}: {len(index.seats)} seats, {count} tiles to zoom {max_zoom}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Rendered {rendered} tiles for {len(event_ids)} events in {time.perf_counter() - started:.2f}s.'
+        ))
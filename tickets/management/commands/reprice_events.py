@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from tickets import dynamic_pricing, sharding
+from tickets.models import Event
+
+
+class Command(BaseCommand):
+    help = 'Reprice seat rows from their sell-through using a configured pricing curve.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--event', type=int, action='append', dest='events',
+                            help='Event id to reprice (repeatable). Defaults to all upcoming events.')
+        parser.add_argument('--curve', default='default', help='Name in settings.DYNAMIC_PRICING_CURVES')
+        parser.add_argument('--chunk-size', type=int, default=500)
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        try:
+            curve = dynamic_pricing.get_curve(options['curve'])
+        except KeyError as e:
+            raise CommandError(e.args[0])
+
+        if options['events']:
+            event_ids = options['events']
+        else:
+            event_ids = sharding.collect(Event.objects.filter(date__gte=timezone.now()).values_list('id', flat=True))
+
+        started = time.perf_counter()
+        events_changed, rows_changed = dynamic_pricing.reprice_events(
+            event_ids, curve, chunk_size=options['chunk_size'], dry_run=options['dry_run']
+        )
+        elapsed = time.perf_counter() - started
+        verb = 'Would reprice' if options['dry_run'] else 'Repriced'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {rows_changed} rows across {events_changed} events in {elapsed:.2f}s.'
+        ))
@@ -7,6 +7,7 @@ from django.db import migrations, models
 def forwards_map_category(apps, schema_editor):
     Category = apps.get_model('tickets', 'Category')
     Event = apps.get_model('tickets', 'Event')
+    db_alias = schema_editor.connection.alias
 
     # Ensure categories exist matching legacy strings
     legacy = [
@@ -21,14 +22,14 @@ def forwards_map_category(apps, schema_editor):
     ]
     slug_map = {}
     for slug, name in legacy:
-        obj, _ = Category.objects.get_or_create(name=name, defaults={'slug': slug})
+        obj, _ = Category.objects.using(db_alias).get_or_create(name=name, defaults={'slug': slug})
         if not obj.slug:
             obj.slug = slug
             obj.save(update_fields=['slug'])
         slug_map[slug] = obj.id
 
     # Copy from old char field 'category' into new FK field 'category_fk'
-    for ev in Event.objects.all():
+    for ev in Event.objects.using(db_alias).all():
         val = getattr(ev, 'category', None)  # legacy char value
         cat_id = slug_map.get(val)
         if cat_id:
@@ -7,12 +7,13 @@ def forwards_copy_existing(apps, schema_editor):
     Event = apps.get_model('tickets', 'Event')
     Category = apps.get_model('tickets', 'Category')
     through_model = Event.categories.through
+    db_alias = schema_editor.connection.alias
     # Try to add existing single category into m2m if attribute present
     if hasattr(Event, 'category_id'):
-        for ev in Event.objects.all():
+        for ev in Event.objects.using(db_alias).all():
             if getattr(ev, 'category_id', None):
                 try:
-                    through_model.objects.get_or_create(event_id=ev.id, category_id=ev.category_id)
+                    through_model.objects.using(db_alias).get_or_create(event_id=ev.id, category_id=ev.category_id)
                 except Exception:
                     pass
 
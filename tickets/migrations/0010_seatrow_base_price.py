@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-19 18:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0009_coupon_redemption_limits'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='seatrow',
+            name='base_price',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=8, null=True),
+        ),
+    ]
@@ -0,0 +1,138 @@
+# Generated by Django 5.2.5 on 2026-10-19 18:56
+
+import re
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# A copy of tickets.layouts.row_sort_key, so later changes there do not
+# change what this migration computes
+ROW_LABEL = re.compile(r'([A-Za-z]*)(\d*)')
+
+
+def row_sort_key(name):
+    words = name.split()
+    match = ROW_LABEL.fullmatch(words[-1]) if words else None
+    if not match:
+        return 0
+    letters, digits = match.groups()
+    letter_value = 0
+    for letter in letters.upper():
+        letter_value = min(letter_value * 26 + ord(letter) - ord('A') + 1, 1000000)
+    if letters and digits:
+        return min(letter_value, 999) * 1000 + min(int(digits), 999)
+    return min(int(digits) if digits else letter_value, 999999)
+
+
+def fill_row_sort_keys(apps, schema_editor):
+    SeatRow = apps.get_model('tickets', 'SeatRow')
+    db_alias = schema_editor.connection.alias
+    rows = list(SeatRow.objects.using(db_alias).only('id', 'name'))
+    for row in rows:
+        row.sort_key = row_sort_key(row.name)
+    SeatRow.objects.using(db_alias).bulk_update(rows, ['sort_key'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0012_event_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Venue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200)),
+                ('location', models.CharField(max_length=255)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='VenueRow',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50)),
+                ('sort_key', models.IntegerField(default=0)),
+                ('price', models.DecimalField(decimal_places=2, max_digits=8)),
+                ('svg_id', models.CharField(blank=True, max_length=100, null=True)),
+            ],
+            options={
+                'ordering': ['sort_key', 'name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='VenueSeat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.IntegerField()),
+                ('x', models.FloatField()),
+                ('y', models.FloatField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='VenueSection',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('sort_order', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['sort_order', 'id'],
+            },
+        ),
+        migrations.AddField(
+            model_name='seat',
+            name='x',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='seat',
+            name='y',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='seatrow',
+            name='section',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='seatrow',
+            name='sort_key',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='venue',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='events', to='tickets.venue'),
+        ),
+        migrations.AddField(
+            model_name='seatrow',
+            name='venue_row',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='tickets.venuerow'),
+        ),
+        migrations.AddIndex(
+            model_name='seatrow',
+            index=models.Index(fields=['event', 'sort_key'], name='tickets_sea_event_i_1aeed2_idx'),
+        ),
+        migrations.AddField(
+            model_name='venueseat',
+            name='row',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='seats', to='tickets.venuerow'),
+        ),
+        migrations.AddField(
+            model_name='venuesection',
+            name='venue',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sections', to='tickets.venue'),
+        ),
+        migrations.AddField(
+            model_name='venuerow',
+            name='section',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rows', to='tickets.venuesection'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='venueseat',
+            unique_together={('row', 'number')},
+        ),
+        migrations.RunPython(fill_row_sort_keys, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,86 @@
+# Generated by Django 5.2.5 on 2026-10-19 19:35
+
+import re
+
+from django.db import migrations, models
+
+# Copies of tickets.layouts as of this migration, so later changes there do
+# not change what it computes
+ROW_LABEL = re.compile(r'([A-Za-z]*)(\d*)')
+SECTION_STRIDE = 1000000
+LABEL_PART_LIMIT = 999
+
+
+def _label(name):
+    words = name.split()
+    match = ROW_LABEL.fullmatch(words[-1]) if words else None
+    return match.groups() if match else None
+
+
+def unbounded_row_sort_key(name):
+    """The key of earlier versions, which could run past the section stride."""
+    label = _label(name)
+    if label is None:
+        return 0
+    letters, digits = label
+    letter_value = 0
+    for letter in letters.upper():
+        letter_value = letter_value * 26 + ord(letter) - ord('A') + 1
+    if letters and digits:
+        return letter_value * 1000 + int(digits)
+    return int(digits) if digits else letter_value
+
+
+def row_sort_key(name):
+    label = _label(name)
+    if label is None:
+        return 0
+    letters, digits = label
+    letter_value = 0
+    for letter in letters.upper():
+        letter_value = min(letter_value * 26 + ord(letter) - ord('A') + 1, SECTION_STRIDE)
+    if letters and digits:
+        return min(letter_value, LABEL_PART_LIMIT) * (LABEL_PART_LIMIT + 1) + min(int(digits), LABEL_PART_LIMIT)
+    return min(int(digits) if digits else letter_value, SECTION_STRIDE - 1)
+
+
+def recompute_row_sort_keys(apps, schema_editor):
+    db_alias = schema_editor.connection.alias
+    VenueRow = apps.get_model('tickets', 'VenueRow')
+    venue_rows = list(VenueRow.objects.using(db_alias).only('id', 'name'))
+    for row in venue_rows:
+        row.sort_key = row_sort_key(row.name)
+    VenueRow.objects.using(db_alias).bulk_update(venue_rows, ['sort_key'], batch_size=1000)
+
+    SeatRow = apps.get_model('tickets', 'SeatRow')
+    rows = list(SeatRow.objects.using(db_alias).only('id', 'name', 'sort_key'))
+    for row in rows:
+        # Cloned rows start with their section's order times the stride
+        old_key = unbounded_row_sort_key(row.name)
+        if old_key >= SECTION_STRIDE and row.sort_key >= old_key and (row.sort_key - old_key) % SECTION_STRIDE == 0:
+            section_order = (row.sort_key - old_key) // SECTION_STRIDE
+        else:
+            section_order = row.sort_key // SECTION_STRIDE
+        row.sort_key = section_order * SECTION_STRIDE + row_sort_key(row.name)
+    SeatRow.objects.using(db_alias).bulk_update(rows, ['sort_key'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0013_venue_layouts'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='seatrow',
+            name='sort_key',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='venuerow',
+            name='sort_key',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(recompute_row_sort_keys, migrations.RunPython.noop),
+    ]
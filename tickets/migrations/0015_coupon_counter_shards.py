@@ -0,0 +1,30 @@
+# Generated by Django 5.2.5 on 2026-10-19 20:10
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def set_counter_shards(apps, schema_editor):
+    # Existing coupons keep every stripe they have counter rows for
+    Coupon = apps.get_model('tickets', 'Coupon')
+    CouponCounter = apps.get_model('tickets', 'CouponCounter')
+    stripes = (CouponCounter.objects.using(schema_editor.connection.alias)
+               .values('coupon').annotate(last=Max('shard')).values_list('coupon', 'last'))
+    for coupon_id, last in stripes.iterator():
+        Coupon.objects.using(schema_editor.connection.alias).filter(pk=coupon_id).update(counter_shards=last + 1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0014_row_sort_key_bounds'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='coupon',
+            name='counter_shards',
+            field=models.PositiveSmallIntegerField(editable=False, null=True),
+        ),
+        migrations.RunPython(set_counter_shards, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,18 @@
 from django.db import models
 from django.contrib.auth.models import User
 
+
+class ShardedQuerySet(models.QuerySet):
+    def create(self, **kwargs):
+        # Without an explicit using(), let the router place the new row from
+        # its own fields, e.g. a seat on its row's shard (see tickets.sharding)
+        if self._db is None:
+            obj = self.model(**kwargs)
+            obj.save(force_insert=True)
+            return obj
+        return super().create(**kwargs)
+
+
 class Category(models.Model):
     name = models.CharField(max_length=100, unique=True)
     slug = models.SlugField(max_length=120, unique=True, blank=True, null=True)
@@ -8,6 +20,64 @@ class Category(models.Model):
     def __str__(self):
         return self.name
 
+
+class Venue(models.Model):
+    """A seating layout stored once and cloned into every event held there (see tickets.layouts)."""
+    name = models.CharField(max_length=200)
+    location = models.CharField(max_length=255)
+
+    def __str__(self):
+        return self.name
+
+
+class VenueSection(models.Model):
+    venue = models.ForeignKey(Venue, on_delete=models.CASCADE, related_name='sections')
+    name = models.CharField(max_length=100)  # e.g. "Balcony"
+    sort_order = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['sort_order', 'id']
+
+    def __str__(self):
+        return f"{self.name} ({self.venue.name})"
+
+
+class VenueRow(models.Model):
+    section = models.ForeignKey(VenueSection, on_delete=models.CASCADE, related_name='rows')
+    name = models.CharField(max_length=50)
+    # Filled from the name on save, so "Row 10" sorts after "Row 2"
+    sort_key = models.IntegerField(default=0, editable=False)
+    price = models.DecimalField(max_digits=8, decimal_places=2)  # Default price for events
+    svg_id = models.CharField(max_length=100, blank=True, null=True)
+
+    class Meta:
+        ordering = ['sort_key', 'name']
+
+    def __str__(self):
+        return f"{self.name} ({self.section.name})"
+
+    def save(self, *args, **kwargs):
+        from .layouts import row_sort_key
+        self.sort_key = row_sort_key(self.name)
+        if kwargs.get('update_fields') is not None and 'name' in kwargs['update_fields']:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'sort_key'}
+        super().save(*args, **kwargs)
+
+
+class VenueSeat(models.Model):
+    row = models.ForeignKey(VenueRow, on_delete=models.CASCADE, related_name='seats')
+    number = models.IntegerField()
+    # Position on the seat map
+    x = models.FloatField()
+    y = models.FloatField()
+
+    class Meta:
+        unique_together = ('row', 'number')
+
+    def __str__(self):
+        return f"{self.row.name} - Seat {self.number}"
+
+
 class Event(models.Model):
     name = models.CharField(max_length=200)
     date = models.DateTimeField()
@@ -17,34 +87,73 @@ class Event(models.Model):
     image = models.ImageField(upload_to='events/', blank=True, null=True)
     image_url = models.URLField(blank=True, null=True)
     categories = models.ManyToManyField('Category', blank=True, related_name='events')
+    # Set by the archive_events command once the seat inventory has been archived
+    archived_at = models.DateTimeField(blank=True, null=True)
+    # Venues are global, events may be on another shard (see tickets.sharding)
+    venue = models.ForeignKey(Venue, on_delete=models.SET_NULL, blank=True, null=True,
+                              related_name='events', db_constraint=False)
+
+    objects = ShardedQuerySet.as_manager()
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        super().save(*args, **kwargs)
+        # A new event on a venue gets a copy of the venue's rows and seats
+        if adding and self.venue_id:
+            from .layouts import clone_venue_layout
+            clone_venue_layout(self)
+
 
 class SeatRow(models.Model):
     event = models.ForeignKey('Event', on_delete=models.CASCADE, related_name="rows")
     name = models.CharField(max_length=50)  # e.g. "Row A"
     capacity = models.IntegerField()
     price = models.DecimalField(max_digits=8, decimal_places=2)  # Base price per seat
+    # Reference price for dynamic pricing; set from price the first time the row is repriced
+    base_price = models.DecimalField(max_digits=8, decimal_places=2, blank=True, null=True)
     svg_id = models.CharField(max_length=100, blank=True, null=True)  # For SVG mapping later
+    section = models.CharField(max_length=100, blank=True, default='')
+    # Section order * layouts.SECTION_STRIDE + the key of the name, so "Row 10"
+    # sorts after "Row 2"; the name part is refreshed on save
+    sort_key = models.BigIntegerField(default=0, editable=False)
+    # The venue row this row was cloned from
+    venue_row = models.ForeignKey(VenueRow, on_delete=models.SET_NULL, blank=True, null=True,
+                                  related_name='+', db_constraint=False)
+
+    objects = ShardedQuerySet.as_manager()
+
+    class Meta:
+        indexes = [models.Index(fields=['event', 'sort_key'])]
 
     def __str__(self):
         return f"{self.name} ({self.event.name})"
 
     def save(self, *args, **kwargs):
+        from .layouts import SECTION_STRIDE, row_sort_key
+        # Keep the section order of a cloned row and follow renames
+        self.sort_key = self.sort_key // SECTION_STRIDE * SECTION_STRIDE + row_sort_key(self.name)
+        if kwargs.get('update_fields') is not None and 'name' in kwargs['update_fields']:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'sort_key'}
         super().save(*args, **kwargs)
         # Auto-generate seats if not already created
-        if not self.seats.exists():  
-            for num in range(1, self.capacity + 1):
-                Seat.objects.create(row=self, number=num)
-
+        if not self.seats.exists():
+            Seat.objects.using(self._state.db).bulk_create(
+                (Seat(row=self, number=num) for num in range(1, self.capacity + 1)), batch_size=1000
+            )
 
 
 class Seat(models.Model):
     row = models.ForeignKey(SeatRow, on_delete=models.CASCADE, related_name="seats")
     number = models.IntegerField()
     is_booked = models.BooleanField(default=False)
+    # Position on the seat map, copied from the venue layout
+    x = models.FloatField(blank=True, null=True)
+    y = models.FloatField(blank=True, null=True)
+
+    objects = ShardedQuerySet.as_manager()
 
     def __str__(self):
         return f"{self.row.name} - Seat {self.number}"
@@ -52,10 +161,13 @@ class Seat(models.Model):
 
 class Ticket(models.Model):
     seat = models.OneToOneField(Seat, on_delete=models.CASCADE)
-    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    # No database constraint: tickets can live on another shard than users (see tickets.sharding)
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, db_constraint=False)
     price = models.DecimalField(max_digits=8, decimal_places=2)
     booked_at = models.DateTimeField(auto_now_add=True, null=True, blank=True)
 
+    objects = ShardedQuerySet.as_manager()
+
     def __str__(self):
         return f"Ticket {self.id} - {self.seat}"
 
@@ -64,18 +176,89 @@ class Coupon(models.Model):
     code = models.CharField(max_length=20, unique=True)
     discount_percent = models.IntegerField()  # e.g. 10 for 10% off
     valid_until = models.DateTimeField()
+    max_redemptions = models.PositiveIntegerField(blank=True, null=True)  # Empty for unlimited
+    max_per_user = models.PositiveIntegerField(blank=True, null=True)  # Empty for unlimited
+    # Reconciled in the background by the reconcile_coupon_counters command
+    times_redeemed = models.PositiveIntegerField(default=0)
+    # Number of CouponCounter stripes, fixed when they are created so changing
+    # max_redemptions later does not strand uses counted on other stripes
+    counter_shards = models.PositiveSmallIntegerField(null=True, editable=False)
 
     def __str__(self):
         return self.code
 
 
+class CouponCounter(models.Model):
+    # Redemptions are counted on several striped rows per coupon so a popular
+    # code does not serialize every checkout on a single row
+    coupon = models.ForeignKey(Coupon, on_delete=models.CASCADE, related_name='counters')
+    shard = models.PositiveSmallIntegerField()
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('coupon', 'shard')
+
+    def __str__(self):
+        return f"{self.coupon.code} #{self.shard}: {self.count}"
+
+
+class CouponRedemption(models.Model):
+    coupon = models.ForeignKey(Coupon, on_delete=models.CASCADE, related_name='redemptions')
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    # Payments live on their event's shard (see tickets.sharding)
+    payment = models.ForeignKey('Payment', on_delete=models.SET_NULL, null=True, blank=True, db_constraint=False)
+    shard = models.PositiveSmallIntegerField()
+    redeemed_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['coupon', 'user'])]
+
+    def __str__(self):
+        return f"{self.coupon.code} - Payment {self.payment_id}"
+
+
 class Payment(models.Model):
-    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, db_constraint=False)  # May be on another shard
     tickets = models.ManyToManyField(Ticket)
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     payment_date = models.DateTimeField(auto_now_add=True)
     status = models.CharField(max_length=20, choices=[("pending", "Pending"), ("completed", "Completed")])
     stripe_payment_id = models.CharField(max_length=100, blank=True, null=True)
 
+    objects = ShardedQuerySet.as_manager()
+
     def __str__(self):
         return f"Payment {self.id} - {self.user.username}"
+
+
+class ArchivedSeatRow(models.Model):
+    """Summary of a past event's seat row, kept instead of its seats."""
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='archived_rows')
+    name = models.CharField(max_length=50)
+    capacity = models.IntegerField()
+    price = models.DecimalField(max_digits=8, decimal_places=2)
+    seats_sold = models.IntegerField()
+    revenue = models.DecimalField(max_digits=12, decimal_places=2)
+
+    objects = ShardedQuerySet.as_manager()
+
+    def __str__(self):
+        return f"{self.name} ({self.event.name})"
+
+
+class ArchivedTicket(models.Model):
+    """A sold ticket of a past event, kept after its seat has been archived."""
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='archived_tickets')
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, db_constraint=False)
+    payment = models.ForeignKey(Payment, on_delete=models.SET_NULL, null=True, blank=True,
+                                related_name='archived_tickets')
+    ticket_id = models.BigIntegerField()  # Id of the original Ticket
+    row_name = models.CharField(max_length=50)
+    seat_number = models.IntegerField()
+    price = models.DecimalField(max_digits=8, decimal_places=2)
+    booked_at = models.DateTimeField(null=True, blank=True)
+
+    objects = ShardedQuerySet.as_manager()
+
+    def __str__(self):
+        return f"Ticket {self.ticket_id} - {self.row_name} - Seat {self.seat_number}"
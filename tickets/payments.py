@@ -0,0 +1,51 @@
+"""
+Calls to the payment gateway.
+
+Checkout charges and refunds through these functions. ``STRIPE_STUB``
+replaces Stripe with a stub for load tests (see the ``load_test`` command).
+The stub waits ``STRIPE_STUB_LATENCY`` seconds, as a real call would, and
+then approves the payment. The test card ``pm_card_chargeDeclined`` is
+declined, as it is in Stripe's test mode. The stub refuses to run with a
+live secret key.
+"""
+import time
+from types import SimpleNamespace
+
+import stripe
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.crypto import get_random_string
+
+from eventbooking.timing import timed
+
+DECLINED_TEST_CARD = 'pm_card_chargeDeclined'
+
+
+def _stubbed():
+    if not getattr(settings, 'STRIPE_STUB', False):
+        return False
+    # Secret (sk_live_) and restricted (rk_live_) live keys alike
+    if '_live_' in (settings.STRIPE_SECRET_KEY or ''):
+        raise ImproperlyConfigured('STRIPE_STUB cannot be used with a live Stripe key.')
+    return True
+
+
+def create_payment_intent(**params):
+    """Create and confirm a Stripe PaymentIntent with ``params``."""
+    with timed('stripe'):
+        if _stubbed():
+            time.sleep(settings.STRIPE_STUB_LATENCY)
+            if params.get('payment_method') == DECLINED_TEST_CARD:
+                raise stripe.CardError('Your card was declined.', None, 'card_declined')
+            return SimpleNamespace(id=f'pi_stub_{get_random_string(24)}', status='succeeded')
+        stripe.api_key = settings.STRIPE_SECRET_KEY
+        return stripe.PaymentIntent.create(**params)
+
+
+def refund(payment_intent_id):
+    with timed('stripe'):
+        if _stubbed():
+            time.sleep(settings.STRIPE_STUB_LATENCY)
+            return None
+        stripe.api_key = settings.STRIPE_SECRET_KEY
+        return stripe.Refund.create(payment_intent=payment_intent_id)
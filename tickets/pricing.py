@@ -0,0 +1,76 @@
+"""
+Ticket pricing.
+
+All amounts are exact ``Decimal`` values rounded to cents (half up). The tax
+rate comes from ``settings.TAX_RATE``, and tax is charged on the subtotal
+before any coupon discount.
+"""
+from dataclasses import dataclass
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+
+from . import sharding
+from .caching import event_cache_key
+from .models import Seat, SeatRow
+
+CENT = Decimal('0.01')
+ZERO = Decimal('0.00')
+
+
+def to_cents(amount):
+    return Decimal(amount).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def get_tax_rate():
+    return Decimal(str(settings.TAX_RATE))
+
+
+@dataclass(frozen=True)
+class Quote:
+    subtotal: Decimal
+    discount_amount: Decimal
+    tax_amount: Decimal
+    total_amount: Decimal
+    seat_count: int
+
+
+def quote(prices, discount_percent=0):
+    """Price a batch of seat prices, applying a percentage discount."""
+    subtotal = ZERO
+    seat_count = 0
+    for price in prices:
+        subtotal += price
+        seat_count += 1
+    subtotal = to_cents(subtotal)
+    discount_amount = to_cents(subtotal * Decimal(discount_percent) / 100)
+    tax_amount = to_cents(subtotal * get_tax_rate())
+    return Quote(
+        subtotal=subtotal,
+        discount_amount=discount_amount,
+        tax_amount=tax_amount,
+        total_amount=subtotal + tax_amount - discount_amount,
+        seat_count=seat_count,
+    )
+
+
+def get_price_table(event_id):
+    """Return ``{row_id: price}`` for an event, cached until its rows change."""
+    key = event_cache_key(event_id, 'prices')
+    table = cache.get(key)
+    if table is None:
+        table = dict(sharding.for_pk(SeatRow.objects.filter(event_id=event_id), event_id).values_list('id', 'price'))
+        cache.set(key, table)
+    return table
+
+
+def quote_seats(event_id, seat_ids, discount_percent=0):
+    """
+    Price seats of one event with a single query for their rows; unknown
+    seats or seats of other events are ignored.
+    """
+    table = get_price_table(event_id)
+    seats = sharding.for_pk(Seat.objects.filter(id__in=seat_ids, row_id__in=list(table)), event_id)
+    row_ids = seats.values_list('row_id', flat=True)
+    return quote((table[row_id] for row_id in row_ids), discount_percent)
@@ -0,0 +1,183 @@
+"""
+Tiled seat maps.
+
+Large venues are drawn like a web map: 256px SVG tiles at several zoom
+levels instead of one element per seat. Tiles only show the layout, so they
+are cached under the event's version (see ``tickets.caching``) and stay
+valid while seats sell. Availability is fetched for the seats in view with
+``seats_in``, and clicks are resolved with ``hit``.
+
+Both are answered by ``SeatIndex``, a grid over the seat positions that is
+built once per process and event version, so panning around a 60,000 seat
+stadium does not scan its seats.
+"""
+import math
+import threading
+from collections import OrderedDict, defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+
+from . import sharding
+from .caching import event_cache_key, get_event_version
+from .layouts import ROW_SPACING, SEAT_SPACING
+from .models import Seat, SeatRow, Ticket
+
+TILE_SIZE = 256  # pixels
+SEAT_RADIUS = 10  # map units
+CELL_SIZE = 4 * SEAT_SPACING  # map units per index cell
+MARGIN = 2 * SEAT_SPACING
+BLOCK_PIXELS = 4  # seats drawn smaller than this are merged into blocks
+MAX_INDEXES = 32  # events whose index each process keeps
+
+_indexes = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+class SeatIndex:
+    """Seat positions of one event in a uniform grid."""
+
+    def __init__(self, event_id, version, seats):
+        self.event_id = event_id
+        self.version = version
+        self.seats = seats  # (seat_id, row_id, x, y)
+        self.cells = defaultdict(list)
+        for position, (_, _, x, y) in enumerate(seats):
+            self.cells[int(x // CELL_SIZE), int(y // CELL_SIZE)].append(position)
+
+        xs = [seat[2] for seat in seats] or [0]
+        ys = [seat[3] for seat in seats] or [0]
+        self.x0 = min(xs) - MARGIN
+        self.y0 = min(ys) - MARGIN
+        # The map is square, so every zoom level is a 2**zoom by 2**zoom grid of tiles
+        self.span = max(max(xs) - min(xs), max(ys) - min(ys)) + 2 * MARGIN
+        # The deepest zoom level draws at least one pixel per map unit
+        self.max_zoom = max(0, math.ceil(math.log2(self.span / TILE_SIZE)))
+
+    def query(self, x0, y0, x1, y1):
+        """Positions in ``self.seats`` of the seats inside the box."""
+        found = []
+        for cx in range(int(x0 // CELL_SIZE), int(x1 // CELL_SIZE) + 1):
+            for cy in range(int(y0 // CELL_SIZE), int(y1 // CELL_SIZE) + 1):
+                for position in self.cells.get((cx, cy), ()):
+                    _, _, x, y = self.seats[position]
+                    if x0 <= x <= x1 and y0 <= y <= y1:
+                        found.append(position)
+        return found
+
+    def hit(self, x, y, radius=SEAT_RADIUS):
+        """The seat drawn at ``(x, y)``, or ``None``."""
+        best, best_distance = None, radius * radius
+        for position in self.query(x - radius, y - radius, x + radius, y + radius):
+            _, _, seat_x, seat_y = self.seats[position]
+            distance = (seat_x - x) ** 2 + (seat_y - y) ** 2
+            if distance <= best_distance:
+                best, best_distance = self.seats[position], distance
+        return best
+
+    def tile_bounds(self, zoom, tile_x, tile_y):
+        size = self.span / 2 ** zoom
+        return self.x0 + tile_x * size, self.y0 + tile_y * size, size
+
+    def has_tile(self, zoom, tile_x, tile_y):
+        tiles = 2 ** zoom
+        return 0 <= zoom <= self.max_zoom and 0 <= tile_x < tiles and 0 <= tile_y < tiles
+
+
+def _load_seats(event_id):
+    db_rows = sharding.for_pk(SeatRow.objects.filter(event_id=event_id), event_id)
+    # Seats of events created before venue layouts have no position; lay
+    # them out in rows the way the venue layouts do
+    row_positions = {
+        row_id: index * ROW_SPACING
+        for index, row_id in enumerate(db_rows.order_by('sort_key', 'name').values_list('id', flat=True))
+    }
+    seats = sharding.for_pk(Seat.objects.filter(row_id__in=list(row_positions)), event_id)
+    return [
+        (seat_id, row_id,
+         x if x is not None else number * SEAT_SPACING,
+         y if y is not None else row_positions[row_id])
+        for seat_id, row_id, number, x, y in seats.values_list('id', 'row_id', 'number', 'x', 'y').iterator()
+    ]
+
+
+def get_index(event_id):
+    """The ``SeatIndex`` of an event, or ``None`` if it has no seats."""
+    version = get_event_version(event_id)
+    with _indexes_lock:
+        index = _indexes.get(event_id)
+        if index is not None and index.version == version:
+            _indexes.move_to_end(event_id)
+            return index
+
+    seats = _load_seats(event_id)
+    if not seats:
+        return None
+    index = SeatIndex(event_id, version, seats)
+    with _indexes_lock:
+        _indexes[event_id] = index
+        _indexes.move_to_end(event_id)
+        while len(_indexes) > MAX_INDEXES:
+            _indexes.popitem(last=False)
+    return index
+
+
+def render_tile(index, zoom, tile_x, tile_y):
+    """Draw one tile as SVG in map units."""
+    x0, y0, size = index.tile_bounds(zoom, tile_x, tile_y)
+    scale = TILE_SIZE / size  # pixels per map unit
+    positions = index.query(x0 - SEAT_RADIUS, y0 - SEAT_RADIUS, x0 + size + SEAT_RADIUS, y0 + size + SEAT_RADIUS)
+
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{TILE_SIZE}" height="{TILE_SIZE}" '
+        f'viewBox="{x0:g} {y0:g} {size:g} {size:g}"><g fill="#007bff">'
+    ]
+    if 2 * SEAT_RADIUS * scale >= BLOCK_PIXELS:
+        for position in positions:
+            _, _, x, y = index.seats[position]
+            parts.append(f'<circle cx="{x:g}" cy="{y:g}" r="{SEAT_RADIUS}"/>')
+    else:
+        block = BLOCK_PIXELS / scale
+        blocks = {(int((index.seats[p][2] - x0) // block), int((index.seats[p][3] - y0) // block)) for p in positions}
+        for bx, by in sorted(blocks):
+            parts.append(f'<rect x="{x0 + bx * block:g}" y="{y0 + by * block:g}" width="{block:g}" height="{block:g}"/>')
+    parts.append('</g></svg>')
+    return ''.join(parts)
+
+
+def get_tile(index, zoom, tile_x, tile_y):
+    """A rendered tile, cached until the event's rows change."""
+    key = event_cache_key(index.event_id, f'tile:{zoom}:{tile_x}:{tile_y}')
+    tile = cache.get(key)
+    if tile is None:
+        tile = render_tile(index, zoom, tile_x, tile_y)
+        cache.set(key, tile, getattr(settings, 'SEATMAP_TILE_CACHE_SECONDS', 86400))
+    return tile
+
+
+def seats_in(index, x0, y0, x1, y1):
+    """
+    ``[seat_id, x, y, is_booked]`` for the seats in the box, or ``None`` when
+    there are more than ``SEATMAP_MAX_VIEWPORT_SEATS`` and the map should be
+    zoomed in further first.
+    """
+    seats = [index.seats[position] for position in index.query(x0, y0, x1, y1)]
+    if len(seats) > getattr(settings, 'SEATMAP_MAX_VIEWPORT_SEATS', 5000):
+        return None
+    seat_ids = [seat[0] for seat in seats]
+    booked = set(
+        sharding.for_pk(Seat.objects.filter(id__in=seat_ids, is_booked=True), index.event_id)
+        .values_list('id', flat=True)
+    ) if seat_ids else set()
+    return [[seat_id, x, y, seat_id in booked] for seat_id, _, x, y in seats]
+
+
+def hit(index, x, y):
+    """The ticket of the seat drawn at ``(x, y)``, or ``None``."""
+    seat = index.hit(x, y)
+    if seat is None:
+        return None
+    return (
+        sharding.for_pk(Ticket.objects.filter(seat_id=seat[0]), index.event_id)
+        .select_related('seat__row').first()
+    )
@@ -0,0 +1,224 @@
+"""
+Event sharding.
+
+Events and everything that hangs off them (rows, seats, tickets and the
+payments for those tickets) live on one of ``DATABASE_SHARDS``, so one big
+on-sale only loads its own database. ``default`` is always shard 0 and keeps
+the global data (users, sessions, coupons, categories). Categories are
+mirrored to every shard so events can still be filtered by them.
+
+Each shard hands out primary keys from its own range (``init_shards`` sets up
+the sequences), so the shard of any sharded row follows from its id alone:
+``shard_for_pk``. Queries that span events, such as the home page or a user's
+tickets, run on every shard concurrently and are merged with ``sharded``.
+
+Without ``DATABASE_SHARDS`` all of this is a no-op and querysets are routed
+as usual. Shards have no replicas: with both settings, sharded models are
+read from their shard and only the global models use ``DATABASE_REPLICAS``.
+"""
+import contextvars
+import heapq
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from itertools import groupby, islice
+
+from django.conf import settings
+from django.core import checks
+from django.db import DEFAULT_DB_ALIAS, close_old_connections
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Category, Event
+
+SHARD_BITS = 40  # every shard gets 2**40 ids per table
+SHARDED_MODELS = {
+    'tickets.event', 'tickets.seatrow', 'tickets.seat', 'tickets.ticket', 'tickets.payment',
+    'tickets.archivedseatrow', 'tickets.archivedticket',
+}
+MIRRORED_MODELS = {'tickets.category'}
+# The foreign key that places a new row on its parent's shard
+PARENT_FIELDS = {
+    'tickets.seatrow': 'event_id', 'tickets.seat': 'row_id', 'tickets.ticket': 'seat_id',
+    'tickets.archivedseatrow': 'event_id', 'tickets.archivedticket': 'event_id',
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_shards():
+    return getattr(settings, 'DATABASE_SHARDS', [])
+
+
+def is_sharded(model):
+    # Many-to-many tables live with the model that declares them
+    owner = model._meta.auto_created or model
+    return owner._meta.label_lower in SHARDED_MODELS
+
+
+def is_mirrored(model):
+    return model._meta.label_lower in MIRRORED_MODELS
+
+
+def shard_for_pk(pk):
+    """Return the shard holding the sharded row with id ``pk``, or ``None``."""
+    shards = get_shards()
+    index = int(pk) >> SHARD_BITS
+    return shards[index] if 0 <= index < len(shards) else None
+
+
+def shard_of(instance):
+    """The shard an existing sharded row lives on, or ``None`` when unsharded."""
+    if not get_shards():
+        return None
+    return shard_for_pk(instance.pk)
+
+
+def shard_for_new_event():
+    """Place new events on the shard with the fewest upcoming events."""
+    upcoming = Event.objects.filter(date__gte=timezone.now())
+    counts = fan_out(lambda alias: upcoming.using(alias).count())
+    return get_shards()[counts.index(min(counts))]
+
+
+def for_pk(queryset, pk):
+    """Point ``queryset`` at the shard that holds ``pk``."""
+    if not get_shards():
+        return queryset
+    alias = shard_for_pk(pk)
+    return queryset.using(alias) if alias else queryset.none()
+
+
+def group_by_shard(pks):
+    """Yield ``(alias, pks)`` per shard; the alias is ``None`` when unsharded."""
+    pks = list(pks)
+    if not get_shards():
+        yield None, pks
+        return
+    for alias, group in groupby(sorted(pks), key=shard_for_pk):
+        if alias:
+            yield alias, list(group)
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=4 * len(get_shards()), thread_name_prefix='shard')
+    return _executor
+
+
+def _run(context, func, alias):
+    # Worker threads keep their connections between calls like request
+    # threads do, so honour CONN_MAX_AGE and health checks the same way
+    close_old_connections()
+    return context.run(func, alias)
+
+
+def fan_out(func, shards=None):
+    """Call ``func(alias)`` on every shard concurrently; results come back in shard order."""
+    shards = shards or get_shards()
+    if len(shards) == 1:
+        return [func(shards[0])]
+    # Each call runs in a copy of the caller's context, so replica pinning
+    # and request timings (eventbooking.timing) carry over to the workers
+    contexts = [contextvars.copy_context() for _ in shards]
+    return list(_get_executor().map(_run, contexts, [func] * len(shards), shards))
+
+
+def collect(queryset):
+    """Evaluate ``queryset`` on every shard and concatenate the results in shard order."""
+    if not get_shards():
+        return list(queryset)
+    return [row for rows in fan_out(lambda alias: list(queryset.using(alias))) for row in rows]
+
+
+def sharded(queryset):
+    """Return ``queryset``, or a ``FanOutQuerySet`` over it when sharding is on."""
+    if not get_shards():
+        return queryset
+    return FanOutQuerySet(queryset)
+
+
+class FanOutQuerySet:
+    """
+    The part of the QuerySet API that ``Paginator`` and templates use, run on
+    every shard at once and merged by the queryset's ordering. Slicing
+    ``[a:b]`` asks each shard for its first ``b`` rows.
+    """
+    ordered = True
+
+    def __init__(self, queryset):
+        ordering = queryset.query.order_by or queryset.model._meta.ordering
+        if not ordering:
+            raise ValueError('Fan-out querysets need an ordering to merge by.')
+        descending = {field.startswith('-') for field in ordering}
+        if len(descending) > 1:
+            raise ValueError('Fan-out querysets cannot merge mixed ascending/descending orderings.')
+        self.queryset = queryset
+        self.fields = [field.lstrip('-') for field in ordering]
+        self.reverse = descending.pop()
+
+    def _key(self, obj):
+        # NULLs sort last ascending and first descending, as on PostgreSQL,
+        # instead of failing to compare with the other values
+        values = (getattr(obj, field) for field in self.fields)
+        return tuple((True, 0) if value is None else (False, value) for value in values)
+
+    def count(self):
+        return sum(fan_out(lambda alias: self.queryset.using(alias).count()))
+
+    def __iter__(self):
+        return iter(self[:])
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop = index.start or 0, index.stop
+            if index.step:
+                raise ValueError('Fan-out querysets do not support slice steps.')
+        else:
+            start, stop = index, index + 1
+        parts = fan_out(lambda alias: list(self.queryset.using(alias)[:stop]))
+        merged = heapq.merge(*parts, key=self._key, reverse=self.reverse)
+        results = list(islice(merged, start, stop))
+        if isinstance(index, slice):
+            return results
+        if not results:
+            raise IndexError('Fan-out queryset index out of range.')
+        return results[0]
+
+
+@checks.register()
+def check_replicas_with_shards(app_configs, **kwargs):
+    if get_shards() and getattr(settings, 'DATABASE_REPLICAS', []):
+        return [checks.Warning(
+            'DB_REPLICAS and DB_SHARDS are both set; events, seats, tickets and payments are always read '
+            'from their shard, not from a replica.',
+            hint='Only users, sessions, coupons and the other global models use the replicas.',
+            id='tickets.W001',
+        )]
+    return []
+
+
+@receiver(post_save, sender=Category)
+def mirror_category(sender, instance, using, raw=False, **kwargs):
+    if raw or using != DEFAULT_DB_ALIAS:
+        return
+    for alias in get_shards():
+        if alias != DEFAULT_DB_ALIAS:
+            copy = Category(**{field.attname: getattr(instance, field.attname)
+                               for field in Category._meta.concrete_fields})
+            copy.save(using=alias)
+
+
+@receiver(post_delete, sender=Category)
+def delete_mirrored_category(sender, instance, using, **kwargs):
+    if using != DEFAULT_DB_ALIAS:
+        return
+    for alias in get_shards():
+        if alias != DEFAULT_DB_ALIAS:
+            Category.objects.using(alias).filter(pk=instance.pk).delete()
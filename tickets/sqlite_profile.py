@@ -0,0 +1,40 @@
+"""
+Opt-in SQLite profile for sites that run on SQLite in production.
+
+With the default settings a second writer fails with "database is locked" as
+soon as two checkouts overlap. For every database alias listed in
+``SQLITE_PROFILE_DATABASES`` each new connection switches to WAL (readers no
+longer block the writer), waits ``busy_timeout`` for the write lock instead of
+failing, and relaxes fsyncs to ``synchronous=NORMAL``, which is safe in WAL
+mode. Settings also makes those aliases begin transactions IMMEDIATE, so a
+transaction takes the write lock up front rather than failing when it tries to
+upgrade a read lock half way through.
+"""
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'busy_timeout': 5000,  # milliseconds
+    'synchronous': 'NORMAL',
+    'mmap_size': 128 * 1024 * 1024,
+    'cache_size': -32000,  # negative means KiB, so about 32 MB
+    'temp_store': 'MEMORY',
+}
+
+
+def get_pragmas():
+    return {**DEFAULT_PRAGMAS, **getattr(settings, 'SQLITE_PRAGMAS', {})}
+
+
+def apply_pragmas(connection):
+    with connection.cursor() as cursor:
+        for name, value in get_pragmas().items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+@receiver(connection_created)
+def apply_sqlite_profile(sender, connection, **kwargs):
+    if connection.vendor == 'sqlite' and connection.alias in getattr(settings, 'SQLITE_PROFILE_DATABASES', ()):
+        apply_pragmas(connection)
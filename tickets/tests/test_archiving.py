@@ -0,0 +1,73 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.db.models import QuerySet
+from django.test import TestCase
+from django.utils import timezone
+
+from tickets import archiving
+from tickets.models import ArchivedSeatRow, ArchivedTicket, Seat, Ticket
+
+from .utils import create_event
+
+
+class ArchiveEventTests(TestCase):
+    def test_past_events_are_archived(self):
+        event = create_event(days=-3)
+        self.assertEqual(archiving.archive_event(event.pk), (2, 6, 0))
+        event.refresh_from_db()
+        self.assertIsNotNone(event.archived_at)
+        self.assertFalse(Ticket.objects.filter(seat__row__event=event).exists())
+        self.assertEqual(ArchivedSeatRow.objects.filter(event=event).count(), 2)
+
+    def test_upcoming_events_are_refused(self):
+        event = create_event(days=1)
+        with self.assertRaises(archiving.NotArchivable):
+            archiving.archive_event(event.pk)
+        with self.assertRaises(archiving.NotArchivable):
+            archiving.archive_event(event.pk, dry_run=True)
+        # Ended, but not before the cut-off
+        past = create_event(days=-1)
+        with self.assertRaises(archiving.NotArchivable):
+            archiving.archive_event(past.pk, before=timezone.now() - timedelta(days=2))
+        self.assertEqual(Ticket.objects.count(), 12)
+
+    def test_events_are_archived_once(self):
+        event = create_event(days=-3)
+        archiving.archive_event(event.pk)
+        with self.assertRaisesMessage(archiving.NotArchivable, 'already archived'):
+            archiving.archive_event(event.pk)
+        self.assertEqual(ArchivedSeatRow.objects.filter(event=event).count(), 2)
+
+    def test_command_refuses_explicit_upcoming_events(self):
+        past, upcoming = create_event(days=-3), create_event(days=1)
+        with self.assertRaisesMessage(CommandError, f'Event {upcoming.pk} takes place'):
+            call_command('archive_events', event=[past.pk, upcoming.pk], stdout=StringIO())
+        # Nothing is archived when one of the ids is refused
+        self.assertEqual(Ticket.objects.count(), 12)
+        call_command('archive_events', event=[past.pk], stdout=StringIO())
+        self.assertEqual(Ticket.objects.count(), 6)
+
+    def test_tickets_are_archived_in_batches(self):
+        event = create_event(days=-3, rows=2, seats_per_row=3)
+        user = User.objects.create_user('buyer')
+        Ticket.objects.filter(seat__row__event=event).exclude(seat__number=3).update(user=user)
+        Seat.objects.filter(row__event=event).exclude(number=3).update(is_booked=True)
+        batches = []
+        bulk_create = QuerySet.bulk_create
+
+        def record_batches(queryset, objs, *args, **kwargs):
+            objs = list(objs)
+            if queryset.model is ArchivedTicket:
+                batches.append(len(objs))
+            return bulk_create(queryset, objs, *args, **kwargs)
+
+        with mock.patch.object(QuerySet, 'bulk_create', record_batches):
+            self.assertEqual(archiving.archive_event(event.pk, batch_size=3), (2, 6, 4))
+        # Never more than one batch of tickets in memory
+        self.assertEqual(batches, [3, 1])
+        self.assertEqual(ArchivedTicket.objects.filter(event=event, user=user).count(), 4)
+
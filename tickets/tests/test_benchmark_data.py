@@ -0,0 +1,39 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db.models import F
+from django.test import TestCase
+from django.utils import timezone
+
+from tickets.models import Event, Payment, Seat, Ticket
+
+
+class GenerateBenchmarkDataTests(TestCase):
+    def generate(self, **options):
+        call_command('generate_benchmark_data', events=12, chunk_events=5, rows_per_event=3, seats_per_row=6,
+                     users=5, booked_ratio=0.5, stdout=StringIO(), **options)
+
+    def test_dataset(self):
+        self.generate()
+        self.assertEqual(Event.objects.count(), 12)
+        booked = Seat.objects.filter(is_booked=True).count()
+        self.assertEqual(Ticket.objects.exclude(user=None).count(), booked)
+        self.assertGreater(Payment.objects.count(), 0)
+
+    def test_bookings_are_in_the_past_and_before_the_event(self):
+        self.generate()
+        tickets = Ticket.objects.exclude(booked_at=None)
+        self.assertTrue(tickets.exists())
+        self.assertFalse(tickets.filter(booked_at__gt=timezone.now()).exists())
+        self.assertFalse(tickets.filter(booked_at__gt=F('seat__row__event__date')).exists())
+
+    def test_same_seed_same_data(self):
+        self.generate(seed=7)
+        first = list(Event.objects.order_by('pk').values_list('name', 'location'))
+        buyers = list(Ticket.objects.exclude(user=None).order_by('pk').values_list('user__username', flat=True))
+        Event.objects.all().delete()
+        self.generate(seed=7)
+        self.assertEqual(list(Event.objects.order_by('pk').values_list('name', 'location')), first)
+        self.assertEqual(
+            list(Ticket.objects.exclude(user=None).order_by('pk').values_list('user__username', flat=True)), buyers
+        )
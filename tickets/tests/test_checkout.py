@@ -0,0 +1,69 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db.models import Sum
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from tickets import payments, pricing
+from tickets.models import Coupon, CouponCounter, CouponRedemption, Payment, Ticket
+
+from .utils import create_event
+
+
+@override_settings(STRIPE_STUB=True, STRIPE_STUB_LATENCY=0, STRIPE_SECRET_KEY='sk_test_stub')
+class CheckoutPaymentTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.ticket = Ticket.objects.filter(seat__row__event=create_event()).first()
+        cls.coupon = Coupon.objects.create(code='SAVE10', discount_percent=10,
+                                           valid_until=timezone.now() + timedelta(days=1), max_redemptions=5)
+        cls.user = User.objects.create_user('buyer')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def pay(self):
+        token = self.client.get(f'/checkout/{self.ticket.pk}/').context['checkout_token']
+        token = self.client.post('/events-list/apply-coupon/', {'coupon_code': 'SAVE10', 'checkout_token': token},
+                                 HTTP_X_REQUESTED_WITH='XMLHttpRequest').json()['checkout_token']
+        return self.client.post(f'/checkout/{self.ticket.pk}/', {
+            'checkout_token': token, 'payment_method_id': 'pm_card_visa',
+            'full_name': 'Test Buyer', 'email': 'buyer@example.com', 'phone': '+441234567890',
+        })
+
+    def coupon_uses(self):
+        return CouponCounter.objects.filter(coupon=self.coupon).aggregate(Sum('count'))['count__sum']
+
+    def test_paid_checkout_books_the_seat(self):
+        response = self.pay()
+        payment = Payment.objects.get()
+        self.assertRedirects(response, f'/events-list/booking-confirmation/{payment.pk}/', fetch_redirect_response=False)
+        self.assertEqual(payment.amount, pricing.quote([self.ticket.price], 10).total_amount)
+        self.ticket.seat.refresh_from_db()
+        self.assertTrue(self.ticket.seat.is_booked)
+        self.assertEqual(self.coupon_uses(), 1)
+        self.assertEqual(CouponRedemption.objects.get().payment_id, payment.pk)
+
+    def test_failed_booking_after_the_charge_is_refunded(self):
+        with mock.patch('tickets.coupons.record_redemption', side_effect=RuntimeError('database went away')), \
+                mock.patch('tickets.payments.refund') as refund:
+            response = self.pay()
+        self.assertRedirects(response, f'/events-list/{self.ticket.seat.row.event_id}/', fetch_redirect_response=False)
+        refund.assert_called_once()
+        self.assertTrue(refund.call_args.args[0].startswith('pi_stub_'))
+        self.ticket.seat.refresh_from_db()
+        self.assertFalse(self.ticket.seat.is_booked)
+        self.assertFalse(Payment.objects.exists())
+        self.assertEqual(self.coupon_uses(), 0)
+
+    def test_declined_card_is_not_refunded(self):
+        token = self.client.get(f'/checkout/{self.ticket.pk}/').context['checkout_token']
+        with mock.patch('tickets.payments.refund') as refund:
+            self.client.post(f'/checkout/{self.ticket.pk}/', {
+                'checkout_token': token, 'payment_method_id': payments.DECLINED_TEST_CARD,
+                'full_name': 'Test Buyer', 'email': 'buyer@example.com', 'phone': '+441234567890',
+            })
+        refund.assert_not_called()
+        self.assertFalse(Payment.objects.exists())
@@ -0,0 +1,61 @@
+import time
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.conf import settings
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from tickets import checkout_state
+from tickets.models import Coupon, Ticket
+
+from .utils import create_event
+
+
+class CheckoutStateTests(TestCase):
+    def test_round_trip(self):
+        token = checkout_state.dump_state(7, Decimal('100.00'), Decimal('5.00'), Decimal('10.00'), 'SAVE10', 'abc')
+        self.assertEqual(checkout_state.load_state(token, 7), {
+            'ticket_id': 7,
+            'subtotal': Decimal('100.00'),
+            'tax_amount': Decimal('5.00'),
+            'discount_amount': Decimal('10.00'),
+            'total_amount': Decimal('95.00'),
+            'coupon_code': 'SAVE10',
+            'checkout_id': 'abc',
+        })
+
+    def test_bad_tokens_are_rejected(self):
+        token = checkout_state.dump_state(7, Decimal('100.00'), Decimal('5.00'))
+        self.assertIsNone(checkout_state.load_state(token, 8))
+        self.assertIsNone(checkout_state.load_state(token[:-1] + ('A' if token[-1] != 'A' else 'B'), 7))
+        self.assertIsNone(checkout_state.load_state('', 7))
+
+    @override_settings(CHECKOUT_STATE_MAX_AGE=60)
+    def test_expired_tokens_are_rejected(self):
+        token = checkout_state.dump_state(7, Decimal('100.00'), Decimal('5.00'))
+        with mock.patch('django.core.signing.time.time', return_value=time.time() + 61):
+            self.assertIsNone(checkout_state.load_state(token, 7))
+
+    def test_coupon_travels_from_the_checkout_page_to_the_payment(self):
+        ticket = Ticket.objects.filter(seat__row__event=create_event()).first()
+        Coupon.objects.create(code='SAVE10', discount_percent=10, valid_until=timezone.now() + timedelta(days=1))
+        response = self.client.get(f'/checkout/{ticket.pk}/')
+        self.assertEqual(checkout_state.load_state(response.context['checkout_token'], ticket.pk)['coupon_code'], '')
+        data = self.client.post('/events-list/apply-coupon/', {
+            'coupon_code': 'save10', 'checkout_token': response.context['checkout_token'],
+        }, HTTP_X_REQUESTED_WITH='XMLHttpRequest').json()
+        self.assertTrue(data['success'])
+        state = checkout_state.load_state(data['checkout_token'], ticket.pk)
+        self.assertEqual(state['coupon_code'], 'SAVE10')
+        self.assertEqual(state['discount_amount'], Decimal('5.00'))
+        self.assertEqual(state['checkout_id'], checkout_state.load_state(response.context['checkout_token'])['checkout_id'])
+
+    def test_checkout_page_does_not_write_the_session(self):
+        ticket = Ticket.objects.filter(seat__row__event=create_event()).first()
+        response = self.client.get(f'/checkout/{ticket.pk}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn(settings.SESSION_COOKIE_NAME, response.cookies)
+        self.assertEqual(checkout_state.load_state(response.context['checkout_token'], ticket.pk)['subtotal'],
+                         ticket.price)
@@ -0,0 +1,208 @@
+import csv
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.management import CommandError, call_command
+from django.db.models import Sum
+from django.test import TestCase
+from django.utils import timezone
+
+from tickets import coupons
+from tickets.models import Coupon, CouponCounter, CouponRedemption
+
+from .utils import clear_caches
+
+
+class CouponLookupTests(TestCase):
+    def setUp(self):
+        clear_caches()
+
+    def create_coupon(self, code='SAVE10', days=1, **fields):
+        return Coupon.objects.create(code=code, discount_percent=10,
+                                     valid_until=timezone.now() + timedelta(days=days), **fields)
+
+    def test_lookups_are_cached_and_case_insensitive(self):
+        coupon = self.create_coupon()
+        self.assertEqual(coupons.get_coupon(' save10 '), coupon)
+        with self.assertNumQueries(0):
+            self.assertEqual(coupons.get_coupon('SAVE10'), coupon)
+
+    def test_unknown_codes_are_cached_until_a_coupon_is_saved(self):
+        self.assertIsNone(coupons.get_coupon('LATER'))
+        with self.assertNumQueries(0):
+            self.assertIsNone(coupons.get_coupon('LATER'))
+        coupon = self.create_coupon(code='LATER')
+        self.assertEqual(coupons.get_coupon('LATER'), coupon)
+
+    def test_validate_coupon(self):
+        self.create_coupon(code='OLD', days=-1)
+        with self.assertRaisesMessage(coupons.InvalidCoupon, 'Invalid coupon code'):
+            coupons.validate_coupon('NOPE')
+        with self.assertRaisesMessage(coupons.InvalidCoupon, 'expired'):
+            coupons.validate_coupon('OLD')
+
+
+class CouponLimitTests(TestCase):
+    def create_coupon(self, **limits):
+        return Coupon.objects.create(code='LIMITED', discount_percent=10,
+                                     valid_until=timezone.now() + timedelta(days=1), **limits)
+
+    def test_usage_cap_holds_across_counter_stripes(self):
+        coupon = self.create_coupon(max_redemptions=3)
+        shards = [coupons.reserve_redemption(coupon) for _ in range(3)]
+        with self.assertRaisesMessage(coupons.InvalidCoupon, 'usage limit'):
+            coupons.reserve_redemption(coupon)
+        coupons.release_redemption(coupon, shards[0])
+        coupons.reserve_redemption(coupon)
+        self.assertEqual(CouponCounter.objects.filter(coupon=coupon).aggregate(Sum('count'))['count__sum'], 3)
+
+    def test_per_user_limit(self):
+        coupon = self.create_coupon(max_per_user=1)
+        user, other = User.objects.create_user('first'), User.objects.create_user('second')
+        coupons.record_redemption(coupon, coupons.reserve_redemption(coupon, user), user, None)
+        with self.assertRaisesMessage(coupons.InvalidCoupon, 'maximum number of times'):
+            coupons.reserve_redemption(coupon, user)
+        coupons.reserve_redemption(coupon, other)
+
+    def test_per_user_limit_is_checked_again_when_recording(self):
+        # Two checkouts of one account both got past the reservation
+        coupon = self.create_coupon(max_per_user=1)
+        user = User.objects.create_user('buyer')
+        first, second = coupons.reserve_redemption(coupon, user), coupons.reserve_redemption(coupon, user)
+        coupons.record_redemption(coupon, first, user, None)
+        with self.assertRaises(coupons.InvalidCoupon):
+            coupons.record_redemption(coupon, second, user, None)
+        self.assertEqual(CouponRedemption.objects.filter(coupon=coupon, user=user).count(), 1)
+
+    def test_per_user_limit_needs_a_signed_in_customer(self):
+        coupon = self.create_coupon(max_per_user=1)
+        for user in (None, AnonymousUser()):
+            with self.subTest(user=user), self.assertRaisesMessage(coupons.InvalidCoupon, 'Sign in'):
+                coupons.reserve_redemption(coupon, user)
+        # Coupons without a per-user limit work for anyone
+        open_coupon = Coupon.objects.create(code='OPEN', discount_percent=5, valid_until=coupon.valid_until)
+        coupons.reserve_redemption(open_coupon, AnonymousUser())
+
+    def test_full_coupons_fail_validation(self):
+        coupon = self.create_coupon(max_redemptions=2)
+        coupons.reserve_redemption(coupon)
+        coupons.validate_coupon('LIMITED')
+        coupons.reserve_redemption(coupon)
+        with self.assertRaisesMessage(coupons.InvalidCoupon, 'usage limit'):
+            coupons.validate_coupon('LIMITED')
+
+    def test_changing_the_cap_keeps_the_stripes(self):
+        coupon = self.create_coupon(max_redemptions=3)
+        self.assertEqual(coupon.counter_shards, 3)
+        for _ in range(3):
+            coupons.reserve_redemption(coupon)
+        coupon.max_redemptions = 1
+        coupon.save()
+        self.assertEqual(coupon.counter_shards, 3)
+        with self.assertRaises(coupons.InvalidCoupon):
+            coupons.reserve_redemption(coupon)
+        # Raised again, only the two new uses fit whatever stripes the old ones were on
+        coupon.max_redemptions = 5
+        coupon.save()
+        coupons.reserve_redemption(coupon)
+        coupons.reserve_redemption(coupon)
+        with self.assertRaises(coupons.InvalidCoupon):
+            coupons.reserve_redemption(coupon)
+        self.assertEqual(coupons.count_uses(coupon), 5)
+
+    def test_lowering_the_cap_below_the_uses_so_far(self):
+        coupon = self.create_coupon(max_redemptions=10)
+        shards = [coupons.reserve_redemption(coupon) for _ in range(6)]
+        coupon.max_redemptions = 4
+        coupon.save()
+        with self.assertRaises(coupons.InvalidCoupon):
+            coupons.reserve_redemption(coupon)
+        for shard in shards[:3]:
+            coupons.release_redemption(coupon, shard)
+        self.assertEqual(coupons.count_uses(coupon), 3)
+        while True:
+            try:
+                coupons.reserve_redemption(coupon)
+            except coupons.InvalidCoupon:
+                break
+        self.assertEqual(coupons.count_uses(coupon), 4)
+
+    def test_coupons_created_in_bulk_get_their_stripes_on_first_use(self):
+        coupons.create_coupons([Coupon(code='BULK', discount_percent=10, max_redemptions=2,
+                                       valid_until=timezone.now() + timedelta(days=1))])
+        coupon = Coupon.objects.get(code='BULK')
+        self.assertIsNone(coupon.counter_shards)
+        coupons.reserve_redemption(coupon)
+        coupons.reserve_redemption(coupon)
+        with self.assertRaises(coupons.InvalidCoupon):
+            coupons.reserve_redemption(coupon)
+        self.assertEqual(Coupon.objects.get(code='BULK').counter_shards, 2)
+
+
+class CouponCommandTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+
+    def read_csv(self, name):
+        with open(self.directory / name, newline='') as f:
+            return list(csv.DictReader(f))
+
+    def write_csv(self, name, text):
+        (self.directory / name).write_text(text)
+        return str(self.directory / name)
+
+    def test_generate_coupons(self):
+        out = StringIO()
+        call_command('generate_coupons', 25, discount=15, prefix='pr-', max_redemptions=0, chunk_size=10,
+                     output=str(self.directory / 'codes.csv'), stderr=out)
+        rows = self.read_csv('codes.csv')
+        self.assertEqual(len(rows), 25)
+        self.assertIn('Created 25 coupons', out.getvalue())
+        self.assertEqual(Coupon.objects.filter(code__startswith='PR-', max_redemptions=0).count(), 25)
+        self.assertEqual({row['max_redemptions'] for row in rows}, {'0'})
+        self.assertEqual({row['max_per_user'] for row in rows}, {''})
+
+    def test_generate_coupons_reports_only_codes_it_created(self):
+        Coupon.objects.create(code='TAKEN', discount_percent=5, valid_until=timezone.now())
+        out = StringIO()
+        with mock.patch('tickets.coupons.generate_codes', return_value=iter([['TAKEN', 'FRESH']])):
+            call_command('generate_coupons', 2, discount=10, output=str(self.directory / 'codes.csv'), stderr=out)
+        self.assertEqual([row['code'] for row in self.read_csv('codes.csv')], ['FRESH'])
+        self.assertIn('Created 1 coupons', out.getvalue())
+        self.assertEqual(Coupon.objects.get(code='TAKEN').discount_percent, 5)
+
+    def test_generate_coupons_checks_the_discount(self):
+        for discount in (0, 101):
+            with self.subTest(discount=discount), self.assertRaisesMessage(CommandError, 'between 1 and 100'):
+                call_command('generate_coupons', 1, discount=discount, stderr=StringIO())
+        self.assertFalse(Coupon.objects.exists())
+
+    def test_import_coupons(self):
+        Coupon.objects.create(code='EXISTING', discount_percent=5, valid_until=timezone.now())
+        path = self.write_csv('import.csv', 'code,discount_percent,max_redemptions\n'
+                                            'existing,50,\nnew1,20,0\nnew2,,3\nNEW1,20,\n')
+        out = StringIO()
+        call_command('import_coupons', path, discount=10, stdout=out)
+        self.assertIn('Imported 2 coupons', out.getvalue())
+        self.assertEqual(Coupon.objects.get(code='EXISTING').discount_percent, 5)
+        self.assertEqual(Coupon.objects.get(code='NEW1').max_redemptions, 0)
+        self.assertEqual(Coupon.objects.get(code='NEW2').discount_percent, 10)
+
+    def test_import_coupons_is_all_or_nothing(self):
+        path = self.write_csv('import.csv', 'code,discount_percent\nGOOD,20\nBAD,0\n')
+        with self.assertRaisesMessage(CommandError, 'Line 3: discount_percent must be between 1 and 100'):
+            call_command('import_coupons', path, stdout=StringIO())
+        self.assertFalse(Coupon.objects.exists())
+
+    def test_export_and_import_round_trip(self):
+        Coupon.objects.create(code='ZERO', discount_percent=10, valid_until=timezone.now(), max_redemptions=0)
+        call_command('export_coupons', output=str(self.directory / 'export.csv'), stdout=StringIO())
+        Coupon.objects.all().delete()
+        call_command('import_coupons', str(self.directory / 'export.csv'), stdout=StringIO())
+        self.assertEqual(Coupon.objects.get(code='ZERO').max_redemptions, 0)
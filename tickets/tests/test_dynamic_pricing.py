@@ -0,0 +1,66 @@
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+
+from tickets import dynamic_pricing, pricing
+from tickets.models import Seat, SeatRow, Ticket
+
+from .utils import clear_caches, create_event
+
+CURVES = {'default': [(0.0, 1.0), (0.5, 1.1), (0.9, 1.5)]}
+
+
+def book(row, count):
+    Seat.objects.filter(pk__in=list(row.seats.order_by('number').values_list('pk', flat=True)[:count])) \
+        .update(is_booked=True)
+
+
+@override_settings(DYNAMIC_PRICING_CURVES=CURVES)
+class RepricingTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.event = create_event(rows=2, seats_per_row=4, price=Decimal('10.00'))
+        self.quiet_row, self.busy_row = SeatRow.objects.filter(event=self.event).order_by('name')
+
+    def test_price_for_picks_the_step_of_the_sell_through(self):
+        curve = dynamic_pricing.get_curve()
+        self.assertEqual(dynamic_pricing.price_for(Decimal('10.00'), 0.49, curve), Decimal('10.00'))
+        self.assertEqual(dynamic_pricing.price_for(Decimal('10.00'), 0.5, curve), Decimal('11.00'))
+        self.assertEqual(dynamic_pricing.price_for(Decimal('9.99'), 1, curve), Decimal('14.99'))
+
+    def test_rows_and_unsold_tickets_are_repriced(self):
+        book(self.busy_row, 2)
+        self.assertEqual(dynamic_pricing.reprice_events([self.event.pk], dynamic_pricing.get_curve()), (1, 1))
+        self.busy_row.refresh_from_db()
+        self.assertEqual(self.busy_row.price, Decimal('11.00'))
+        self.assertEqual(self.busy_row.base_price, Decimal('10.00'))
+        prices = dict(Ticket.objects.filter(seat__row=self.busy_row).values_list('seat__is_booked', 'price'))
+        self.assertEqual(prices, {True: Decimal('10.00'), False: Decimal('11.00')})
+        self.assertEqual(set(Ticket.objects.filter(seat__row=self.quiet_row).values_list('price', flat=True)),
+                         {Decimal('10.00')})
+        self.assertEqual(pricing.get_price_table(self.event.pk)[self.busy_row.pk], Decimal('11.00'))
+
+    def test_prices_follow_the_base_price_not_the_last_price(self):
+        book(self.busy_row, 4)
+        curve = dynamic_pricing.get_curve()
+        dynamic_pricing.reprice_events([self.event.pk], curve)
+        self.assertEqual(dynamic_pricing.reprice_events([self.event.pk], curve), (0, 0))
+        self.busy_row.refresh_from_db()
+        self.assertEqual(self.busy_row.price, Decimal('15.00'))
+
+    def test_dry_run_changes_nothing(self):
+        book(self.busy_row, 4)
+        self.assertEqual(dynamic_pricing.reprice_events([self.event.pk], dynamic_pricing.get_curve(), dry_run=True),
+                         (1, 1))
+        self.busy_row.refresh_from_db()
+        self.assertEqual(self.busy_row.price, Decimal('10.00'))
+
+    def test_command(self):
+        book(self.busy_row, 2)
+        out = StringIO()
+        call_command('reprice_events', stdout=out)
+        self.assertIn('Repriced 1 rows across 1 events', out.getvalue())
+        with self.assertRaisesMessage(CommandError, 'Unknown pricing curve "surge"'):
+            call_command('reprice_events', curve='surge', stdout=StringIO())
@@ -0,0 +1,59 @@
+import re
+
+from django.test import RequestFactory, TestCase, override_settings
+
+from tickets import views
+from tickets.models import Seat, Ticket
+
+from .utils import clear_caches, create_event
+
+TICKET_ID = re.compile(r'data-ticket-id="(\d+)"')
+
+
+class StreamingEventDetailTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.event = create_event(rows=2, seats_per_row=3)
+        Seat.objects.filter(row__event=cls.event, number=2).update(is_booked=True)
+
+    def setUp(self):
+        clear_caches()
+
+    def get(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        if response.streaming:
+            return response, b''.join(response.streaming_content).decode()
+        return response, response.content.decode()
+
+    def test_large_events_stream_the_same_page(self):
+        url = f'/events-list/{self.event.pk}/'
+        with override_settings(EVENT_DETAIL_STREAMING_SEATS=100):
+            response, rendered = self.get(url)
+        self.assertFalse(response.streaming)
+        with override_settings(EVENT_DETAIL_STREAMING_SEATS=4):
+            response, streamed = self.get(url)
+        self.assertTrue(response.streaming)
+        self.assertNotIn('<!-- tickets ', streamed)
+        self.assertTrue(streamed.rstrip().endswith('</html>'))
+        # Row by row, seat by seat, as on the rendered page
+        expected = [str(pk) for pk in Ticket.objects.filter(seat__row__event=self.event)
+                    .order_by('seat__row__sort_key', 'seat__number').values_list('pk', flat=True)]
+        self.assertEqual(TICKET_ID.findall(streamed), expected)
+        self.assertEqual(TICKET_ID.findall(rendered), expected)
+        self.assertEqual(streamed.count('ticket-status booked'), 2)
+
+    def test_tickets_are_sent_in_chunks(self):
+        request = RequestFactory().get('/')
+        tickets = views._ticket_rows('default', self.event)
+        parts = list(views._stream_event_detail(request, {'event': self.event}, tickets, chunk_size=4))
+        # The page head, two chunks of tickets and the rest of the page
+        self.assertEqual(len(parts), 4)
+        self.assertEqual([len(TICKET_ID.findall(part)) for part in parts], [0, 4, 2, 0])
+        self.assertIn(self.event.name, parts[0])
+
+    @override_settings(EVENT_DETAIL_STREAMING_SEATS=4, SEATMAP_TILED_SEATS=5)
+    def test_tiled_maps_do_not_list_tickets(self):
+        response, content = self.get(f'/events-list/{self.event.pk}/')
+        self.assertFalse(response.streaming)
+        self.assertEqual(TICKET_ID.findall(content), [])
@@ -0,0 +1,73 @@
+from decimal import Decimal
+
+from django.test import TestCase
+
+from tickets import layouts
+from tickets.layouts import SECTION_STRIDE, row_sort_key
+from tickets.models import Seat, SeatRow, Ticket, Venue, VenueRow, VenueSeat, VenueSection
+
+from .utils import create_event
+
+
+class RowSortKeyTests(TestCase):
+    def test_natural_order(self):
+        names = ['Row 1', 'Row 2', 'Row 10', 'Row A', 'Row B', 'Row Z', 'Row AA', 'A1', 'A10', 'B2', 'AA1']
+        ordered = sorted(names, key=row_sort_key)
+        self.assertLess(ordered.index('Row 2'), ordered.index('Row 10'))
+        self.assertLess(ordered.index('Row Z'), ordered.index('Row AA'))
+        self.assertEqual([name for name in ordered if name[0] in 'AB' and name[-1].isdigit()],
+                         ['A1', 'A10', 'B2', 'AA1'])
+
+    def test_keys_stay_below_the_section_stride(self):
+        for name in ['Orchestra', 'Balcony', 'Row 3000000000', 'ZZZZ9999', 'Mezzanine 12', 'Row ' + 'Z' * 40]:
+            with self.subTest(name=name):
+                self.assertGreaterEqual(row_sort_key(name), 0)
+                self.assertLess(row_sort_key(name), SECTION_STRIDE)
+        # So a row of a later section sorts after every row of an earlier one
+        self.assertLess(row_sort_key('Balcony'), SECTION_STRIDE + row_sort_key('Row 1'))
+
+    def test_saving_a_row_follows_renames(self):
+        event = create_event(rows=0)
+        row = SeatRow.objects.create(event=event, name='Row 10', capacity=1, price=Decimal('10.00'))
+        self.assertEqual(row.sort_key, 10)
+        row.name = 'Row 2'
+        row.save(update_fields=['name'])
+        row.refresh_from_db()
+        self.assertEqual(row.sort_key, 2)
+
+    def test_saving_a_cloned_row_keeps_its_section(self):
+        event = create_event(rows=0)
+        row = SeatRow.objects.create(event=event, name='Row 1', capacity=1, price=Decimal('10.00'))
+        SeatRow.objects.filter(pk=row.pk).update(sort_key=3 * SECTION_STRIDE + 1)
+        row.refresh_from_db()
+        row.name = 'Row 5'
+        row.save()
+        self.assertEqual(row.sort_key, 3 * SECTION_STRIDE + 5)
+
+
+class CloneVenueLayoutTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.venue = Venue.objects.create(name='Hall', location='London')
+        stalls = VenueSection.objects.create(venue=cls.venue, name='Stalls', sort_order=0)
+        balcony = VenueSection.objects.create(venue=cls.venue, name='Balcony', sort_order=1)
+        for section, name, seats in [(balcony, 'Row 1', 2), (stalls, 'Row 10', 3), (stalls, 'Row 2', 1)]:
+            row = VenueRow.objects.create(section=section, name=name, price=Decimal('30.00'))
+            VenueSeat.objects.bulk_create(VenueSeat(row=row, number=number, x=number * 30, y=0)
+                                          for number in range(1, seats + 1))
+
+    def assertCloned(self, event):
+        rows = list(SeatRow.objects.filter(event=event).order_by('sort_key').values_list('section', 'name', 'capacity'))
+        self.assertEqual(rows, [('Stalls', 'Row 2', 1), ('Stalls', 'Row 10', 3), ('Balcony', 'Row 1', 2)])
+        self.assertEqual(Seat.objects.filter(row__event=event, is_booked=False).count(), 6)
+        self.assertEqual(set(Ticket.objects.filter(seat__row__event=event).values_list('price', flat=True)),
+                         {Decimal('30.00')})
+
+    def test_new_events_get_the_venue_layout(self):
+        self.assertCloned(create_event(rows=0, venue=self.venue))
+
+    def test_chunked_clone(self):
+        event = create_event(rows=0)
+        event.venue = self.venue
+        layouts._clone_in_chunks(event, 'default', chunk_size=4)
+        self.assertCloned(event)
@@ -0,0 +1,90 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from eventbooking import metrics
+
+from .utils import clear_caches
+
+
+class MetricsViewTests(TestCase):
+    def setUp(self):
+        clear_caches()
+
+    @override_settings(METRICS_TOKEN='')
+    def test_off_without_a_token(self):
+        response = self.client.get('/metrics', headers={'Authorization': 'Bearer '})
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(METRICS_TOKEN='s3cret')
+    def test_wrong_or_missing_token(self):
+        for headers in ({}, {'Authorization': 'Bearer nope'}, {'Authorization': 'Basic s3cret'}):
+            response = self.client.get('/metrics', headers=headers)
+            self.assertEqual(response.status_code, 401)
+            self.assertEqual(response['WWW-Authenticate'], 'Bearer realm="metrics"')
+
+    @override_settings(METRICS_TOKEN='s3cret', METRICS_DIR='')
+    def test_right_token(self):
+        self.client.get('/events-list/')
+        response = self.client.get('/metrics', headers={'Authorization': 'Bearer s3cret'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], metrics.CONTENT_TYPE)
+        content = response.content.decode()
+        self.assertIn('# TYPE http_request_duration_seconds histogram', content)
+        self.assertIn('http_request_duration_seconds_count{view="event_list",method="GET",status="2xx"}', content)
+
+
+def _dead_pid():
+    process = subprocess.Popen([sys.executable, '-c', ''])
+    process.wait()
+    return process.pid
+
+
+class MetricsFoldTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+
+    def write(self, name, hits, misses=0):
+        samples = [[['hit'], hits]] + ([[['miss'], misses]] if misses else [])
+        (self.directory / name).write_text(json.dumps({'cache_requests_total': samples}))
+
+    def read(self, name):
+        return dict((tuple(key), value) for key, value in
+                    json.loads((self.directory / name).read_text())['cache_requests_total'])
+
+    def test_exited_processes_are_folded(self):
+        dead, live = f'{_dead_pid()}-1.json', f'{os.getpid()}-1.json'
+        self.write(metrics.EXITED_FILE, 2)
+        self.write(dead, 3, misses=1)
+        self.write(live, 5)
+
+        metrics._fold_exited(self.directory)
+
+        self.assertEqual(sorted(path.name for path in self.directory.glob('*.json')),
+                         sorted([metrics.EXITED_FILE, live]))
+        self.assertEqual(self.read(metrics.EXITED_FILE), {('hit',): 5, ('miss',): 1})
+        self.assertEqual(self.read(live), {('hit',): 5})
+
+    def test_nothing_to_fold(self):
+        live = f'{os.getpid()}-1.json'
+        self.write(live, 5)
+        metrics._fold_exited(self.directory)
+        self.assertEqual([path.name for path in self.directory.glob('*.json')], [live])
+
+    def test_histograms_with_other_buckets_are_skipped(self):
+        histogram = metrics.REQUEST_SECONDS
+        key = ['event_list', 'GET', '2xx']
+        current = [1] + [0] * len(histogram.buckets) + [0.5]
+        totals = metrics._merge([
+            {histogram.name: [[key, current]]},
+            {histogram.name: [[key, current]]},
+            {histogram.name: [[key, [1, 0, 0.5]]]},  # Written with different buckets
+        ])
+        self.assertEqual(totals[histogram.name][tuple(key)], [2] + [0] * len(histogram.buckets) + [1.0])
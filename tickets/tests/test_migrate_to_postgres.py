@@ -0,0 +1,48 @@
+import io
+from datetime import date, datetime, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock, skipUnless
+
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+
+from tickets.management.commands.migrate_to_postgres import Command, _copy_line
+from tickets.models import Category
+
+
+class CopyEncodingTests(TestCase):
+    def test_null_and_empty_string_differ(self):
+        self.assertEqual(_copy_line([None, '', 'x']), ',"","x"\n')
+
+    def test_values(self):
+        self.assertEqual(
+            _copy_line([True, False, 5, Decimal('1.50'), date(2026, 1, 2),
+                        datetime(2026, 1, 2, 3, 4, tzinfo=dt_timezone.utc), {'a': [1]}]),
+            '"t","f","5","1.50","2026-01-02","2026-01-02T03:04:00+00:00","{""a"": [1]}"\n',
+        )
+
+    def test_quotes_separators_and_newlines_stay_inside_the_field(self):
+        self.assertEqual(_copy_line(['say "hi", then\nleave', r'\N']), '"say ""hi"", then\nleave","\\N"\n')
+
+    def test_target_with_rows_needs_restart(self):
+        Category.objects.create(name='Kept', slug='kept')
+        with mock.patch.object(connection, 'vendor', 'postgresql'):
+            with self.assertRaisesMessage(CommandError, 'Run with --restart'):
+                call_command('migrate_to_postgres', source='default', target='default', stdout=io.StringIO())
+        self.assertTrue(Category.objects.filter(slug='kept').exists())
+
+
+@skipUnless(connection.vendor == 'postgresql', 'COPY needs PostgreSQL')
+class CopyRoundTripTests(TransactionTestCase):
+    def test_null_and_empty_string_round_trip(self):
+        with connection.cursor() as cursor:
+            cursor.execute('CREATE TEMPORARY TABLE copy_round_trip (id integer, value text)')
+        command = Command()
+        command.target = connection.alias
+        rows = [(1, None), (2, ''), (3, r'\N'), (4, 'a,"b"')]
+        command._copy('COPY copy_round_trip (id, value) FROM STDIN WITH (FORMAT csv)',
+                      io.StringIO(''.join(map(_copy_line, rows))))
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT id, value FROM copy_round_trip ORDER BY id')
+            self.assertEqual(cursor.fetchall(), rows)
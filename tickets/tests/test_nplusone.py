@@ -0,0 +1,55 @@
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+
+from eventbooking import nplusone
+from tickets.models import Category, SeatRow, Ticket
+
+from .utils import clear_caches, create_event
+
+
+class NPlusOneTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.event = create_event(rows=6)
+
+    def test_fingerprint_folds_literals_and_in_lists(self):
+        self.assertEqual(
+            nplusone.fingerprint("SELECT * FROM t WHERE id = 12 AND name = 'it''s' AND x IN (%s, %s, %s)"),
+            'SELECT * FROM t WHERE id = ? AND name = ? AND x IN (...)',
+        )
+
+    def test_detect_raises_on_a_query_per_row(self):
+        with self.assertRaises(nplusone.NPlusOneError) as raised:
+            with nplusone.detect(threshold=5):
+                for row in SeatRow.objects.all():
+                    row.event.name
+        self.assertIn('6x', str(raised.exception))
+        self.assertIn('tickets/tests/test_nplusone.py', str(raised.exception))
+
+    def test_detect_passes_with_select_related(self):
+        with nplusone.detect(threshold=5):
+            for row in SeatRow.objects.select_related('event'):
+                row.event.name
+
+    def test_detect_can_log_instead(self):
+        with self.assertLogs('eventbooking.nplusone', 'WARNING'):
+            with nplusone.detect(threshold=5, raise_errors=False):
+                for row in SeatRow.objects.all():
+                    row.event.name
+
+    @override_settings(NPLUSONE_MODE='raise', NPLUSONE_THRESHOLD=5)
+    def test_public_pages_have_no_n_plus_one(self):
+        category = Category.objects.create(name='Concerts', slug='concerts')
+        for index in range(6):
+            create_event(days=index + 1, rows=3, name=f'Event {index}').categories.add(category)
+        User.objects.create_user('buyer', password='pw')
+        self.client.login(username='buyer', password='pw')
+        ticket = Ticket.objects.filter(seat__row__event=self.event).first()
+        for url in ['/', '/events-list/', f'/events-list/?category={category.pk}', f'/events-list/{self.event.pk}/',
+                    f'/events-list/checkout/{ticket.pk}/', '/events-list/my-tickets/']:
+            with self.subTest(url=url):
+                clear_caches()
+                response = self.client.get(url)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+                self.assertEqual(response.status_code, 200)
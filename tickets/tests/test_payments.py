@@ -0,0 +1,61 @@
+from unittest import mock
+
+import stripe
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase, override_settings
+
+from eventbooking import timing
+from tickets import payments
+
+
+@override_settings(STRIPE_STUB=True, STRIPE_STUB_LATENCY=0, STRIPE_SECRET_KEY='sk_test_stub')
+class StubGatewayTests(SimpleTestCase):
+    def setUp(self):
+        # Stripe must never be called while the stub is on
+        for name in ('PaymentIntent', 'Refund'):
+            patcher = mock.patch.object(stripe, name)
+            self.addCleanup(patcher.stop)
+            setattr(self, name, patcher.start())
+
+    def test_payment_succeeds(self):
+        intent = payments.create_payment_intent(amount=5000, currency='usd', payment_method='pm_card_visa')
+        self.assertEqual(intent.status, 'succeeded')
+        self.assertTrue(intent.id.startswith('pi_stub_'))
+        self.assertNotEqual(intent.id, payments.create_payment_intent(amount=5000, currency='usd').id)
+        self.PaymentIntent.create.assert_not_called()
+
+    def test_declined_test_card(self):
+        with self.assertRaises(stripe.CardError) as raised:
+            payments.create_payment_intent(amount=5000, currency='usd', payment_method=payments.DECLINED_TEST_CARD)
+        self.assertEqual(raised.exception.code, 'card_declined')
+
+    def test_refund(self):
+        self.assertIsNone(payments.refund('pi_stub_123'))
+        self.Refund.create.assert_not_called()
+
+    def test_calls_are_timed(self):
+        timings = timing.RequestTimings()
+        token = timing._current.set(timings)
+        try:
+            payments.create_payment_intent(amount=5000, currency='usd')
+            payments.refund('pi_stub_123')
+        finally:
+            timing._current.reset(token)
+        self.assertIn('stripe', timings.external)
+
+    def test_live_keys_are_refused(self):
+        for key in ('sk_live_abc', 'rk_live_abc'):
+            with self.subTest(key=key), override_settings(STRIPE_SECRET_KEY=key):
+                with self.assertRaises(ImproperlyConfigured):
+                    payments.create_payment_intent(amount=5000, currency='usd')
+                with self.assertRaises(ImproperlyConfigured):
+                    payments.refund('pi_123')
+        self.PaymentIntent.create.assert_not_called()
+        self.Refund.create.assert_not_called()
+
+    @override_settings(STRIPE_STUB=False)
+    def test_stripe_is_called_without_the_stub(self):
+        payments.create_payment_intent(amount=5000, currency='usd')
+        payments.refund('pi_123')
+        self.PaymentIntent.create.assert_called_once_with(amount=5000, currency='usd')
+        self.Refund.create.assert_called_once_with(payment_intent='pi_123')
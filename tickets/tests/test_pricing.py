@@ -0,0 +1,43 @@
+from decimal import Decimal
+
+from django.test import TestCase, override_settings
+
+from tickets import pricing
+from tickets.models import Seat
+
+from .utils import clear_caches, create_event
+
+
+@override_settings(TAX_RATE=Decimal('0.15'))
+class PricingTests(TestCase):
+    def test_quote_rounds_half_up_to_cents(self):
+        # 0.15 * 10.10 = 1.515 and 10% of 10.10 = 1.01
+        quote = pricing.quote([Decimal('10.10')], 10)
+        self.assertEqual(quote.subtotal, Decimal('10.10'))
+        self.assertEqual(quote.tax_amount, Decimal('1.52'))
+        self.assertEqual(quote.discount_amount, Decimal('1.01'))
+        self.assertEqual(quote.total_amount, Decimal('10.61'))
+        self.assertEqual(quote.seat_count, 1)
+
+    def test_tax_is_charged_before_the_discount(self):
+        quote = pricing.quote([Decimal('50.00'), Decimal('50.00')], 50)
+        self.assertEqual(quote.tax_amount, Decimal('15.00'))
+        self.assertEqual(quote.total_amount, Decimal('65.00'))
+
+    def test_quote_sums_exactly(self):
+        quote = pricing.quote([Decimal('0.10')] * 1000)
+        self.assertEqual(quote.subtotal, Decimal('100.00'))
+        self.assertEqual(quote.seat_count, 1000)
+
+    @override_settings(TAX_RATE='0.2')
+    def test_tax_rate_from_settings(self):
+        self.assertEqual(pricing.quote([Decimal('10.00')]).tax_amount, Decimal('2.00'))
+
+    def test_quote_seats_ignores_seats_of_other_events(self):
+        clear_caches()
+        event, other = create_event(price=Decimal('20.00')), create_event(price=Decimal('99.00'))
+        seats = list(Seat.objects.filter(row__event=event).values_list('pk', flat=True)[:2])
+        seats.append(Seat.objects.filter(row__event=other).values_list('pk', flat=True).first())
+        quote = pricing.quote_seats(event.pk, seats)
+        self.assertEqual(quote.seat_count, 2)
+        self.assertEqual(quote.subtotal, Decimal('40.00'))
@@ -0,0 +1,47 @@
+import tempfile
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+
+from eventbooking import profiling
+
+from .utils import clear_caches, create_event
+
+
+class ProfilingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_event()
+        cls.staff = User.objects.create_user('staff', password='pw', is_staff=True)
+
+    def setUp(self):
+        clear_caches()
+        output_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(output_dir.cleanup)
+        self.output_dir = Path(output_dir.name)
+        settings = override_settings(PROFILE_OUTPUT_DIR=output_dir.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def test_profiled_request_writes_its_files(self):
+        response = self.client.get('/events-list/', {profiling.TOKEN_PARAM: profiling.make_token(self.staff)})
+        self.assertEqual(response.status_code, 200)
+        profile_id = response['X-Profile-Id']
+        self.assertEqual(
+            sorted(path.name for path in self.output_dir.iterdir()),
+            sorted(f'{profile_id}{suffix}' for suffix in ('.folded', '.tracemalloc', '.txt')),
+        )
+
+    def test_profiles_of_the_same_second_do_not_overwrite_each_other(self):
+        token = profiling.make_token(self.staff)
+        ids = {self.client.get('/events-list/', {profiling.TOKEN_PARAM: token})['X-Profile-Id'] for _ in range(3)}
+        self.assertEqual(len(ids), 3)
+        self.assertEqual(len(list(self.output_dir.glob('*.txt'))), 3)
+
+    def test_invalid_tokens_are_not_profiled(self):
+        user = User.objects.create_user('visitor', password='pw')
+        for token in ('garbage', profiling.make_token(user)):
+            response = self.client.get('/events-list/', {profiling.TOKEN_PARAM: token})
+            self.assertFalse(response.has_header('X-Profile-Id'))
+        self.assertEqual(list(self.output_dir.iterdir()), [])
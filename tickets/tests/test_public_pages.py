@@ -0,0 +1,45 @@
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+
+from .utils import clear_caches, create_event
+
+
+class PublicPageTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.event = create_event()
+        cls.user = User.objects.create_user('buyer')
+
+    def setUp(self):
+        clear_caches()
+        self.client.force_login(self.user)
+
+    @override_settings(PUBLIC_PAGE_CACHE_SECONDS=60)
+    def test_pages_are_the_same_for_every_visitor(self):
+        for url in ['/', '/events-list/', f'/events-list/{self.event.pk}/']:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertIn('public', response['Cache-Control'])
+                self.assertIn('max-age=60', response['Cache-Control'])
+                self.assertTrue(response.has_header('ETag'))
+                self.assertNotIn('Cookie', response.get('Vary', ''))
+                self.assertEqual(list(response.cookies), [])
+                self.assertFalse(response.context['user'].is_authenticated)
+
+    @override_settings(PUBLIC_PAGE_CACHE_SECONDS=60)
+    def test_matching_etag_is_not_modified(self):
+        etag = self.client.get('/events-list/')['ETag']
+        self.assertEqual(self.client.get('/events-list/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_pages_use_the_session_when_disabled(self):
+        response = self.client.get('/events-list/')
+        self.assertTrue(response.context['user'].is_authenticated)
+        self.assertNotIn('public', response.get('Cache-Control', ''))
+
+    def test_session_status(self):
+        response = self.client.get('/session/')
+        self.assertEqual(response.json(), {'authenticated': True, 'username': 'buyer'})
+        self.assertIn('no-cache', response['Cache-Control'])
+        self.client.logout()
+        self.assertEqual(self.client.get('/session/').json(), {'authenticated': False})
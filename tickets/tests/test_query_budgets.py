@@ -0,0 +1,56 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from tickets.management.commands.bench_views import QUERY_BUDGETS
+from tickets.models import Category, Coupon, Event, Ticket
+
+from .utils import clear_caches, create_event
+
+
+class QueryBudgetTests(TestCase):
+    """The views stay within the query budgets ``bench_views`` enforces."""
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Concerts', slug='concerts')
+        for index in range(8):
+            create_event(days=index + 1, rows=3, name=f'Event {index}').categories.add(category)
+        cls.event = Event.objects.order_by('date').first()
+        cls.ticket = Ticket.objects.filter(seat__row__event=cls.event).first()
+        Coupon.objects.create(code='BUDGET10', discount_percent=10, valid_until=timezone.now() + timedelta(days=1))
+        cls.user = User.objects.create_user('buyer')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def assertWithinBudget(self, view, request, *args, **kwargs):
+        clear_caches()
+        with CaptureQueriesContext(connection) as queries:
+            response = request(*args, **kwargs)
+            if response.streaming:
+                b''.join(response.streaming_content)
+        self.assertEqual(response.status_code, 200)
+        self.assertLessEqual(len(queries), QUERY_BUDGETS[view],
+                             f'{view} ran {len(queries)} queries:\n' + '\n'.join(q['sql'] for q in queries))
+        return response
+
+    def test_public_pages(self):
+        for view, url in [('home', '/'), ('event_list', '/events-list/'),
+                          ('event_list', '/events-list/?q=Event&sort=name_desc'),
+                          ('event_list', '/events-list/?category=concerts'),
+                          ('event_detail', f'/events-list/{self.event.pk}/')]:
+            with self.subTest(url=url):
+                self.assertWithinBudget(view, self.client.get, url)
+
+    def test_checkout_and_apply_coupon(self):
+        response = self.assertWithinBudget('checkout', self.client.get, f'/checkout/{self.ticket.pk}/')
+        self.assertWithinBudget(
+            'apply_coupon', self.client.post, '/events-list/apply-coupon/',
+            {'coupon_code': 'BUDGET10', 'checkout_token': response.context['checkout_token']},
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest',
+        )
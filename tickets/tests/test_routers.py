@@ -0,0 +1,82 @@
+from django.contrib.auth.models import User
+from django.db import router
+from django.test import SimpleTestCase, override_settings
+from django.utils.functional import SimpleLazyObject
+
+from eventbooking.routers import ReplicaRouter, ShardRouter, use_primary
+from tickets import sharding
+from tickets.models import Event, Payment, SeatRow, Ticket
+
+
+def on(obj, db):
+    obj._state.db = db
+    return obj
+
+
+class ReplicaRouterTests(SimpleTestCase):
+    def setUp(self):
+        self.replicas = ReplicaRouter()
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_replica_router_steps_aside_without_replicas(self):
+        event = Event()
+        self.assertIsNone(self.replicas.db_for_read(Event))
+        self.assertIsNone(self.replicas.db_for_write(Event, instance=event))
+        self.assertIsNone(self.replicas.allow_relation(event, SeatRow()))
+
+    @override_settings(DATABASE_REPLICAS=['replica1'])
+    def test_replica_router_reads_from_replicas_and_writes_to_default(self):
+        self.assertEqual(self.replicas.db_for_read(Event), 'replica1')
+        self.assertEqual(self.replicas.db_for_write(Event), 'default')
+        with use_primary():
+            self.assertEqual(self.replicas.db_for_read(Event), 'default')
+        # Objects read from a replica are saved to the primary
+        self.assertEqual(self.replicas.db_for_write(Event, instance=on(Event(), 'replica1')), 'default')
+
+    def test_objects_from_other_aliases_stay_there(self):
+        for replicas in ([], ['replica1']):
+            with self.subTest(replicas=replicas), override_settings(DATABASE_REPLICAS=replicas):
+                event = on(Event(pk=1), 'bench')
+                self.assertEqual(router.db_for_read(SeatRow, instance=event), 'bench')
+                self.assertEqual(router.db_for_write(SeatRow, instance=event), 'bench')
+                row = SeatRow(event=event)
+                self.assertEqual(row._state.db, 'bench')
+
+    @override_settings(DATABASE_REPLICAS=['replica1'], DATABASE_SHARDS=['default', 'shard1'])
+    def test_replicas_with_shards_are_reported(self):
+        self.assertEqual([warning.id for warning in sharding.check_replicas_with_shards(None)], ['tickets.W001'])
+        with override_settings(DATABASE_SHARDS=[]):
+            self.assertEqual(sharding.check_replicas_with_shards(None), [])
+
+
+@override_settings(DATABASE_SHARDS=['default', 'shard1'])
+class ShardRouterTests(SimpleTestCase):
+    def setUp(self):
+        self.shards = ShardRouter()
+
+    def test_shard_router_accepts_lazy_users(self):
+        user = on(User(pk=1), 'default')
+        ticket = on(Ticket(pk=1), 'shard1')
+        lazy_user = SimpleLazyObject(lambda: user)
+        self.assertTrue(self.shards.allow_relation(lazy_user, ticket))
+        self.assertTrue(self.shards.allow_relation(ticket, lazy_user))
+        ticket.user = lazy_user
+        self.assertEqual(ticket.user_id, 1)
+
+    def test_shard_router_keeps_relations_on_one_shard(self):
+        event = on(Event(pk=1), 'default')
+        self.assertFalse(self.shards.allow_relation(event, on(SeatRow(pk=2), 'shard1')))
+        self.assertTrue(self.shards.allow_relation(event, on(SeatRow(pk=3), 'default')))
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_global_rows_of_sharded_rows_are_on_default(self):
+        payment = on(Payment(pk=1, user_id=1), 'shard1')
+        self.assertEqual(router.db_for_read(User, instance=payment), 'default')
+        self.assertEqual(router.db_for_read(Ticket, instance=payment), 'shard1')
+
+    def test_rows_follow_their_ids(self):
+        second = 1 << sharding.SHARD_BITS
+        self.assertEqual(sharding.shard_for_pk(5), 'default')
+        self.assertEqual(sharding.shard_for_pk(second + 5), 'shard1')
+        self.assertIsNone(sharding.shard_for_pk(2 * second))
+        self.assertEqual(router.db_for_write(SeatRow, instance=SeatRow(event_id=second + 1)), 'shard1')
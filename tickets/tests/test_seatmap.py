@@ -0,0 +1,81 @@
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from tickets import seatmap
+from tickets.caching import bump_event_versions
+from tickets.models import Seat, Ticket
+
+from .utils import clear_caches, create_event
+
+
+class SeatIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.index = seatmap.SeatIndex(1, 'v1', [(1, 1, 0, 0), (2, 1, 30, 0), (3, 2, 500, 500)])
+
+    def test_query_returns_the_seats_in_the_box(self):
+        self.assertEqual(sorted(self.index.query(-5, -5, 35, 5)), [0, 1])
+        self.assertEqual(self.index.query(490, 490, 1000, 1000), [2])
+        self.assertEqual(self.index.query(100, 100, 200, 200), [])
+
+    def test_hit_picks_the_nearest_seat_within_its_radius(self):
+        self.assertEqual(self.index.hit(27, 2)[0], 2)
+        self.assertEqual(self.index.hit(4, -3)[0], 1)
+        self.assertIsNone(self.index.hit(15, seatmap.SEAT_RADIUS + 1))
+        self.assertIsNone(self.index.hit(250, 250))
+
+    def test_tiles(self):
+        self.assertTrue(self.index.has_tile(0, 0, 0))
+        self.assertTrue(self.index.has_tile(self.index.max_zoom, 2 ** self.index.max_zoom - 1, 0))
+        self.assertFalse(self.index.has_tile(0, 1, 0))
+        self.assertFalse(self.index.has_tile(self.index.max_zoom + 1, 0, 0))
+        tile = seatmap.render_tile(self.index, self.index.max_zoom, 0, 0)
+        self.assertTrue(tile.startswith('<svg'))
+        self.assertIn('<circle cx="0" cy="0"', tile)
+
+
+@override_settings(SEATMAP_MAX_VIEWPORT_SEATS=100)
+class SeatMapViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        # Seats without positions are laid out SEAT_SPACING apart in rows ROW_SPACING apart
+        cls.event = create_event(rows=2, seats_per_row=3)
+        cls.booked = Seat.objects.get(row__event=cls.event, row__name='Row 2', number=2)
+        cls.booked.is_booked = True
+        cls.booked.save()
+
+    def setUp(self):
+        clear_caches()
+        self.url = f'/events-list/{self.event.pk}/seat-map/'
+
+    def test_index_is_rebuilt_when_the_event_changes(self):
+        index = seatmap.get_index(self.event.pk)
+        self.assertEqual(len(index.seats), 6)
+        self.assertIs(seatmap.get_index(self.event.pk), index)
+        bump_event_versions([self.event.pk])
+        self.assertIsNot(seatmap.get_index(self.event.pk), index)
+
+    def test_seat_map_and_tiles(self):
+        data = self.client.get(self.url).json()
+        self.assertEqual(data['tile_size'], seatmap.TILE_SIZE)
+        response = self.client.get(f'{self.url}0/0/0.svg?v={data["version"]}')
+        self.assertEqual(response['Content-Type'], 'image/svg+xml')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(self.client.get(f'{self.url}0/1/0.svg').status_code, 404)
+
+    def test_seats_in_view(self):
+        seats = self.client.get(f'{self.url}seats/', {'x0': 0, 'y0': 30, 'x1': 100, 'y1': 50}).json()['seats']
+        self.assertEqual(sorted(seats), sorted([
+            [seat.pk, seat.number * 30.0, 40.0, seat.pk == self.booked.pk]
+            for seat in Seat.objects.filter(row__event=self.event, row__name='Row 2')
+        ]))
+        self.assertEqual(self.client.get(f'{self.url}seats/', {'x0': 'a'}).status_code, 400)
+
+    @override_settings(SEATMAP_MAX_VIEWPORT_SEATS=2)
+    def test_crowded_views_ask_to_zoom_in(self):
+        data = self.client.get(f'{self.url}seats/', {'x0': 0, 'y0': 0, 'x1': 100, 'y1': 50}).json()
+        self.assertFalse(data['success'])
+
+    def test_hit(self):
+        data = self.client.get(f'{self.url}hit/', {'x': 61, 'y': 39}).json()
+        self.assertEqual(data['ticket_id'], Ticket.objects.get(seat=self.booked).pk)
+        self.assertTrue(data['is_booked'])
+        self.assertFalse(self.client.get(f'{self.url}hit/', {'x': 45, 'y': 20}).json()['success'])
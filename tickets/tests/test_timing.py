@@ -0,0 +1,63 @@
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from eventbooking import timing
+
+from .utils import clear_caches, create_event
+
+
+class RequestTimingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.event = create_event()
+
+    def setUp(self):
+        clear_caches()
+
+    @override_settings(SERVER_TIMING_HEADER=True)
+    def test_server_timing_header(self):
+        header = self.client.get('/events-list/')['Server-Timing']
+        self.assertRegex(header, r'^db;dur=[\d.]+;desc="[1-9]\d* queries", '
+                                 r'cache;dur=[\d.]+;desc="\d+ hits, \d+ misses", total;dur=[\d.]+$')
+
+    @override_settings(SERVER_TIMING_HEADER=False)
+    def test_no_header_when_off(self):
+        self.assertFalse(self.client.get('/events-list/').has_header('Server-Timing'))
+
+    def test_external_calls_are_timed(self):
+        timings = timing.RequestTimings()
+        token = timing._current.set(timings)
+        try:
+            with timing.timed('stripe'):
+                pass
+        finally:
+            timing._current.reset(token)
+        self.assertIn('stripe', timings.external)
+        self.assertRegex(timings.server_timing(), r'stripe;dur=[\d.]+, total;dur=')
+
+    @override_settings(SLOW_REQUEST_MS=100000)
+    def test_requests_are_logged(self):
+        with self.assertLogs('eventbooking.timing', 'INFO') as logs:
+            self.client.get('/events-list/')
+        record = logs.records[-1]
+        self.assertEqual(record.levelname, 'INFO')
+        self.assertEqual(record.timings['path'], '/events-list/')
+        self.assertGreater(record.timings['queries'], 0)
+
+    @override_settings(SLOW_REQUEST_MS=0)
+    def test_slow_requests_are_logged_with_their_slowest_queries(self):
+        with self.assertLogs('eventbooking.timing', 'WARNING') as logs:
+            self.client.get('/events-list/')
+        self.assertIn('Slow request', logs.output[0])
+        self.assertTrue(logs.records[0].slowest_queries)
+
+    @override_settings(EVENT_DETAIL_STREAMING_SEATS=1, SLOW_REQUEST_MS=100000)
+    def test_streamed_responses_are_logged_after_the_body(self):
+        with self.assertNoLogs('eventbooking.timing'):
+            response = self.client.get(f'/events-list/{self.event.pk}/')
+        self.assertTrue(response.streaming)
+        with CaptureQueriesContext(connection) as body, self.assertLogs('eventbooking.timing', 'INFO') as logs:
+            b''.join(response.streaming_content)
+        self.assertTrue(body.captured_queries)
+        self.assertGreaterEqual(logs.records[0].timings['queries'], len(body.captured_queries))
@@ -0,0 +1,24 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.cache import caches
+from django.utils import timezone
+
+from tickets import coupons
+from tickets.models import Event, SeatRow, Ticket
+
+
+def create_event(days=7, rows=2, seats_per_row=3, price=Decimal('50.00'), **fields):
+    """An event ``days`` from now with its rows, seats and unsold tickets."""
+    event = Event.objects.create(name=fields.pop('name', 'Test Event'), date=timezone.now() + timedelta(days=days),
+                                 location=fields.pop('location', 'London'), **fields)
+    for index in range(rows):
+        row = SeatRow.objects.create(event=event, name=f'Row {index + 1}', capacity=seats_per_row, price=price)
+        Ticket.objects.bulk_create(Ticket(seat=seat, price=price) for seat in row.seats.all())
+    return event
+
+
+def clear_caches():
+    for cache in caches.all():
+        cache.clear()
+    coupons.clear_cache()
@@ -4,7 +4,13 @@ from . import views
 urlpatterns = [
     path('', views.event_list, name='event_list'),
     path('<int:event_id>/', views.event_detail, name='event_detail'),
+    path('<int:event_id>/quote/', views.price_quote, name='price_quote'),
+    path('<int:event_id>/seat-map/', views.seat_map, name='seat_map'),
+    path('<int:event_id>/seat-map/<int:zoom>/<int:x>/<int:y>.svg', views.seat_map_tile, name='seat_map_tile'),
+    path('<int:event_id>/seat-map/seats/', views.seat_map_seats, name='seat_map_seats'),
+    path('<int:event_id>/seat-map/hit/', views.seat_map_hit, name='seat_map_hit'),
     path('checkout/<int:ticket_id>/', views.checkout, name='checkout'),
     path('apply-coupon/', views.apply_coupon, name='apply_coupon'),
     path('booking-confirmation/<int:payment_id>/', views.booking_confirmation, name='booking_confirmation'),
+    path('my-tickets/', views.my_tickets, name='my_tickets'),
 ]
@@ -1,19 +1,33 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib import messages
-from django.http import JsonResponse
-from django.utils import timezone
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.contrib.auth.decorators import login_required
 from django.db import transaction
 from django.db import models
-from decimal import Decimal
-from .models import Event, SeatRow, Seat, Ticket, Payment, Coupon, Category
+from .models import ArchivedTicket, Event, SeatRow, Ticket, Payment, Category
 from django.core.paginator import Paginator
 from datetime import datetime
+from itertools import islice
 from .forms import ContactDetailsForm, PaymentForm, CouponForm
+from . import booking, checkout_state, coupons, funnel, payments, pricing, seatmap, sharding
+from .decorators import public_page
 from django.conf import settings
 from django.urls import reverse
+from django.template.loader import get_template, render_to_string
+from django.utils.cache import patch_cache_control
+from django.utils.crypto import get_random_string
+from eventbooking import metrics
+import logging
 import stripe
+import time
 
+CHECKOUT_STAGE_SECONDS = metrics.Histogram('checkout_stage_seconds', 'Time spent in each stage of a checkout.',
+                                           ['stage'])
+PAYMENT_FAILURES = metrics.Counter('payment_failures_total', 'Checkouts whose payment did not go through.',
+                                   ['reason'])
+COUPON_ATTEMPTS = metrics.Counter('coupon_attempts_total', 'Coupons entered at checkout, by result.', ['result'])
+
+@public_page
 def event_list(request):
     qs = Event.objects.all()
 
@@ -47,9 +61,10 @@ def event_list(request):
 
     # Category filters
     if categories:
-        # Accept ids or slugs against many-to-many
+        # Accept ids or slugs against many-to-many; slugs are not valid ids
+        category_ids = [category for category in categories if category.isdigit()]
         qs = qs.filter(
-            models.Q(categories__id__in=categories) |
+            models.Q(categories__id__in=category_ids) |
             models.Q(categories__slug__in=categories) |
             models.Q(categories__name__in=categories)
         ).distinct()
@@ -64,7 +79,7 @@ def event_list(request):
     qs = qs.order_by(sort_map.get(sort, '-date'))
 
     # Pagination
-    paginator = Paginator(qs, per_page_int)
+    paginator = Paginator(sharding.sharded(qs), per_page_int)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
 
@@ -78,17 +93,19 @@ def event_list(request):
         'selected_sort': sort,
         'per_page': per_page_int,
         'per_page_options': [12, 15, 18, 21, 24, 27, 30],
-        'cities': list(Event.objects.values_list('location', flat=True).distinct()),
+        'cities': list(dict.fromkeys(sharding.collect(Event.objects.values_list('location', flat=True).distinct()))),
         'selected_categories': categories,
         'category_list': list(Category.objects.all()),
     }
     return render(request, 'event_list.html', context)
 
 
+@public_page
 def event_detail(request, event_id):
-    event = get_object_or_404(Event, id=event_id)
+    event = get_object_or_404(sharding.for_pk(Event.objects.all(), event_id), id=event_id)
+    db = event._state.db  # The event's shard
     # Get all seat rows for this event with annotated seat counts
-    rows = SeatRow.objects.filter(event=event).prefetch_related('seats').order_by('name')
+    rows = SeatRow.objects.using(db).filter(event=event).order_by('sort_key', 'name')
     
     # Annotate rows with available and booked seat counts
     from django.db.models import Count, Q
@@ -107,26 +124,60 @@ def event_detail(request, event_id):
         }
         rows_with_positions.append(row_data)
     
-    # Get all seats for this event through rows
-    seats = Seat.objects.filter(row__event=event).select_related('row').order_by('row__name', 'number')
-    
-    # Get all tickets for this event
-    tickets = Ticket.objects.filter(seat__row__event=event).select_related('seat', 'seat__row')
-    
-    return render(request, 'event_detail.html', {
+    # Large venues are drawn from tiles and only the seats in view are
+    # fetched (see tickets.seatmap), instead of listing every ticket
+    seat_count = sum(row.capacity for row in rows)
+    tiled_map = seat_count > settings.SEATMAP_TILED_SEATS
+    tickets = Ticket.objects.none() if tiled_map else _ticket_rows(db, event)
+    context = {
         'event': event,
         'rows_with_positions': rows_with_positions,
-        'seats': seats,
         'tickets': tickets,
-    })
+        'tiled_map': tiled_map,
+        'available_count': sum(row.available_seats for row in rows),
+        'booked_count': sum(row.booked_seats for row in rows),
+    }
+    funnel.track(request, 'view_event', event_id=event.id)
+    if tiled_map or seat_count <= settings.EVENT_DETAIL_STREAMING_SEATS:
+        return render(request, 'event_detail.html', context)
+    return StreamingHttpResponse(_stream_event_detail(request, context, tickets))
+
+
+def _ticket_rows(db, event):
+    """An event's tickets as light named tuples for event_detail_tickets.html."""
+    return (
+        Ticket.objects.using(db).filter(seat__row__event=event)
+        .annotate(row_id=models.F('seat__row_id'), row_name=models.F('seat__row__name'),
+                  number=models.F('seat__number'), is_booked=models.F('seat__is_booked'))
+        .order_by('seat__row__sort_key', 'seat__row__name', 'seat__number')
+        .values_list('id', 'price', 'row_id', 'row_name', 'number', 'is_booked', named=True)
+    )
+
+
+def _stream_event_detail(request, context, tickets, chunk_size=500):
+    """
+    Send the page shell and row summaries first, then the ticket list in
+    chunks read with ``iterator()``, so neither the first byte nor memory
+    waits on the size of the venue.
+    """
+    marker = f'<!-- tickets {get_random_string(16)} -->'
+    shell = render_to_string('event_detail.html', {**context, 'ticket_stream_marker': marker}, request)
+    head, tail = shell.split(marker)
+    yield head
+    ticket_template = get_template('event_detail_tickets.html')
+    rows = tickets.iterator(chunk_size=chunk_size)
+    while chunk := list(islice(rows, chunk_size)):
+        yield ticket_template.render({'tickets': chunk})
+    yield tail
 
 
 def checkout(request, ticket_id):
     # Get the ticket
-    ticket = get_object_or_404(Ticket, id=ticket_id)
+    ticket = get_object_or_404(sharding.for_pk(Ticket.objects.all(), ticket_id), id=ticket_id)
     
     # Check if ticket is already booked
     if ticket.seat.is_booked:
+        funnel.track(request, 'select_seat', event_id=ticket.seat.row.event_id, ticket_id=ticket.id, available=False)
         messages.error(request, 'This ticket is already booked.')
         return redirect('event_detail', event_id=ticket.seat.row.event.id)
     
@@ -135,49 +186,30 @@ def checkout(request, ticket_id):
     payment_form = PaymentForm()
     coupon_form = CouponForm()
     
-    # Initialize Stripe
-    stripe.api_key = settings.STRIPE_SECRET_KEY
+    # Stripe's publishable key for the card form; charges go through tickets.payments
     stripe_publishable_key = settings.STRIPE_PUBLISHABLE_KEY
     
     # Calculate initial amounts
-    subtotal = ticket.price
-    discount_amount = Decimal('0.00')
-    tax_amount = subtotal * Decimal('0.15')  # 15% tax
-    total_amount = subtotal + tax_amount - discount_amount
+    price_quote = pricing.quote([ticket.price])
+    subtotal = price_quote.subtotal
+    discount_amount = price_quote.discount_amount
+    tax_amount = price_quote.tax_amount
+    total_amount = price_quote.total_amount
     
-    # Store ticket info in session for processing
-    request.session['checkout_ticket_id'] = ticket_id
-    request.session['checkout_subtotal'] = float(subtotal)
-    request.session['checkout_tax_amount'] = float(tax_amount)
-    request.session['checkout_discount_amount'] = float(discount_amount)
-    request.session['checkout_total_amount'] = float(total_amount)
+    # Pricing state travels with the page as a signed token instead of the
+    # session, so rendering the checkout page does not write anything
+    state = checkout_state.load_state(request.POST.get('checkout_token'), ticket.id)
+    if state:
+        discount_amount = state['discount_amount']
+        total_amount = state['total_amount']
+    checkout_id = state['checkout_id'] if state and state['checkout_id'] else checkout_state.new_checkout_id()
+    checkout_token = checkout_state.dump_state(ticket.id, subtotal, tax_amount, discount_amount,
+                                               state['coupon_code'] if state else '', checkout_id)
+    event_id = ticket.seat.row.event_id
     
     # Handle coupon validation via AJAX
     if request.headers.get('X-Requested-With') == 'XMLHttpRequest' and request.method == 'POST':
-        coupon_form = CouponForm(request.POST)
-        if coupon_form.is_valid():
-            try:
-                coupon = Coupon.objects.get(code=coupon_form.cleaned_data['coupon_code'].upper())
-                if coupon.valid_until > timezone.now():
-                    discount_amount = (subtotal * Decimal(coupon.discount_percent)) / Decimal('100')
-                    total_amount = subtotal + tax_amount - discount_amount
-                    
-                    # Update session
-                    request.session['checkout_discount_amount'] = float(discount_amount)
-                    request.session['checkout_total_amount'] = float(total_amount)
-                    
-                    return JsonResponse({
-                        'success': True,
-                        'discount_amount': float(discount_amount),
-                        'total_amount': float(total_amount),
-                        'discount_percent': coupon.discount_percent
-                    })
-                else:
-                    return JsonResponse({'success': False, 'error': 'Coupon has expired.'})
-            except Coupon.DoesNotExist:
-                return JsonResponse({'success': False, 'error': 'Invalid coupon code.'})
-        else:
-            return JsonResponse({'success': False, 'error': 'Invalid coupon code.'})
+        return _coupon_response(request, CouponForm(request.POST), ticket.id, [ticket.price], checkout_id)
     
     # Handle form submission
     if request.method == 'POST':
@@ -185,45 +217,74 @@ def checkout(request, ticket_id):
         payment_method_id = request.POST.get('payment_method_id')
         
         if contact_form.is_valid() and payment_method_id:
+            coupon = None
+            coupon_shard = None
+            intent = None
+            refunded = False
+            started = time.perf_counter()
             try:
+                # Claim a use of the coupon before charging so usage limits hold
+                if state and state['coupon_code']:
+                    with CHECKOUT_STAGE_SECONDS.time(stage='coupon'):
+                        coupon = coupons.validate_coupon(state['coupon_code'])
+                        coupon_shard = coupons.reserve_redemption(coupon, request.user)
+                
                 # Get amount in cents (Stripe requires amount in smallest currency unit)
-                amount_cents = int(float(request.session.get('checkout_total_amount', float(total_amount))) * 100)
+                amount_cents = int(total_amount * 100)
                 
                 # Create a payment intent
-                intent = stripe.PaymentIntent.create(
-                    amount=amount_cents,
-                    currency='usd',
-                    payment_method=payment_method_id,
-                    confirm=True,
-                    return_url=request.build_absolute_uri(reverse('booking_confirmation')),
-                    description=f"Ticket for {ticket.seat.row.event.name}",
-                    metadata={
-                        'ticket_id': ticket.id,
-                        'event_name': ticket.seat.row.event.name,
-                        'seat': ticket.seat.name
-                    }
-                )
+                with CHECKOUT_STAGE_SECONDS.time(stage='stripe'):
+                    intent = payments.create_payment_intent(
+                        amount=amount_cents,
+                        currency='usd',
+                        payment_method=payment_method_id,
+                        confirm=True,
+                        # Where Stripe sends the customer back after a 3D Secure check
+                        return_url=request.build_absolute_uri(reverse('checkout', args=[ticket.id])),
+                        description=f"Ticket for {ticket.seat.row.event.name}",
+                        metadata={
+                            'ticket_id': ticket.id,
+                            'event_name': ticket.seat.row.event.name,
+                            'seat': str(ticket.seat)
+                        }
+                    )
                 
                 # Check if payment succeeded
                 if intent.status == 'succeeded' or intent.status == 'requires_capture':
-                    with transaction.atomic():
-                        # Mark seat as booked
-                        ticket.seat.is_booked = True
-                        ticket.seat.save()
-                        
-                        # Update ticket with user (if user is logged in)
-                        if request.user.is_authenticated:
-                            ticket.user = request.user
-                            ticket.save()
-                        
-                        # Create payment record
-                        payment = Payment.objects.create(
-                            user=request.user if request.user.is_authenticated else None,
-                            amount=request.session.get('checkout_total_amount', float(total_amount)),
-                            status='completed',
-                            stripe_payment_id=intent.id
-                        )
-                        payment.tickets.add(ticket)
+                    try:
+                        # The seat and payment are on the ticket's shard and the coupon
+                        # redemption on default; a failure on either rolls back both
+                        with CHECKOUT_STAGE_SECONDS.time(stage='booking'), \
+                                transaction.atomic(using=sharding.shard_of(ticket)), transaction.atomic():
+                            # Claim the seat and create the payment record
+                            payment = booking.book_ticket(ticket, request.user, total_amount, intent.id)
+                            
+                            if coupon is not None:
+                                coupons.record_redemption(coupon, coupon_shard, request.user, payment)
+                    except booking.SeatUnavailable as e:
+                        # Someone else paid for the seat first, so give the money back
+                        PAYMENT_FAILURES.inc(reason='seat_unavailable')
+                        funnel.track(request, 'pay', level=logging.WARNING, event_id=event_id, ticket_id=ticket.id,
+                                     checkout_id=checkout_id, outcome='seat_unavailable', refunded=True)
+                        payments.refund(intent.id)
+                        messages.error(request, str(e))
+                        return redirect('event_detail', event_id=ticket.seat.row.event.id)
+                    except Exception:
+                        # The card was charged but nothing was booked: refund it,
+                        # and the coupon use is released below
+                        PAYMENT_FAILURES.inc(reason='booking_failed')
+                        payments.refund(intent.id)
+                        refunded = True
+                        raise
+                    
+                    if coupon is not None:
+                        # Only once the booking has committed is the coupon use kept
+                        coupon_shard = None
+                        COUPON_ATTEMPTS.inc(result='redeemed')
+                    
+                    funnel.track(request, 'pay', event_id=event_id, ticket_id=ticket.id, checkout_id=checkout_id,
+                                 outcome='succeeded', amount=str(total_amount), payment_id=payment.id,
+                                 coupon_code=coupon.code if coupon is not None else None)
                     
                     # Store contact details in session for confirmation
                     request.session['checkout_contact'] = {
@@ -232,17 +293,44 @@ def checkout(request, ticket_id):
                         'phone': contact_form.cleaned_data['phone']
                     }
                     
-                    # Clear checkout session data
-                    for key in ['checkout_ticket_id', 'checkout_subtotal', 'checkout_tax_amount', 
-                               'checkout_discount_amount', 'checkout_total_amount']:
-                        request.session.pop(key, None)
-                    
                     messages.success(request, 'Ticket booked successfully!')
                     return redirect('booking_confirmation', payment_id=payment.id)
+                
+                # e.g. 'requires_action' for cards that need 3D Secure
+                PAYMENT_FAILURES.inc(reason=intent.status)
+                funnel.track(request, 'pay', level=logging.WARNING, event_id=event_id, ticket_id=ticket.id,
+                             checkout_id=checkout_id, outcome=intent.status)
                     
+            except coupons.InvalidCoupon as e:
+                COUPON_ATTEMPTS.inc(result='rejected')
+                funnel.track(request, 'pay', level=logging.WARNING, event_id=event_id, ticket_id=ticket.id,
+                             checkout_id=checkout_id, outcome='coupon_rejected', error=str(e), refunded=refunded)
+                messages.error(request, str(e))
+                return redirect('checkout', ticket_id=ticket.id)
             except Exception as e:
+                if isinstance(e, stripe.StripeError) and intent is None:
+                    # The charge itself failed, e.g. 'card_declined'
+                    outcome = e.code or type(e).__name__
+                    PAYMENT_FAILURES.inc(reason=outcome)
+                    funnel.track(request, 'pay', level=logging.WARNING, event_id=event_id, ticket_id=ticket.id,
+                                 checkout_id=checkout_id, outcome=outcome, error=str(e))
+                else:
+                    funnel.track(request, 'pay', level=logging.ERROR, exc_info=True, event_id=event_id,
+                                 ticket_id=ticket.id, checkout_id=checkout_id, outcome='error', error=str(e),
+                                 refunded=refunded)
                 messages.error(request, f'An error occurred during checkout: {str(e)}')
                 return redirect('event_detail', event_id=ticket.seat.row.event.id)
+            finally:
+                # Hand the coupon use back if the payment did not go through
+                if coupon_shard is not None:
+                    coupons.release_redemption(coupon, coupon_shard)
+                CHECKOUT_STAGE_SECONDS.observe(time.perf_counter() - started, stage='total')
+        else:
+            funnel.track(request, 'pay', event_id=event_id, ticket_id=ticket.id, checkout_id=checkout_id,
+                         outcome='invalid_details')
+    else:
+        funnel.track(request, 'select_seat', event_id=event_id, ticket_id=ticket.id, available=True,
+                     price=str(ticket.price), checkout_id=checkout_id)
     
     # Get event details for display
     event = ticket.seat.row.event
@@ -257,47 +345,173 @@ def checkout(request, ticket_id):
         'tax_amount': tax_amount,
         'discount_amount': discount_amount,
         'total_amount': total_amount,
+        'checkout_token': checkout_token,
         'stripe_publishable_key': stripe_publishable_key,
     })
 
 
 def booking_confirmation(request, payment_id):
-    payment = get_object_or_404(Payment, id=payment_id)
+    payment = get_object_or_404(sharding.for_pk(Payment.objects.all(), payment_id), id=payment_id)
+    tickets = list(payment.tickets.select_related('seat__row__event'))
+    # Past events keep their tickets in the archive (see tickets.archiving)
+    archived_tickets = list(payment.archived_tickets.select_related('event'))
+    if tickets:
+        event = tickets[0].seat.row.event
+    else:
+        event = archived_tickets[0].event if archived_tickets else None
+    funnel.track(request, 'confirm', event_id=event.id if event else None, payment_id=payment.id)
     return render(request, 'booking_confirmation.html', {
         'payment': payment,
+        'event': event,
+        'tickets': tickets,
+        'archived_tickets': archived_tickets,
+    })
+
+@login_required
+def my_tickets(request):
+    """The signed-in user's tickets for every event, newest first."""
+    tickets = sharding.sharded(
+        Ticket.objects.filter(user=request.user).select_related('seat__row__event').order_by('-booked_at')
+    )
+    # Tickets for events whose seats have been archived (see tickets.archiving)
+    past_tickets = sharding.sharded(
+        ArchivedTicket.objects.filter(user=request.user).select_related('event').order_by('-booked_at')
+    )
+    return render(request, 'my_tickets.html', {'tickets': tickets[:100], 'past_tickets': past_tickets[:100]})
+
+def _coupon_response(request, coupon_form, ticket_id, prices, checkout_id):
+    """Price a coupon against the checkout amounts and re-sign the checkout state."""
+    if not coupon_form.is_valid():
+        COUPON_ATTEMPTS.inc(result='invalid')
+        funnel.track(request, 'apply_coupon', ticket_id=ticket_id, checkout_id=checkout_id, result='invalid',
+                     coupon_code=coupon_form.data.get('coupon_code', '').strip().upper())
+        return JsonResponse({'success': False, 'error': coupon_form.errors['coupon_code'][0]})
+    
+    COUPON_ATTEMPTS.inc(result='applied')
+    coupon = coupon_form.coupon
+    funnel.track(request, 'apply_coupon', ticket_id=ticket_id, checkout_id=checkout_id, result='applied',
+                 coupon_code=coupon.code, discount_percent=coupon.discount_percent)
+    price_quote = pricing.quote(prices, coupon.discount_percent)
+    
+    return JsonResponse({
+        'success': True,
+        'discount_amount': float(price_quote.discount_amount),
+        'total_amount': float(price_quote.total_amount),
+        'discount_percent': coupon.discount_percent,
+        'message': f'Coupon applied! {coupon.discount_percent}% discount added.',
+        'checkout_token': checkout_state.dump_state(
+            ticket_id, price_quote.subtotal, price_quote.tax_amount, price_quote.discount_amount, coupon.code,
+            checkout_id,
+        ),
     })
 
 def apply_coupon(request):
     """AJAX view for applying coupon codes"""
     if request.method == 'POST' and request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-        coupon_form = CouponForm(request.POST)
-        if coupon_form.is_valid():
-            try:
-                coupon = Coupon.objects.get(code=coupon_form.cleaned_data['coupon_code'].upper())
-                if coupon.valid_until > timezone.now():
-                    # Get ticket info from session
-                    subtotal = Decimal(str(request.session.get('checkout_subtotal', 0)))
-                    tax_amount = Decimal(str(request.session.get('checkout_tax_amount', 0)))
-                    
-                    discount_amount = (subtotal * Decimal(coupon.discount_percent)) / Decimal('100')
-                    total_amount = subtotal + tax_amount - discount_amount
-                    
-                    # Update session
-                    request.session['checkout_discount_amount'] = float(discount_amount)
-                    request.session['checkout_total_amount'] = float(total_amount)
-                    
-                    return JsonResponse({
-                        'success': True,
-                        'discount_amount': float(discount_amount),
-                        'total_amount': float(total_amount),
-                        'discount_percent': coupon.discount_percent,
-                        'message': f'Coupon applied! {coupon.discount_percent}% discount added.'
-                    })
-                else:
-                    return JsonResponse({'success': False, 'error': 'Coupon has expired.'})
-            except Coupon.DoesNotExist:
-                return JsonResponse({'success': False, 'error': 'Invalid coupon code.'})
-        else:
-            return JsonResponse({'success': False, 'error': 'Invalid coupon code.'})
+        # Get ticket info from the signed checkout token
+        state = checkout_state.load_state(request.POST.get('checkout_token'))
+        if state is None:
+            return JsonResponse({
+                'success': False,
+                'error': 'Your checkout has expired. Please reload the page.'
+            })
+        return _coupon_response(request, CouponForm(request.POST), state['ticket_id'], [state['subtotal']],
+                                state['checkout_id'])
     
-    return JsonResponse({'success': False, 'error': 'Invalid request method.'})
\ No newline at end of file
+    return JsonResponse({'success': False, 'error': 'Invalid request method.'})
+
+def price_quote(request, event_id):
+    """Quote a batch of seats, e.g. ``?seat=1&seat=2&coupon=SAVE10``"""
+    discount_percent = 0
+    coupon_code = (request.GET.get('coupon') or '').strip()
+    if coupon_code:
+        try:
+            discount_percent = coupons.validate_coupon(coupon_code).discount_percent
+        except coupons.InvalidCoupon as e:
+            return JsonResponse({'success': False, 'error': str(e)})
+    try:
+        seat_ids = [int(seat_id) for seat_id in request.GET.getlist('seat')]
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Invalid seat.'})
+    
+    price_quote = pricing.quote_seats(event_id, seat_ids, discount_percent)
+    return JsonResponse({
+        'success': True,
+        'seat_count': price_quote.seat_count,
+        'subtotal': str(price_quote.subtotal),
+        'discount_amount': str(price_quote.discount_amount),
+        'tax_amount': str(price_quote.tax_amount),
+        'total_amount': str(price_quote.total_amount),
+    })
+
+
+def _seat_map_index(event_id):
+    index = seatmap.get_index(event_id)
+    if index is None:
+        raise Http404('This event has no seat map.')
+    return index
+
+
+def _map_coordinates(request, *names):
+    try:
+        return [float(request.GET[name]) for name in names]
+    except (KeyError, ValueError):
+        return None
+
+
+def seat_map(request, event_id):
+    """Everything a tiled seat map viewer needs to place tiles and clicks."""
+    index = _seat_map_index(event_id)
+    return JsonResponse({
+        'tile_size': seatmap.TILE_SIZE,
+        'max_zoom': index.max_zoom,
+        'origin': [index.x0, index.y0],
+        'span': index.span,
+        'seat_radius': seatmap.SEAT_RADIUS,
+        'version': str(index.version),
+        'tile_url': reverse('seat_map', args=[event_id]) + '{z}/{x}/{y}.svg',
+        'seats_url': reverse('seat_map_seats', args=[event_id]),
+        'hit_url': reverse('seat_map_hit', args=[event_id]),
+    })
+
+
+def seat_map_tile(request, event_id, zoom, x, y):
+    index = _seat_map_index(event_id)
+    if not index.has_tile(zoom, x, y):
+        raise Http404('No such tile.')
+    response = HttpResponse(seatmap.get_tile(index, zoom, x, y), content_type='image/svg+xml')
+    # Tile URLs carry the version they were drawn for, so those never change
+    if request.GET.get('v') == str(index.version):
+        patch_cache_control(response, public=True, max_age=365 * 24 * 60 * 60, immutable=True)
+    return response
+
+
+def seat_map_seats(request, event_id):
+    """Seats and their availability inside ``?x0=&y0=&x1=&y1=``."""
+    box = _map_coordinates(request, 'x0', 'y0', 'x1', 'y1')
+    if box is None:
+        return JsonResponse({'success': False, 'error': 'Invalid viewport.'}, status=400)
+    seats = seatmap.seats_in(_seat_map_index(event_id), *box)
+    if seats is None:
+        return JsonResponse({'success': False, 'error': 'Zoom in to see individual seats.'})
+    return JsonResponse({'success': True, 'seats': seats})
+
+
+def seat_map_hit(request, event_id):
+    """The seat and ticket under the point ``?x=&y=``."""
+    point = _map_coordinates(request, 'x', 'y')
+    if point is None:
+        return JsonResponse({'success': False, 'error': 'Invalid point.'}, status=400)
+    ticket = seatmap.hit(_seat_map_index(event_id), *point)
+    if ticket is None:
+        return JsonResponse({'success': False, 'error': 'No seat here.'})
+    return JsonResponse({
+        'success': True,
+        'ticket_id': ticket.id,
+        'seat_id': ticket.seat_id,
+        'row': ticket.seat.row.name,
+        'number': ticket.seat.number,
+        'price': str(ticket.price),
+        'is_booked': ticket.seat.is_booked,
+        'checkout_url': reverse('checkout', args=[ticket.id]),
+    })